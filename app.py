@@ -1,7 +1,7 @@
 import os
 import sys
 from dotenv import load_dotenv
-from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify
+from flask import Flask, render_template, request, redirect, url_for, flash, session, jsonify, Response
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager, UserMixin, login_user, logout_user, login_required, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
@@ -16,9 +16,16 @@ import base64
 import secrets
 import pyotp
 import subprocess
+import atexit
+from concurrent.futures import TimeoutError as FuturesTimeoutError
 from werkzeug.urls import url_parse
 from src.hadoop_service import HadoopService
 from kerberos_auth import KerberosAuth
+from kerberos.kadmin import parse_principal_records
+from kerberos.supervisor import ProcessSupervisor
+from totp.engine import totp_engine
+from totp.replay import TOTPReplayGuard
+from totp.provisioning import FORMATS as QR_FORMATS, provisioning_service, provisioning_uri
 
 # 加载环境变量
 load_dotenv()
@@ -85,6 +92,10 @@ login_manager.login_message = '请先登录'
 # 创建Hadoop服务管理实例
 hadoop_service = None
 kerberos_auth = None
+# krb5kdc/kadmind进程监管
+daemon_supervisor = ProcessSupervisor()
+# 已使用的TOTP代码（按用户和时间步），防止同一代码重复使用
+totp_replay_guard = TOTPReplayGuard.from_env()
 
 # 使用环境变量中的配置
 KRB5_CONFIG = os.getenv('KRB5_CONFIG')
@@ -282,27 +293,30 @@ def create_kdc_database():
         logger.error(f"创建KDC数据库时出错: {str(e)}")
         raise
 
+def _kerberos_daemon_env():
+    env = os.environ.copy()
+    env.update({
+        'KRB5_CONFIG': KRB5_CONFIG,
+        'KRB5_KDC_PROFILE': KRB5_KDC_PROFILE
+    })
+    return env
+
 def start_kdc_server():
     try:
         # 查找krb5kdc命令
         krb5kdc_cmd = find_kerberos_command('krb5kdc')
         if not krb5kdc_cmd:
             raise FileNotFoundError("找不到krb5kdc命令，请确保已安装Kerberos")
-        
-        env = os.environ.copy()
-        env.update({
-            'KRB5_CONFIG': KRB5_CONFIG,
-            'KRB5_KDC_PROFILE': KRB5_KDC_PROFILE
-        })
-        
-        # 修改为兼容Python 3.6的参数
-        process = subprocess.Popen(
-            [krb5kdc_cmd],
-            env=env,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            universal_newlines=True
-        )
+
+        # -n: 前台运行，由监管进程读取输出并在崩溃后重启；端口已由外部KDC（start_kdc.sh）提供时直接沿用
+        # 就绪只探测TCP端口：KDC不回复空的UDP数据报，无法据此判断UDP端口是否就绪
+        kdc_host = os.getenv('KERBEROS_KDC', 'localhost')
+        kdc_port = int(os.getenv('KDC_PORT', 88))
+        daemon_supervisor.add('krb5kdc', [krb5kdc_cmd, '-n'],
+                              [(kdc_host, kdc_port, 'tcp')],
+                              env=_kerberos_daemon_env())
+        if not daemon_supervisor.start('krb5kdc'):
+            raise RuntimeError("KDC服务未就绪，详见{}".format(daemon_supervisor.daemons['krb5kdc'].log_path))
         logger.info("KDC服务启动成功")
     except Exception as e:
         logger.error("启动KDC服务时出错: {}".format(str(e)))
@@ -314,26 +328,20 @@ def start_kadmin_server():
         kadmind_cmd = find_kerberos_command('kadmind')
         if not kadmind_cmd:
             raise FileNotFoundError("找不到kadmind命令，请确保已安装Kerberos")
-        
-        env = os.environ.copy()
-        env.update({
-            'KRB5_CONFIG': KRB5_CONFIG,
-            'KRB5_KDC_PROFILE': KRB5_KDC_PROFILE
-        })
-        
-        # 修改为兼容Python 3.6的参数
-        process = subprocess.Popen(
-            [kadmind_cmd, '-nofork'],
-            env=env,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            universal_newlines=True
-        )
+
+        kdc_host = os.getenv('KERBEROS_KDC', 'localhost')
+        daemon_supervisor.add('kadmind', [kadmind_cmd, '-nofork'],
+                              [(kdc_host, int(os.getenv('KADMIND_PORT', 749)), 'tcp')],
+                              env=_kerberos_daemon_env())
+        if not daemon_supervisor.start('kadmind'):
+            raise RuntimeError("kadmin服务未就绪，详见{}".format(daemon_supervisor.daemons['kadmind'].log_path))
         logger.info("kadmin服务启动成功")
     except Exception as e:
         logger.error("启动kadmin服务时出错: {}".format(str(e)))
         raise
 
+atexit.register(daemon_supervisor.stop_all)
+
 # 替换before_first_request装饰器
 with app.app_context():
     init_services()
@@ -358,6 +366,15 @@ def hadoop_status():
         'service_ports': service_ports
     })
 
+@app.route('/kerberos/daemons')
+@login_required
+def kerberos_daemons_status():
+    """krb5kdc/kadmind的运行状态、重启次数和启动到就绪的耗时"""
+    return jsonify({
+        'status': 'success',
+        'daemons': daemon_supervisor.metrics()
+    })
+
 @app.route('/hadoop/start')
 @login_required
 def hadoop_start():
@@ -455,16 +472,21 @@ class TOTP:
         if secret is None:
             secret = pyotp.random_base32()
         self.secret = secret
-        self.totp = pyotp.TOTP(secret)
     
     def generate_code(self):
-        return self.totp.now()
+        return totp_engine.generate(self.secret)
     
     def verify_code(self, code):
-        return self.totp.verify(code)
+        return totp_engine.verify(self.secret, code)
+    
+    def match_step(self, code):
+        return totp_engine.match_step(self.secret, code)
     
     def get_provisioning_uri(self, username):
-        return self.totp.provisioning_uri(username, issuer_name="Kerberos系统")
+        return provisioning_uri(self.secret, username)
+    
+    def get_qr_code(self, username, fmt='png', timeout=None):
+        return provisioning_service.render(self.secret, username, fmt=fmt, timeout=timeout)
 
 @login_manager.user_loader
 def load_user(user_id):
@@ -635,8 +657,10 @@ def verify_totp():
     if request.method == 'POST':
         code = request.form.get('code')
         totp = TOTP(user.totp_secret)
+        step = totp.match_step(code)
+        replayed = step is not None and not totp_replay_guard.check_and_add(user.id, step)
         
-        if totp.verify_code(code):
+        if step is not None and not replayed:
             # 设置TOTP验证标志
             session['totp_verified'] = True
             
@@ -675,6 +699,8 @@ def verify_totp():
             
             # 统一跳转到dashboard页面，该页面会根据认证方式显示不同内容
             return redirect(url_for('dashboard'))
+        elif replayed:
+            flash('验证码已使用，请等待下一个验证码', 'danger')
         else:
             flash('验证码无效', 'danger')
     
@@ -706,25 +732,71 @@ def verify_totp():
                         username=username,
                         kerberos_mode=False)
 
+# TOTP时间步长（秒），与TOTP类一致
+TOTP_INTERVAL = 30
+# 等待二维码渲染的最长时间（秒）
+TOTP_QR_TIMEOUT = float(os.getenv('TOTP_QR_TIMEOUT', 10))
+
+def _totp_etag(user_id, step):
+    """按用户和时间步生成ETag，不包含验证码本身"""
+    return hashlib.sha256(f'{app.secret_key}:{user_id}:{step}'.encode()).hexdigest()[:16]
+
 @app.route('/generate_totp')
 def generate_totp():
-    """统一的TOTP代码生成器，同时支持普通和Kerberos认证"""
+    """统一的TOTP代码生成器，同时支持普通和Kerberos认证
+    
+    响应带有对齐到时间步边界的Cache-Control和ETag，同一时间步内的重复请求
+    由浏览器缓存或304响应处理，不再查询数据库和计算HMAC。
+    """
     # 获取用户ID
     user_id = session.get('user_id_for_totp')
     if not user_id:
         return jsonify({'error': 'User not found'}), 404
-        
-    user = User.query.get(user_id)
-    if not user:
-        return jsonify({'error': 'User not found'}), 404
     
-    totp = TOTP(user.totp_secret)
-    current_code = totp.generate_code()
-    remaining_time = 30 - (int(datetime.now().timestamp()) % 30)
-    return jsonify({
-        'code': current_code,
-        'remainingSeconds': remaining_time
-    })
+    now = time.time()
+    step = int(now // TOTP_INTERVAL)
+    remaining_time = TOTP_INTERVAL - int(now % TOTP_INTERVAL)
+    etag = _totp_etag(user_id, step)
+    
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        user = User.query.get(user_id)
+        if not user:
+            return jsonify({'error': 'User not found'}), 404
+        response = jsonify({
+            'code': totp_engine.code_at_step(user.totp_secret, step),
+            'remainingSeconds': remaining_time
+        })
+    
+    # 验证码由用户密钥生成，只允许浏览器缓存，共享代理按会话区分
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = f'private, max-age={remaining_time}'
+    response.headers['Vary'] = 'Cookie'
+    return response
+
+@app.route('/totp/qrcode.<fmt>')
+def totp_qrcode(fmt):
+    """TOTP配置二维码（png或svg），在二维码线程池中渲染并缓存
+    
+    二维码包含长期有效的TOTP密钥，只提供给已登录且完成二次验证的用户；
+    只通过密码验证（session中只有user_id_for_totp）的会话不能获取，否则可以绕过二次验证。
+    """
+    if fmt not in QR_FORMATS:
+        return jsonify({'error': 'Unsupported format'}), 404
+    if not (current_user.is_authenticated and session.get('totp_verified')):
+        return jsonify({'error': '请先登录并完成二次验证'}), 403
+    
+    try:
+        image = TOTP(current_user.totp_secret).get_qr_code(current_user.username, fmt,
+                                                          timeout=TOTP_QR_TIMEOUT)
+    except FuturesTimeoutError:
+        return jsonify({'error': '二维码生成超时，请稍后重试'}), 503
+    
+    response = Response(image, mimetype=QR_FORMATS[fmt])
+    # 二维码包含TOTP密钥，不允许浏览器或代理保存
+    response.headers['Cache-Control'] = 'no-store'
+    return response
 
 # 添加一个辅助函数来检查用户是否为管理员
 def is_admin_user():
@@ -967,6 +1039,58 @@ def delete_user(username):
         app.logger.error(f"删除用户失败: {str(e)}", exc_info=True)
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@app.route('/api/admin/principals/bulk', methods=['POST'])
+def bulk_create_principals():
+    """批量创建Kerberos主体，接受CSV或JSONL文件上传"""
+    # 检查认证和TOTP验证
+    if not (current_user.is_authenticated or session.get('kerberos_authenticated')):
+        return jsonify({'success': False, 'error': '请先登录'}), 401
+    
+    if not session.get('totp_verified'):
+        return jsonify({'success': False, 'error': '请先完成二次验证'}), 401
+    
+    # 检查管理员权限
+    if not is_admin_user():
+        return jsonify({'success': False, 'error': '需要管理员权限'}), 403
+    
+    upload = request.files.get('file')
+    if upload is not None:
+        filename = upload.filename or ''
+        data = upload.read().decode('utf-8-sig')
+    else:
+        filename = ''
+        data = request.get_data(as_text=True)
+    if not data.strip():
+        return jsonify({'success': False, 'error': '上传内容为空'}), 400
+    
+    # 按参数、文件扩展名或内容类型判断格式
+    fmt = request.args.get('format')
+    if not fmt:
+        if filename.endswith(('.jsonl', '.ndjson')) or 'json' in (request.content_type or ''):
+            fmt = 'jsonl'
+        else:
+            fmt = 'csv'
+    realm = request.args.get('realm', 'HADOOP.COM')
+    
+    try:
+        items = list(parse_principal_records(data, fmt))
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+    
+    def report_progress(done, total):
+        app.logger.info(f"批量创建主体进度: {done}/{total}")
+    
+    results = kerberos_auth.create_principals(items, realm, report_progress)
+    summary = {status: sum(1 for result in results if result.status == status)
+               for status in ('created', 'exists', 'error')}
+    return jsonify({
+        'success': summary['error'] == 0,
+        'total': len(results),
+        'summary': summary,
+        'errors': [{'principal': result.principal, 'error': result.error}
+                   for result in results if not result.success]
+    })
+
 @app.route('/service_management')
 def service_management():
     # 兼容 Flask-Login 和 Kerberos 登录
@@ -1223,8 +1347,8 @@ def kerberos_dashboard():
 
 @app.route('/kerberos/logout')
 def kerberos_logout():
-    # 清除Kerberos票据
-    kerberos_auth.logout()
+    # 只清除当前用户的Kerberos票据
+    kerberos_auth.logout(session.get('kerberos_principal') or session.get('temp_kerberos_principal'))
     # 清除会话
     session.clear()
     flash('已成功销毁Kerberos票据，您已安全退出', 'success')
@@ -1,10 +1,8 @@
-import hmac
-import time
 import base64
-import struct
 import secrets
-import qrcode
-import io
+
+from totp.engine import totp_engine
+from totp.provisioning import DEFAULT_ISSUER, provisioning_service, provisioning_uri
 
 class TOTP:
     def __init__(self, secret=None, digits=6, interval=30):
@@ -28,33 +26,7 @@ class TOTP:
         :param timestamp: 时间戳（如果不提供，使用当前时间）
         :return: TOTP 代码
         """
-        if timestamp is None:
-            timestamp = time.time()
-        
-        # 计算时间步数
-        time_step = int(timestamp / self.interval)
-        
-        # 将时间步数转换为字节串
-        time_bytes = struct.pack(">Q", time_step)
-        
-        # 计算 HMAC-SHA1
-        key = base64.b32decode(self.secret)
-        hmac_obj = hmac.new(key, time_bytes, 'sha1')
-        hmac_result = hmac_obj.digest()
-        
-        # 获取偏移量
-        offset = hmac_result[-1] & 0xf
-        
-        # 生成 4 字节的代码
-        code_bytes = hmac_result[offset:offset + 4]
-        code = struct.unpack('>L', code_bytes)[0]
-        
-        # 提取指定位数的代码
-        code = code & ((1 << 32) - 1)
-        code = code % (10 ** self.digits)
-        
-        # 补齐前导零
-        return str(code).zfill(self.digits)
+        return totp_engine.generate(self.secret, timestamp, self.digits, self.interval)
 
     def verify_code(self, code, timestamp=None, valid_window=1):
         """
@@ -64,27 +36,39 @@ class TOTP:
         :param valid_window: 验证窗口（前后各多少个时间步长有效）
         :return: 是否有效
         """
-        if timestamp is None:
-            timestamp = time.time()
-            
-        # 检查当前时间步长及其前后的代码
-        for i in range(-valid_window, valid_window + 1):
-            check_time = timestamp + i * self.interval
-            if self.generate_code(check_time) == str(code):
-                return True
-        return False
+        return totp_engine.verify(self.secret, code, timestamp, valid_window,
+                                  self.digits, self.interval)
 
     def get_remaining_seconds(self):
         """
         获取当前 TOTP 代码的剩余有效秒数
         :return: 剩余秒数
         """
-        current_time = time.time()
-        return self.interval - (int(current_time) % self.interval)
+        return totp_engine.remaining_seconds(self.interval)
 
     def get_current_code(self):
         """
         获取当前的 TOTP 代码
         :return: 当前代码
         """
-        return self.generate_code() 
\ No newline at end of file
+        return self.generate_code() 
+
+    def get_provisioning_uri(self, username, issuer=DEFAULT_ISSUER):
+        """
+        获取认证器应用使用的配置URI
+        :param username: 用户名
+        :param issuer: 发行者名称
+        :return: otpauth URI
+        """
+        return provisioning_uri(self.secret, username, issuer, self.digits, self.interval)
+
+    def get_qr_code(self, username, issuer=DEFAULT_ISSUER, fmt='png'):
+        """
+        获取配置二维码（在二维码线程池中渲染，结果按密钥和发行者缓存）
+        :param username: 用户名
+        :param issuer: 发行者名称
+        :param fmt: 图片格式，png或svg
+        :return: data URI，可直接用于<img src>
+        """
+        return provisioning_service.data_uri(self.secret, username, issuer, fmt,
+                                             digits=self.digits, interval=self.interval)
@@ -4,6 +4,9 @@ from typing import Optional, Dict, Tuple
 from kerberos.auth import KerberosAuth
 from kerberos.crypto import KerberosCrypto
 
+# 用户登录时需要获取票据的Hadoop服务
+HADOOP_SERVICES = ['hdfs', 'yarn', 'hive']
+
 class HadoopAuthManager:
     def __init__(self, config_dir: str):
         self.config_dir = config_dir
@@ -37,28 +40,14 @@ class HadoopAuthManager:
             Tuple[bool, Optional[str]]: (是否认证成功, 错误信息)
         """
         try:
-            # 使用Kerberos进行认证
-            tgt = self.kerberos_auth.authenticate(username, password)
-            if not tgt:
-                return False, "Kerberos认证失败"
+            # 一次TGS交换获取所有Hadoop服务票据
+            success, error, tickets = self.kerberos_auth.get_service_tickets(
+                username, password, HADOOP_SERVICES)
+            if not success:
+                return False, error or "Kerberos认证失败"
                 
-            # 获取HDFS服务票据
-            hdfs_ticket = self.kerberos_auth.get_service_ticket(tgt, "hdfs")
-            if not hdfs_ticket:
-                return False, "获取HDFS服务票据失败"
-            self.service_tickets[f"{username}_hdfs"] = hdfs_ticket
-            
-            # 获取YARN服务票据
-            yarn_ticket = self.kerberos_auth.get_service_ticket(tgt, "yarn")
-            if not yarn_ticket:
-                return False, "获取YARN服务票据失败"
-            self.service_tickets[f"{username}_yarn"] = yarn_ticket
-            
-            # 获取Hive服务票据
-            hive_ticket = self.kerberos_auth.get_service_ticket(tgt, "hive")
-            if not hive_ticket:
-                return False, "获取Hive服务票据失败"
-            self.service_tickets[f"{username}_hive"] = hive_ticket
+            for service, ticket in tickets.items():
+                self.service_tickets[f"{username}_{service}"] = ticket
             
             return True, None
         except Exception as e:
@@ -82,7 +71,8 @@ class HadoopAuthManager:
                 return False, f"未找到{service}服务票据"
                 
             ticket = self.service_tickets[ticket_key]
-            if not self.kerberos_auth.verify_ticket(ticket, service):
+            valid, _ = self.kerberos_auth.verify_ticket_full(ticket, service)
+            if not valid:
                 return False, f"{service}服务票据验证失败"
                 
             return True, None
@@ -166,7 +156,7 @@ class HadoopAuthManager:
         """
         try:
             # 清理服务票据
-            for service in ['hdfs', 'yarn', 'hive']:
+            for service in HADOOP_SERVICES:
                 ticket_key = f"{username}_{service}"
                 if ticket_key in self.service_tickets:
                     del self.service_tickets[ticket_key]
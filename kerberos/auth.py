@@ -1,5 +1,5 @@
 import logging
-from typing import Optional, Tuple
+from typing import Optional, Tuple, Dict, List
 from datetime import datetime
 from .crypto import KerberosCrypto
 from .servers import KerberosAS, KerberosTGS, KerberosService
@@ -94,12 +94,55 @@ class KerberosAuth:
             self.logger.error(f"Kerberos认证错误: {str(e)}")
             return False, f"Kerberos认证错误: {str(e)}"
 
-    def verify_ticket_full(self, ticket: str) -> Tuple[bool, Optional[str]]:
+    def get_service_tickets(self, username: str, password: str,
+                            service_ids: List[str]) -> Tuple[bool, Optional[str], Dict[str, str]]:
+        """
+        获取多个服务的服务票据，只进行一次AS交换和一次TGS交换
+        
+        Args:
+            username: 用户名
+            password: 密码
+            service_ids: 服务ID列表
+            
+        Returns:
+            Tuple[bool, Optional[str], Dict[str, str]]: (是否成功, 错误信息, {服务ID: 服务票据})
+        """
+        try:
+            as_success, tgt, client_tgs_key = self.as_server.authenticate(username, password)
+            if not as_success:
+                return False, tgt, {}
+                
+            self.session_keys[username] = client_tgs_key
+            
+            authenticator = self.crypto.create_authenticator(
+                username,
+                datetime.utcnow(),
+                client_tgs_key
+            )
+            
+            tgs_success, error, granted = self.tgs_server.grant_service_tickets(
+                tgt, authenticator, service_ids)
+            if not tgs_success:
+                return False, error, {}
+                
+            tickets = {}
+            for service_id, (service_ticket, service_session_key) in granted.items():
+                self.session_keys[f"{username}_{service_id}"] = service_session_key
+                tickets[service_id] = service_ticket
+                
+            return True, None, tickets
+
+        except Exception as e:
+            self.logger.error(f"获取服务票据错误: {str(e)}")
+            return False, f"获取服务票据错误: {str(e)}", {}
+
+    def verify_ticket_full(self, ticket: str, service_id: Optional[str] = None) -> Tuple[bool, Optional[str]]:
         """
         验证服务票据
         
         Args:
             ticket: 服务票据
+            service_id: 期望的服务ID，为None时不检查
             
         Returns:
             Tuple[bool, Optional[str]]: (验证是否成功, 错误信息)
@@ -112,6 +155,9 @@ class KerberosAuth:
             if not valid:
                 return False, "票据验证失败"
                 
+            if service_id is not None and ticket_data['server_id'] != service_id:
+                return False, "服务ID不匹配"
+                
             return True, None
 
         except Exception as e:
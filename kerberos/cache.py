@@ -0,0 +1,226 @@
+import hashlib
+import os
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+
+# 每个缓存条目的固定开销估算（OrderedDict节点、元组、dict对象等）
+_ENTRY_OVERHEAD = 512
+
+# 当前进程中所有缓存实例，fork后在子进程中重置
+_live_caches = weakref.WeakSet()
+
+
+def _reset_caches_after_fork():
+    for cache in list(_live_caches):
+        cache._reset_after_fork()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_caches_after_fork)
+
+
+def ticket_digest(ticket: str) -> bytes:
+    """计算票据摘要，用作缓存键"""
+    return hashlib.blake2b(ticket.encode(), digest_size=16).digest()
+
+
+class TicketCache:
+    """
+    已验证票据的LRU缓存
+
+    缓存键为票据摘要，条目在票据自身的过期时间失效。缓存只存在于当前进程，
+    gunicorn每个worker各自持有一份，fork后子进程中的缓存会被清空。
+    """
+
+    def __init__(self, max_entries: Optional[int] = None, max_bytes: Optional[int] = None):
+        self.max_entries = max_entries if max_entries is not None else \
+            int(os.getenv('TICKET_CACHE_SIZE', 4096))
+        self.max_bytes = max_bytes if max_bytes is not None else \
+            int(os.getenv('TICKET_CACHE_MAX_BYTES', 8 * 1024 * 1024))
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        _live_caches.add(self)
+
+    @staticmethod
+    def _entry_size(ticket_data: Dict[str, Any]) -> int:
+        size = _ENTRY_OVERHEAD
+        for value in ticket_data.values():
+            if isinstance(value, str):
+                size += len(value)
+        return size
+
+    def get(self, digest: bytes, owner: Any) -> Optional[Dict[str, Any]]:
+        """
+        查找已验证的票据
+
+        Args:
+            digest: 票据摘要
+            owner: 验证该票据所用的密钥对象，不一致时视为未命中
+
+        Returns:
+            Optional[Dict[str, Any]]: 票据数据副本，未命中或已过期时返回None
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is None or entry[0] is not owner:
+                self.misses += 1
+                return None
+            if now >= entry[1]['expires_at']:
+                self._remove(digest)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(digest)
+            self.hits += 1
+            return dict(entry[1])
+
+    def put(self, digest: bytes, owner: Any, ticket_data: Dict[str, Any]):
+        """
+        缓存已验证的票据
+
+        Args:
+            digest: 票据摘要
+            owner: 验证该票据所用的密钥对象
+            ticket_data: 票据数据，必须包含expires_at
+        """
+        if self.max_entries <= 0:
+            return
+        size = self._entry_size(ticket_data)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if digest in self._entries:
+                self._remove(digest)
+            self._entries[digest] = (owner, dict(ticket_data), size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def _remove(self, digest: bytes):
+        _, _, size = self._entries.pop(digest)
+        self._bytes -= size
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        """获取缓存统计信息"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+    def _reset_after_fork(self):
+        # 父进程的锁可能在fork时处于持有状态，子进程中重新创建
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self.hits = self.misses = self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class CipherCache:
+    """
+    会话密钥到加密对象的缓存
+
+    复用已解析的加密对象（如Fernet），避免每次创建认证器时重新解析密钥。
+    按最近使用淘汰，并清理空闲超过idle_seconds的条目。
+    """
+
+    def __init__(self, factory: Callable[[bytes], Any], max_entries: Optional[int] = None,
+                 idle_seconds: Optional[float] = None):
+        self.factory = factory
+        self.max_entries = max_entries if max_entries is not None else \
+            int(os.getenv('CIPHER_CACHE_SIZE', 1024))
+        self.idle_seconds = idle_seconds if idle_seconds is not None else \
+            float(os.getenv('CIPHER_CACHE_IDLE_SECONDS', 600))
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        _live_caches.add(self)
+
+    def get(self, key: bytes) -> Any:
+        """
+        获取会话密钥对应的加密对象，不存在时创建
+
+        Args:
+            key: 会话密钥
+
+        Returns:
+            Any: 加密对象
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries[key] = (entry[0], now)
+                self._entries.move_to_end(key)
+                self.hits += 1
+                self._evict_idle(now)
+                return entry[0]
+            self.misses += 1
+
+        # 在锁外创建，密钥无效时异常直接抛给调用方
+        cipher = self.factory(key)
+        if self.max_entries <= 0:
+            return cipher
+
+        with self._lock:
+            self._entries[key] = (cipher, now)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._evict_idle(now)
+        return cipher
+
+    def _evict_idle(self, now: float):
+        # 条目按最近使用排序，从最旧的一端开始清理
+        deadline = now - self.idle_seconds
+        while self._entries:
+            key, (_, last_used) = next(iter(self._entries.items()))
+            if last_used >= deadline:
+                break
+            del self._entries[key]
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """获取缓存统计信息"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+    def _reset_after_fork(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.hits = self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
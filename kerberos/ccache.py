@@ -0,0 +1,362 @@
+import hashlib
+import os
+import struct
+import tempfile
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+# MIT FILE凭据缓存格式（版本3、4，大端字节序）
+CCACHE_V3 = 0x0503
+CCACHE_V4 = 0x0504
+
+# 配置条目（非真实票据）的服务主体领域
+CONFIG_REALM = 'X-CACHECONF:'
+
+_U16 = struct.Struct('>H')
+_U32 = struct.Struct('>I')
+_TIMES = struct.Struct('>IIII')
+
+
+class CCacheFormatError(ValueError):
+    """凭据缓存格式错误"""
+
+
+class Principal(NamedTuple):
+    """Kerberos主体"""
+    name_type: int
+    realm: str
+    components: Tuple[str, ...]
+
+    def __str__(self):
+        return f"{'/'.join(self.components)}@{self.realm}"
+
+
+class Credential(NamedTuple):
+    """凭据缓存中的一条票据（只保留时间和标志）"""
+    client: Principal
+    server: Principal
+    authtime: int
+    starttime: int
+    endtime: int
+    renew_till: int
+    flags: int
+
+
+class CredentialCache(NamedTuple):
+    """解析后的凭据缓存"""
+    version: int
+    principal: Principal
+    credentials: List[Credential]
+
+    def tickets(self) -> List[Credential]:
+        """真实票据（排除配置条目）"""
+        return [cred for cred in self.credentials if cred.server.realm != CONFIG_REALM]
+
+    def tgt(self) -> Optional[Credential]:
+        """默认主体领域的TGT"""
+        name = ('krbtgt', self.principal.realm)
+        for cred in self.tickets():
+            if cred.server.components == name:
+                return cred
+        return None
+
+    def expiry(self) -> Optional[int]:
+        """票据到期时间（epoch秒），与klist一致优先使用TGT，否则使用第一张票据"""
+        cred = self.tgt()
+        if cred is None:
+            tickets = self.tickets()
+            cred = tickets[0] if tickets else None
+        return cred.endtime if cred is not None else None
+
+
+class _Reader:
+    def __init__(self, data: bytes):
+        self.data = data
+        self.offset = 0
+
+    def take(self, size: int) -> bytes:
+        end = self.offset + size
+        if end > len(self.data):
+            raise CCacheFormatError("凭据缓存文件被截断")
+        chunk = self.data[self.offset:end]
+        self.offset = end
+        return chunk
+
+    def u8(self) -> int:
+        return self.take(1)[0]
+
+    def u16(self) -> int:
+        return _U16.unpack(self.take(2))[0]
+
+    def u32(self) -> int:
+        return _U32.unpack(self.take(4))[0]
+
+    def counted(self) -> bytes:
+        return self.take(self.u32())
+
+    def skip_counted(self):
+        self.take(self.u32())
+
+    def principal(self) -> Principal:
+        name_type = self.u32()
+        count = self.u32()
+        realm = self.counted().decode('utf-8', 'replace')
+        components = tuple(self.counted().decode('utf-8', 'replace') for _ in range(count))
+        return Principal(name_type, realm, components)
+
+    def at_end(self) -> bool:
+        return self.offset >= len(self.data)
+
+
+def parse_ccache(data: bytes) -> CredentialCache:
+    """
+    解析MIT FILE凭据缓存
+
+    Args:
+        data: 缓存文件内容
+
+    Returns:
+        CredentialCache: 默认主体和票据时间
+    """
+    reader = _Reader(data)
+    version = reader.u16()
+    if version not in (CCACHE_V3, CCACHE_V4):
+        raise CCacheFormatError(f"不支持的凭据缓存版本: {version:#06x}")
+
+    if version == CCACHE_V4:
+        # 头部标签（如KDC时间偏移），这里不需要
+        reader.take(reader.u16())
+
+    principal = reader.principal()
+    credentials = []
+    while not reader.at_end():
+        client = reader.principal()
+        server = reader.principal()
+        reader.u16()
+        if version == CCACHE_V3:
+            reader.u16()
+        reader.skip_counted()
+        authtime, starttime, endtime, renew_till = _TIMES.unpack(reader.take(_TIMES.size))
+        reader.u8()
+        flags = reader.u32()
+        for _ in range(reader.u32()):
+            reader.u16()
+            reader.skip_counted()
+        for _ in range(reader.u32()):
+            reader.u16()
+            reader.skip_counted()
+        reader.skip_counted()
+        reader.skip_counted()
+        credentials.append(Credential(client, server, authtime, starttime or authtime,
+                                      endtime, renew_till, flags))
+
+    return CredentialCache(version, principal, credentials)
+
+
+def ccache_path(ccname: Optional[str]) -> Optional[str]:
+    """
+    根据KRB5CCNAME得到FILE类型缓存的路径
+
+    Args:
+        ccname: KRB5CCNAME的值，为空时使用默认的/tmp/krb5cc_<uid>
+
+    Returns:
+        Optional[str]: 文件路径，非FILE类型（KEYRING、KCM、DIR等）时返回None。
+            未设置KRB5CCNAME且默认文件不存在时也返回None：默认缓存类型由krb5.conf的
+            default_ccache_name决定，可能是KEYRING或KCM，只能交给klist判断
+    """
+    if not ccname:
+        path = f"/tmp/krb5cc_{os.getuid()}"
+        return path if os.path.exists(path) else None
+    if ccname.startswith('FILE:'):
+        return ccname[len('FILE:'):]
+    if ':' in ccname.split('/', 1)[0]:
+        return None
+    return ccname
+
+
+class CredentialCacheReader:
+    """
+    带stat检查的凭据缓存读取器
+
+    文件的inode、修改时间和大小都未变化时直接返回上次的解析结果，
+    票据状态检查只需要一次stat调用。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cache: Dict[str, Tuple[Tuple[int, int, int], CredentialCache]] = {}
+
+    def read(self, path: str) -> CredentialCache:
+        """
+        读取凭据缓存
+
+        Args:
+            path: 缓存文件路径
+
+        Returns:
+            CredentialCache: 解析结果
+
+        Raises:
+            FileNotFoundError: 缓存文件不存在
+            CCacheFormatError: 文件格式无法解析
+        """
+        stat = os.stat(path)
+        stamp = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            cached = self._cache.get(path)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+
+        with open(path, 'rb') as f:
+            ccache = parse_ccache(f.read())
+        with self._lock:
+            self._cache[path] = (stamp, ccache)
+        return ccache
+
+    def invalidate(self, path: Optional[str] = None):
+        """清除缓存的解析结果"""
+        with self._lock:
+            if path is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(path, None)
+
+
+class CCacheManager:
+    """
+    按主体隔离的凭据缓存管理
+
+    每个主体（或Web会话）在受管目录下使用独立的FILE缓存，并发登录不会相互覆盖票据，
+    kdestroy也只销毁对应的缓存。内存索引记录每个缓存的到期时间，过期缓存定期删除；
+    目录中其他进程留下的、超过TTL未修改的缓存文件同样会被清理。
+    """
+
+    def __init__(self, directory: Optional[str] = None, ttl: Optional[float] = None,
+                 cleanup_interval: Optional[float] = None):
+        self.directory = directory or os.getenv(
+            'KERBEROS_CCACHE_DIR', os.path.join(tempfile.gettempdir(), 'kerberos_ccaches'))
+        self.ttl = ttl if ttl is not None else float(os.getenv('KERBEROS_CCACHE_TTL', 36000))
+        self.cleanup_interval = cleanup_interval if cleanup_interval is not None else \
+            float(os.getenv('KERBEROS_CCACHE_CLEANUP_INTERVAL', 60))
+        self._lock = threading.Lock()
+        # 缓存所有者 -> (文件路径, 到期时间)
+        self._index: Dict[str, Tuple[str, float]] = {}
+        self._last_cleanup = 0.0
+        os.makedirs(self.directory, mode=0o700, exist_ok=True)
+
+    def path_for(self, owner: str) -> str:
+        """
+        获取缓存所有者对应的缓存文件路径
+
+        Args:
+            owner: 主体名称或会话ID
+
+        Returns:
+            str: 缓存文件路径
+        """
+        safe = ''.join(c if c.isalnum() or c in '._-' else '_' for c in owner)[:64]
+        digest = hashlib.blake2b(owner.encode('utf-8'), digest_size=6).hexdigest()
+        return os.path.join(self.directory, f"krb5cc_{safe}_{digest}")
+
+    def ccname(self, owner: str) -> str:
+        """获取缓存所有者对应的KRB5CCNAME值"""
+        return f"FILE:{self.path_for(owner)}"
+
+    def env_for(self, base_env: Dict[str, str], owner: str) -> Dict[str, str]:
+        """
+        生成使用隔离缓存的子进程环境变量
+
+        Args:
+            base_env: 基础环境变量
+            owner: 主体名称或会话ID
+
+        Returns:
+            Dict[str, str]: 设置了KRB5CCNAME的环境变量副本
+        """
+        env = dict(base_env)
+        env['KRB5CCNAME'] = self.ccname(owner)
+        return env
+
+    def register(self, owner: str, expires_at: Optional[float] = None):
+        """
+        登录成功后登记缓存
+
+        Args:
+            owner: 主体名称或会话ID
+            expires_at: 票据到期时间（epoch秒），默认当前时间加TTL
+        """
+        now = time.time()
+        if expires_at is None:
+            expires_at = now + self.ttl
+        with self._lock:
+            self._index[owner] = (self.path_for(owner), min(expires_at, now + self.ttl))
+        if now - self._last_cleanup >= self.cleanup_interval:
+            self.cleanup(now)
+
+    def lookup(self, owner: str) -> Optional[str]:
+        """
+        查找未过期的缓存
+
+        Returns:
+            Optional[str]: 缓存文件路径，未登记或已过期时返回None
+        """
+        with self._lock:
+            entry = self._index.get(owner)
+        if entry is None or entry[1] <= time.time():
+            return None
+        return entry[0]
+
+    def remove(self, owner: str) -> bool:
+        """
+        删除缓存所有者的缓存文件和索引
+
+        Returns:
+            bool: 是否删除了缓存文件
+        """
+        with self._lock:
+            self._index.pop(owner, None)
+        try:
+            os.remove(self.path_for(owner))
+            return True
+        except FileNotFoundError:
+            return False
+
+    def cleanup(self, now: Optional[float] = None) -> int:
+        """
+        删除过期的缓存
+
+        Args:
+            now: 当前时间（epoch秒）
+
+        Returns:
+            int: 删除的缓存文件数量
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            self._last_cleanup = now
+            expired = {path for path, expires_at in self._index.values() if expires_at <= now}
+            self._index = {owner: entry for owner, entry in self._index.items() if entry[1] > now}
+            active = {path for path, _ in self._index.values()}
+
+        removed = 0
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return 0
+        for name in names:
+            path = os.path.join(self.directory, name)
+            if not name.startswith('krb5cc_') or path in active:
+                continue
+            try:
+                # 本进程未登记的缓存可能属于其他工作进程，只清理超过TTL未修改的文件
+                if path in expired or os.stat(path).st_mtime + self.ttl <= now:
+                    os.remove(path)
+                    removed += 1
+            except FileNotFoundError:
+                continue
+        return removed
+
+    def __len__(self):
+        return len(self._index)
@@ -0,0 +1,151 @@
+import base64
+import json
+import struct
+from datetime import datetime, timezone
+from typing import Dict, Any
+
+# 二进制票据格式（版本1）:
+#   magic(1) | version(1) | 签发时间毫秒(8) | 有效期秒(4)
+#   | client_id长度(2) + client_id | server_id长度(2) + server_id
+#   | session_key长度(1) + 原始会话密钥
+TICKET_MAGIC = 0x4B
+TICKET_VERSION = 1
+
+_HEADER = struct.Struct('>BBQI')
+_U16 = struct.Struct('>H')
+
+# Fernet令牌的前6个字符固定为版本字节0x80加高位为0的时间戳
+FERNET_TOKEN_PREFIX = 'gAAAAA'
+
+# 旧版票据在Fernet令牌外又做了一次标准base64编码
+LEGACY_TICKET_PREFIX = base64.b64encode(FERNET_TOKEN_PREFIX.encode()).decode()
+
+
+class TicketFormatError(ValueError):
+    """票据格式错误"""
+
+
+def strict_b64decode(data: str, urlsafe: bool = False) -> bytes:
+    """
+    严格解码base64，拒绝非字母表字符、多余的空白或填充以及非规范编码
+
+    同一段字节只有一种可接受的编码，票据和认证器的缓存键因此不会被改写绕过。
+
+    Args:
+        data: base64文本
+        urlsafe: 是否为URL安全字母表
+
+    Returns:
+        bytes: 解码后的字节
+    """
+    raw = data.encode('ascii')
+    decoded = base64.b64decode(raw, altchars=b'-_' if urlsafe else None, validate=True)
+    encoded = base64.urlsafe_b64encode(decoded) if urlsafe else base64.b64encode(decoded)
+    if encoded != raw:
+        raise ValueError('非规范的base64编码')
+    return decoded
+
+
+def to_epoch(timestamp: datetime) -> float:
+    """将datetime转换为epoch秒（无时区的datetime按UTC处理）"""
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return timestamp.timestamp()
+
+
+def encode_ticket(client_id: str, server_id: str, session_key: bytes,
+                  issued_at: float, lifetime: float) -> bytes:
+    """
+    将票据字段编码为二进制格式
+
+    Args:
+        client_id: 客户端ID
+        server_id: 服务端ID
+        session_key: Fernet格式（URL安全base64）的会话密钥
+        issued_at: 签发时间（epoch秒）
+        lifetime: 有效期（秒）
+
+    Returns:
+        bytes: 二进制票据明文
+    """
+    client = client_id.encode('utf-8')
+    server = server_id.encode('utf-8')
+    raw_key = base64.urlsafe_b64decode(session_key)
+    if len(client) > 0xFFFF or len(server) > 0xFFFF or len(raw_key) > 0xFF:
+        raise TicketFormatError('票据字段过长')
+
+    return b''.join((
+        _HEADER.pack(TICKET_MAGIC, TICKET_VERSION,
+                     int(issued_at * 1000), int(lifetime)),
+        _U16.pack(len(client)), client,
+        _U16.pack(len(server)), server,
+        bytes((len(raw_key),)), raw_key,
+    ))
+
+
+def decode_ticket(data: bytes) -> Dict[str, Any]:
+    """
+    解码二进制票据明文
+
+    Args:
+        data: 二进制票据明文
+
+    Returns:
+        Dict[str, Any]: 票据数据，时间字段均为epoch秒
+    """
+    try:
+        magic, version, issued_ms, lifetime = _HEADER.unpack_from(data, 0)
+        if magic != TICKET_MAGIC or version != TICKET_VERSION:
+            raise TicketFormatError(f'不支持的票据版本: {magic:#x}/{version}')
+
+        offset = _HEADER.size
+        (length,) = _U16.unpack_from(data, offset)
+        offset += 2
+        client_id = data[offset:offset + length].decode('utf-8')
+        offset += length
+
+        (length,) = _U16.unpack_from(data, offset)
+        offset += 2
+        server_id = data[offset:offset + length].decode('utf-8')
+        offset += length
+
+        length = data[offset]
+        offset += 1
+        raw_key = data[offset:offset + length]
+        if len(raw_key) != length or offset + length != len(data):
+            raise TicketFormatError('票据长度不匹配')
+    except (struct.error, IndexError, UnicodeDecodeError) as e:
+        raise TicketFormatError(f'票据解析失败: {e}') from e
+
+    issued_at = issued_ms / 1000.0
+    return {
+        'client_id': client_id,
+        'server_id': server_id,
+        'session_key': base64.urlsafe_b64encode(raw_key).decode(),
+        'timestamp': issued_at,
+        'lifetime': float(lifetime),
+        'expires_at': issued_at + lifetime,
+    }
+
+
+def decode_legacy_ticket(data: bytes) -> Dict[str, Any]:
+    """
+    解码旧版JSON票据明文（迁移期间兼容）
+
+    Args:
+        data: JSON票据明文
+
+    Returns:
+        Dict[str, Any]: 与decode_ticket相同结构的票据数据
+    """
+    ticket_data = json.loads(data.decode())
+    issued_at = to_epoch(datetime.fromisoformat(ticket_data['timestamp']))
+    lifetime = float(ticket_data['lifetime'])
+    return {
+        'client_id': ticket_data['client_id'],
+        'server_id': ticket_data['server_id'],
+        'session_key': ticket_data['session_key'],
+        'timestamp': issued_at,
+        'lifetime': lifetime,
+        'expires_at': issued_at + lifetime,
+    }
@@ -1,57 +1,129 @@
 from cryptography.fernet import Fernet
 from datetime import datetime, timedelta
-from typing import Tuple, Dict, Any
+from typing import Tuple, Dict, Any, Optional
 import base64
 import json
 import os
+import time
+import weakref
+from .cache import CipherCache, TicketCache, ticket_digest
+from .codec import (
+    LEGACY_TICKET_PREFIX,
+    decode_legacy_ticket,
+    decode_ticket,
+    encode_ticket,
+    strict_b64decode,
+    to_epoch,
+)
+from .keyring import KeyRing
+from .suites import TicketCipher
+
+def encode_authenticator(client_id: str, timestamp: datetime, cipher: TicketCipher) -> str:
+    """
+    使用会话密钥对应的加密对象编码认证器（客户端无需完整的KerberosCrypto）
+    """
+    auth_data = {
+        'client_id': client_id,
+        'timestamp': timestamp.isoformat()
+    }
+    
+    encrypted_data = cipher.encrypt(json.dumps(auth_data).encode())
+    return base64.b64encode(encrypted_data).decode()
 
 class KerberosCrypto:
-    def __init__(self):
-        # 在实际环境中，这些密钥应该安全存储
-        self.as_key = Fernet.generate_key()
-        self.tgs_key = Fernet.generate_key()
-        self.service_key = Fernet.generate_key()
+    def __init__(self, keyring: Optional[KeyRing] = None, cipher_suite: Optional[str] = None):
+        # 加密套件：fernet（默认）、aes-gcm、chacha20-poly1305
+        self.cipher_suite = cipher_suite or os.getenv('KERBEROS_CIPHER_SUITE', 'fernet')
+        
+        # 长期密钥来自密钥环，配置KERBEROS_KEYRING_PATH时在所有worker之间共享
+        self.keyring = keyring if keyring is not None else KeyRing.from_env()
+        # 已构建的加密对象及其用途，调用方持有的旧对象在密钥重新加载后据此换成新对象
+        self._cipher_purposes = weakref.WeakKeyDictionary()
+        self._load_keys()
+        
+        # 认证器允许的时钟偏差（秒）
+        self.clock_skew = int(os.getenv('KERBEROS_CLOCK_SKEW', 300))
+        
+        # 已验证票据缓存，重复验证同一票据时跳过解密
+        self.ticket_cache = TicketCache()
+        
+        # 会话密钥加密对象缓存，TGS/服务会话密钥重复使用时跳过密钥解析
+        self.cipher_cache = CipherCache(lambda key: TicketCipher([key], self.cipher_suite))
+
+    def _load_keys(self):
+        """根据密钥环构建加密对象，主密钥用于加密，所有密钥和套件均可用于解密"""
+        keys = self.keyring.keys
+        self.as_key = keys['as'][0]
+        self.tgs_key = keys['tgs'][0]
+        self.service_key = keys['service'][0]
         
-        self.as_crypto = Fernet(self.as_key)
-        self.tgs_crypto = Fernet(self.tgs_key)
-        self.service_crypto = Fernet(self.service_key)
+        self.as_crypto = TicketCipher(keys['as'], self.cipher_suite)
+        self.tgs_crypto = TicketCipher(keys['tgs'], self.cipher_suite)
+        self.service_crypto = TicketCipher(keys['service'], self.cipher_suite)
+        for purpose in ('as', 'tgs', 'service'):
+            self._cipher_purposes[getattr(self, f'{purpose}_crypto')] = purpose
+
+    def refresh_keys(self) -> bool:
+        """检查密钥环是否被轮换，轮换后重建加密对象"""
+        if self.keyring.refresh():
+            self._load_keys()
+            return True
+        return False
+
+    def _current_cipher(self, crypto: TicketCipher) -> TicketCipher:
+        """将调用方传入的（可能已过期的）长期密钥加密对象换成当前对象"""
+        purpose = self._cipher_purposes.get(crypto)
+        return getattr(self, f'{purpose}_crypto') if purpose is not None else crypto
 
     def create_session_key(self):
         """生成会话密钥"""
         return Fernet.generate_key()
 
     def create_ticket(self, client_id: str, server_id: str, session_key: bytes,
-                     timestamp: datetime, lifetime: timedelta, crypto: Fernet) -> str:
+                     timestamp: datetime, lifetime: timedelta, crypto: TicketCipher) -> str:
         """
         创建票据
         """
-        ticket_data = {
-            'client_id': client_id,
-            'server_id': server_id,
-            'session_key': session_key.decode(),
-            'timestamp': timestamp.isoformat(),
-            'lifetime': lifetime.total_seconds()
-        }
+        self.refresh_keys()
+        crypto = self._current_cipher(crypto)
+        ticket = encode_ticket(
+            client_id,
+            server_id,
+            session_key,
+            to_epoch(timestamp),
+            lifetime.total_seconds()
+        )
         
-        # 加密票据数据
-        encrypted_data = crypto.encrypt(json.dumps(ticket_data).encode())
-        return base64.b64encode(encrypted_data).decode()
+        # 密文本身已是URL安全的base64，头部记录了加密套件，无需再次编码
+        return crypto.encrypt(ticket).decode()
 
-    def verify_ticket(self, ticket: str, crypto: Fernet) -> Tuple[bool, Dict[str, Any]]:
+    def verify_ticket(self, ticket: str, crypto: TicketCipher) -> Tuple[bool, Dict[str, Any]]:
         """
         验证票据
         """
+        self.refresh_keys()
+        crypto = self._current_cipher(crypto)
         try:
-            encrypted_data = base64.b64decode(ticket.encode())
-            decrypted_data = crypto.decrypt(encrypted_data)
-            ticket_data = json.loads(decrypted_data.decode())
+            digest = ticket_digest(ticket)
+            cached = self.ticket_cache.get(digest, crypto)
+            if cached is not None:
+                return True, cached
+                
+            if ticket.startswith(LEGACY_TICKET_PREFIX):
+                # 旧版票据：base64(Fernet(JSON))
+                encrypted_data = strict_b64decode(ticket)
+                strict_b64decode(encrypted_data.decode('ascii'), urlsafe=True)
+                ticket_data = decode_legacy_ticket(crypto.decrypt(encrypted_data))
+            else:
+                # 解密前拒绝非规范编码，否则改写后的票据能通过验证却绕过缓存
+                strict_b64decode(ticket, urlsafe=True)
+                ticket_data = decode_ticket(crypto.decrypt(ticket.encode()))
             
             # 检查票据是否过期
-            timestamp = datetime.fromisoformat(ticket_data['timestamp'])
-            lifetime = timedelta(seconds=ticket_data['lifetime'])
-            if datetime.utcnow() > timestamp + lifetime:
+            if time.time() > ticket_data['expires_at']:
                 return False, {'error': '票据已过期'}
                 
+            self.ticket_cache.put(digest, crypto, ticket_data)
             return True, ticket_data
             
         except Exception as e:
@@ -62,30 +134,25 @@ class KerberosCrypto:
         """
         创建认证器
         """
-        auth_data = {
-            'client_id': client_id,
-            'timestamp': timestamp.isoformat()
-        }
-        
-        crypto = Fernet(session_key)
-        encrypted_data = crypto.encrypt(json.dumps(auth_data).encode())
-        return base64.b64encode(encrypted_data).decode()
+        return encode_authenticator(client_id, timestamp, self.cipher_cache.get(session_key))
 
     def verify_authenticator(self, authenticator: str, session_key: bytes) -> Tuple[bool, Dict[str, Any]]:
         """
         验证认证器
         """
         try:
-            crypto = Fernet(session_key)
-            encrypted_data = base64.b64decode(authenticator.encode())
+            crypto = self.cipher_cache.get(session_key)
+            encrypted_data = strict_b64decode(authenticator)
+            strict_b64decode(encrypted_data.decode('ascii'), urlsafe=True)
             decrypted_data = crypto.decrypt(encrypted_data)
             auth_data = json.loads(decrypted_data.decode())
             
-            # 检查时间戳是否在允许范围内（例如5分钟）
-            timestamp = datetime.fromisoformat(auth_data['timestamp'])
-            if datetime.utcnow() - timestamp > timedelta(minutes=5):
+            # 检查时间戳是否在允许的时钟偏差范围内
+            issued_at = to_epoch(datetime.fromisoformat(auth_data['timestamp']))
+            if abs(time.time() - issued_at) > self.clock_skew:
                 return False, {'error': '认证器已过期'}
                 
+            auth_data['issued_at'] = issued_at
             return True, auth_data
             
         except Exception as e:
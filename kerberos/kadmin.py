@@ -0,0 +1,422 @@
+import csv
+import io
+import json
+import logging
+import os
+import re
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# kadmin.local的输出格式
+_CREATED = re.compile(r'Principal "([^"]+)" created')
+_FAILED = re.compile(r'^(?:add_principal: )?(.*?) while creating "([^"]+)"', re.MULTILINE)
+
+# 进度回调: (已完成数量, 总数量)
+ProgressCallback = Callable[[int, int], None]
+
+
+class KadminError(Exception):
+    """kadmin执行错误"""
+
+
+class ProvisionResult(NamedTuple):
+    """单个主体的创建结果"""
+    principal: str
+    status: str  # created、exists或error
+    error: Optional[str] = None
+
+    @property
+    def success(self) -> bool:
+        return self.status != 'error'
+
+
+def quote_arg(value: str) -> str:
+    """按kadmin命令行规则给参数加引号（双引号内的双引号写两次）"""
+    if '\n' in value or '\r' in value:
+        raise ValueError('参数不能包含换行符')
+    return '"' + value.replace('"', '""') + '"'
+
+
+def full_principal_name(principal: str, realm: str) -> str:
+    """补全主体的领域"""
+    return principal if '@' in principal else f"{principal}@{realm}"
+
+
+def parse_principal_records(data: str, fmt: str) -> Iterator[Tuple[str, str]]:
+    """
+    解析批量上传的主体列表
+
+    Args:
+        data: 文件内容
+        fmt: csv或jsonl。CSV可带principal,password表头，否则取前两列；
+            JSONL每行一个{"principal": ..., "password": ...}对象
+
+    Returns:
+        Iterator[Tuple[str, str]]: (主体, 密码)
+    """
+    if fmt == 'jsonl':
+        for line_no, line in enumerate(data.splitlines(), 1):
+            if not line.strip():
+                continue
+            try:
+                item = json.loads(line)
+                yield item.get('principal') or item['username'], item['password']
+            except (ValueError, KeyError, AttributeError) as e:
+                raise ValueError(f"第{line_no}行格式错误: {str(e)}") from e
+    elif fmt == 'csv':
+        rows = csv.reader(io.StringIO(data))
+        first = next(rows, None)
+        if first is None:
+            return
+        header = [column.strip().lower() for column in first]
+        if 'password' in header and ('principal' in header or 'username' in header):
+            name_index = header.index('principal' if 'principal' in header else 'username')
+            password_index = header.index('password')
+        else:
+            name_index, password_index = 0, 1
+            rows = iter([first] + list(rows))
+        for line_no, row in enumerate(rows, 1):
+            if not row or not any(cell.strip() for cell in row):
+                continue
+            if len(row) <= max(name_index, password_index):
+                raise ValueError(f"第{line_no}行缺少列")
+            yield row[name_index].strip(), row[password_index]
+    else:
+        raise ValueError(f"不支持的格式: {fmt}")
+
+
+class KadminProvisioner:
+    """
+    通过kadmin.local批量创建主体
+
+    每批主体的addprinc命令写入同一个kadmin.local进程的标准输入，按主体名称从输出中
+    匹配每个主体的结果。已存在的主体报告为exists，不需要事先逐个getprinc。
+    多批之间可以由少量并行会话处理，默认只用一个会话以避免KDB锁竞争。
+    """
+
+    def __init__(self, command: Optional[str] = None, env: Optional[Dict[str, str]] = None,
+                 batch_size: Optional[int] = None, sessions: Optional[int] = None,
+                 timeout: Optional[float] = None):
+        self.command = command or os.getenv('KADMIN_LOCAL_PATH', 'kadmin.local')
+        self.env = env
+        self.batch_size = batch_size or int(os.getenv('KADMIN_BATCH_SIZE', 500))
+        self.sessions = sessions or int(os.getenv('KADMIN_SESSIONS', 1))
+        self.timeout = timeout if timeout is not None else float(os.getenv('KADMIN_TIMEOUT', 600))
+
+    def run_batch(self, items: List[Tuple[str, str]]) -> List[ProvisionResult]:
+        """
+        在一个kadmin.local会话中创建一批主体
+
+        Args:
+            items: (完整主体名称, 密码) 列表
+
+        Returns:
+            List[ProvisionResult]: 与输入顺序一致的结果
+        """
+        commands = ''.join(
+            f"addprinc -pw {quote_arg(password)} {quote_arg(principal)}\n"
+            for principal, password in items
+        )
+        try:
+            process = subprocess.run(
+                [self.command],
+                input=commands.encode('utf-8'),
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                env=self.env,
+                timeout=self.timeout
+            )
+        except (OSError, subprocess.TimeoutExpired) as e:
+            raise KadminError(f"执行kadmin.local失败: {str(e)}") from e
+
+        output = process.stdout.decode('utf-8', 'replace')
+        errors = process.stderr.decode('utf-8', 'replace')
+        created = set(_CREATED.findall(output))
+        failed = {principal: message for message, principal in _FAILED.findall(errors)}
+
+        results = []
+        for principal, _ in items:
+            if principal in created:
+                results.append(ProvisionResult(principal, 'created'))
+            elif principal in failed:
+                message = failed[principal]
+                if 'already exists' in message.lower():
+                    results.append(ProvisionResult(principal, 'exists'))
+                else:
+                    results.append(ProvisionResult(principal, 'error', message))
+            else:
+                tail = errors.strip().splitlines()[-1:] or [f"退出码{process.returncode}"]
+                results.append(ProvisionResult(principal, 'error', f"kadmin.local没有返回结果: {tail[0]}"))
+        return results
+
+    def provision(self, items: Iterable[Tuple[str, str]], realm: str = 'HADOOP.COM',
+                  progress: Optional[ProgressCallback] = None) -> List[ProvisionResult]:
+        """
+        批量创建主体
+
+        Args:
+            items: (主体, 密码) 序列，主体未包含领域时使用realm
+            realm: 默认领域
+            progress: 进度回调，每完成一批调用一次
+
+        Returns:
+            List[ProvisionResult]: 与输入顺序一致的结果
+        """
+        results: List[Optional[ProvisionResult]] = []
+        pending: List[Tuple[int, str, str]] = []
+        seen = set()
+        for principal, password in items:
+            index = len(results)
+            results.append(None)
+            if not principal:
+                results[index] = ProvisionResult('', 'error', '主体名称不能为空')
+                continue
+            principal = full_principal_name(principal, realm)
+            if principal in seen:
+                results[index] = ProvisionResult(principal, 'error', '重复的主体')
+                continue
+            if not password:
+                results[index] = ProvisionResult(principal, 'error', '密码不能为空')
+                continue
+            try:
+                quote_arg(principal)
+                quote_arg(password)
+            except ValueError as e:
+                results[index] = ProvisionResult(principal, 'error', str(e))
+                continue
+            seen.add(principal)
+            pending.append((index, principal, password))
+
+        total = len(results)
+        done = total - len(pending)
+        lock = threading.Lock()
+        batches = [pending[i:i + self.batch_size] for i in range(0, len(pending), self.batch_size)]
+
+        def run(batch):
+            nonlocal done
+            try:
+                batch_results = self.run_batch([(principal, password) for _, principal, password in batch])
+            except KadminError as e:
+                batch_results = [ProvisionResult(principal, 'error', str(e)) for _, principal, _ in batch]
+            with lock:
+                for (index, _, _), result in zip(batch, batch_results):
+                    results[index] = result
+                done += len(batch)
+                if progress is not None:
+                    progress(done, total)
+
+        if len(batches) > 1 and self.sessions > 1:
+            with ThreadPoolExecutor(max_workers=self.sessions, thread_name_prefix='kadmin') as executor:
+                list(executor.map(run, batches))
+        else:
+            for batch in batches:
+                run(batch)
+
+        created = sum(1 for result in results if result.status == 'created')
+        logger.info(f"批量创建主体完成: 共{total}个，新建{created}个，"
+                    f"失败{sum(1 for result in results if not result.success)}个")
+        return results
+
+
+def parse_getprinc(output: str) -> Optional[Dict[str, Any]]:
+    """
+    解析kadmin getprinc的输出
+
+    Args:
+        output: getprinc命令的标准输出
+
+    Returns:
+        Optional[Dict[str, Any]]: 原始字段加上kvno、flags、expiration，主体不存在时返回None
+    """
+    info: Dict[str, Any] = {}
+    kvno = None
+    for line in output.split('\n'):
+        if ':' not in line:
+            continue
+        key, value = line.split(':', 1)
+        key, value = key.strip(), value.strip()
+        if key == 'Key' and kvno is None:
+            match = re.match(r'vno (\d+)', value)
+            if match:
+                kvno = int(match.group(1))
+        info[key] = value
+    if 'Principal' not in info:
+        return None
+
+    expiration = info.get('Expiration date')
+    info['kvno'] = kvno
+    info['flags'] = info.get('Attributes', '').split()
+    info['expiration'] = None if not expiration or expiration == '[never]' else expiration
+    return info
+
+
+def parse_listprincs(output: str) -> List[str]:
+    """解析kadmin listprincs的输出"""
+    return [line.strip() for line in output.split('\n')
+            if line.strip() and '@' in line and ' ' not in line.strip()]
+
+
+class PrincipalInfoCache:
+    """
+    主体元数据缓存
+
+    缓存getprinc的结果（是否存在、标志、过期时间、kvno），条目在TTL后失效。
+    warm()用一次listprincs加载全部主体名称，之后列表中没有的主体在TTL内直接视为不存在；
+    列表过期后exists()在后台线程中重新执行listprincs，调用方不等待（同一时间只有一个线程执行，
+    失败后等待一个TTL再试）。get()的查询结果（包括主体不存在和查询失败）都缓存一个TTL。
+    创建、删除或修改主体后调用invalidate()写穿失效。
+    """
+
+    def __init__(self, loader: Callable[[str], Optional[Dict[str, Any]]],
+                 lister: Optional[Callable[[], Iterable[str]]] = None,
+                 ttl: Optional[float] = None):
+        self.loader = loader
+        self.lister = lister
+        self.ttl = ttl if ttl is not None else float(os.getenv('KERBEROS_PRINCIPAL_CACHE_TTL', 300))
+        self._lock = threading.Lock()
+        # 主体 -> (过期时间, 元数据或None)
+        self._entries: Dict[str, Tuple[float, Optional[Dict[str, Any]]]] = {}
+        # 查询失败的主体 -> (下次重试时间, 错误信息)
+        self._failures: Dict[str, Tuple[float, str]] = {}
+        # listprincs列出的全部主体及其过期时间
+        self._known: Set[str] = set()
+        self._known_until = 0.0
+        # 是否预热过（预热过的列表过期后自动重新预热），以及重新预热失败后的下次重试时间
+        self._warmed = False
+        self._retry_at = 0.0
+        # 正在后台重新预热的线程
+        self._warm_thread: Optional[threading.Thread] = None
+        # 预热后失效过的主体，不能再根据预热列表判断
+        self._stale: Set[str] = set()
+
+    def warm(self) -> int:
+        """
+        用一次listprincs预热缓存
+
+        Returns:
+            int: 加载的主体数量
+        """
+        if self.lister is None:
+            return 0
+        names = set(self.lister())
+        with self._lock:
+            self._known = names
+            self._known_until = time.monotonic() + self.ttl
+            self._warmed = True
+            self._stale.clear()
+        logger.info(f"主体缓存预热完成: {len(names)}个主体")
+        return len(names)
+
+    def _rewarm(self):
+        """后台重新执行listprincs，失败后等待一个TTL再试"""
+        try:
+            self.warm()
+        except Exception as e:
+            logger.warning(f"重新预热主体缓存失败: {str(e)}")
+            with self._lock:
+                self._retry_at = time.monotonic() + self.ttl
+        finally:
+            with self._lock:
+                self._warm_thread = None
+
+    def exists(self, principal: str) -> Optional[bool]:
+        """
+        只查缓存判断主体是否存在，不执行getprinc或listprincs
+
+        预热列表过期时启动后台线程重新预热，本次调用不等待其结果。
+
+        Returns:
+            Optional[bool]: 是否存在，缓存中没有该主体的信息时返回None（调用方应按未知处理）
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(principal)
+            if entry is not None and entry[0] > now:
+                return entry[1] is not None
+            if self._known_until > now and principal not in self._stale:
+                return principal in self._known
+            if self._warmed and self.lister is not None and self._warm_thread is None and \
+                    self._known_until <= now and self._retry_at <= now:
+                self._warm_thread = threading.Thread(target=self._rewarm, name='principal-cache-warm',
+                                                     daemon=True)
+                self._warm_thread.start()
+        return None
+
+    def get(self, principal: str) -> Optional[Dict[str, Any]]:
+        """
+        获取主体元数据，缓存未命中时调用loader
+
+        Returns:
+            Optional[Dict[str, Any]]: 主体元数据，主体不存在时返回None
+
+        Raises:
+            KadminError: 查询失败，或一个TTL内已经查询失败过
+        """
+        hit, info = self.peek(principal)
+        if hit:
+            return info
+        with self._lock:
+            failure = self._failures.get(principal)
+        if failure is not None and failure[0] > time.monotonic():
+            raise KadminError(f"查询主体{principal}失败（稍后重试）: {failure[1]}")
+        try:
+            info = self.loader(principal)
+        except Exception as e:
+            with self._lock:
+                self._failures[principal] = (time.monotonic() + self.ttl, str(e) or type(e).__name__)
+            raise KadminError(f"查询主体{principal}失败: {str(e) or type(e).__name__}") from e
+        self.put(principal, info)
+        return info
+
+    def peek(self, principal: str) -> Tuple[bool, Optional[Dict[str, Any]]]:
+        """
+        只查缓存获取主体元数据
+
+        Returns:
+            Tuple[bool, Optional[Dict[str, Any]]]: (是否命中, 主体元数据)
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(principal)
+            if entry is not None and entry[0] > now:
+                return True, entry[1]
+            if self._known_until > now and principal not in self._known and \
+                    principal not in self._stale:
+                return True, None
+        return False, None
+
+    def put(self, principal: str, info: Optional[Dict[str, Any]]):
+        """写入主体元数据（None表示主体不存在）"""
+        with self._lock:
+            self._entries[principal] = (time.monotonic() + self.ttl, info)
+            self._failures.pop(principal, None)
+            self._stale.discard(principal)
+
+    def invalidate(self, principal: Optional[str] = None):
+        """
+        使主体的缓存失效
+
+        Args:
+            principal: 主体名称，为None时清空全部缓存
+        """
+        with self._lock:
+            if principal is None:
+                self._entries.clear()
+                self._failures.clear()
+                self._known = set()
+                self._known_until = 0.0
+                self._warmed = False
+                self._stale.clear()
+            else:
+                # 预热列表中该主体的状态不再可信，下次查询重新加载
+                self._entries.pop(principal, None)
+                self._failures.pop(principal, None)
+                self._stale.add(principal)
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,225 @@
+import json
+import logging
+import os
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+from cryptography.fernet import Fernet
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# 密钥用途：AS密钥、TGS密钥、服务密钥
+KEY_PURPOSES = ('as', 'tgs', 'service')
+
+KEYRING_VERSION = 1
+
+
+class KeyRing:
+    """
+    Kerberos长期密钥环
+
+    每种用途保存一组密钥，第一个为当前主密钥，其余为轮换前的旧密钥，
+    仍可用于验证已签发的票据。指定文件路径时，密钥环在所有worker之间共享：
+    进程启动时加载一次，之后只在检查间隔到达时stat文件判断是否被轮换。
+
+    轮换生成的新密钥先暂存一个检查间隔，期间只用于验证；此时所有worker都已加载到它，
+    到期后各worker在下次检查时把它提升为主密钥，其他worker签发的票据不会验证失败。
+    """
+
+    def __init__(self, path: Optional[str] = None, max_keys: Optional[int] = None,
+                 check_interval: Optional[float] = None):
+        self.path = path
+        self.max_keys = max_keys if max_keys is not None else \
+            int(os.getenv('KERBEROS_KEYRING_MAX_KEYS', 3))
+        self.check_interval = check_interval if check_interval is not None else \
+            float(os.getenv('KERBEROS_KEYRING_CHECK_INTERVAL', 30))
+
+        # 按使用顺序排列（主密钥在前），暂存中的新密钥排在主密钥之后
+        self.keys: Dict[str, List[bytes]] = {}
+        # 文件中的顺序（新密钥在前）及暂存密钥的提升时间（epoch秒）
+        self._stored: Dict[str, List[bytes]] = {}
+        self._staged: Dict[str, float] = {}
+        self._promote_at: Optional[float] = None
+        self._stamp = None
+        self._next_check = 0.0
+
+        if path is None:
+            # 未配置共享文件时使用进程内临时密钥
+            self.keys = {purpose: [Fernet.generate_key()] for purpose in KEY_PURPOSES}
+        else:
+            self._load_or_create()
+
+    @classmethod
+    def from_env(cls) -> 'KeyRing':
+        """根据KERBEROS_KEYRING_PATH环境变量创建密钥环"""
+        return cls(os.getenv('KERBEROS_KEYRING_PATH') or None)
+
+    def primary(self, purpose: str) -> bytes:
+        """获取指定用途的当前主密钥"""
+        return self.keys[purpose][0]
+
+    def _lock_path(self) -> str:
+        return f"{self.path}.lock"
+
+    def _locked(self):
+        lock_file = open(self._lock_path(), 'a')
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        return lock_file
+
+    def _file_stamp(self):
+        stat = os.stat(self.path)
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    def _read(self) -> Tuple[Dict[str, List[bytes]], Dict[str, float]]:
+        with open(self.path) as f:
+            data = json.load(f)
+        if data.get('version') != KEYRING_VERSION:
+            raise ValueError(f"不支持的密钥环版本: {data.get('version')}")
+        keys = {purpose: [key.encode() for key in data['keys'][purpose]]
+                for purpose in KEY_PURPOSES}
+        for purpose, purpose_keys in keys.items():
+            if not purpose_keys:
+                raise ValueError(f"密钥环缺少{purpose}密钥")
+            for key in purpose_keys:
+                Fernet(key)
+        staged = {purpose: float(promote_at) for purpose, promote_at in data.get('staged', {}).items()
+                  if purpose in KEY_PURPOSES}
+        return keys, staged
+
+    def _write(self, keys: Dict[str, List[bytes]], staged: Dict[str, float]):
+        data = {
+            'version': KEYRING_VERSION,
+            'keys': {purpose: [key.decode() for key in keys[purpose]] for purpose in KEY_PURPOSES},
+            'staged': staged,
+        }
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def _apply(self, keys: Dict[str, List[bytes]], staged: Dict[str, float]):
+        """按当前时间确定各用途的主密钥，暂存期内的新密钥只用于验证"""
+        now = time.time()
+        active = {}
+        for purpose, purpose_keys in keys.items():
+            if now < staged.get(purpose, 0) and len(purpose_keys) > 1:
+                active[purpose] = [purpose_keys[1], purpose_keys[0]] + purpose_keys[2:]
+            else:
+                active[purpose] = list(purpose_keys)
+        pending = [promote_at for promote_at in staged.values() if now < promote_at]
+        self._stored, self._staged = keys, staged
+        self._promote_at = min(pending) if pending else None
+        self.keys = active
+
+    def _load_or_create(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, mode=0o700, exist_ok=True)
+
+        with self._locked():
+            if os.path.exists(self.path):
+                self._apply(*self._read())
+            else:
+                keys = {purpose: [Fernet.generate_key()] for purpose in KEY_PURPOSES}
+                self._write(keys, {})
+                self._apply(keys, {})
+                logger.info(f"已创建Kerberos密钥环: {self.path}")
+            self._stamp = self._file_stamp()
+        self._next_check = time.monotonic() + self.check_interval
+
+    def refresh(self, force: bool = False) -> bool:
+        """
+        检查密钥环文件是否被轮换，需要时重新加载；暂存的新密钥到期时提升为主密钥
+
+        Args:
+            force: 忽略检查间隔立即检查
+
+        Returns:
+            bool: 密钥是否发生变化
+        """
+        if self.path is None:
+            return False
+        now = time.monotonic()
+        if not force and now < self._next_check:
+            return False
+        self._next_check = now + self.check_interval
+
+        try:
+            stamp = self._file_stamp()
+            if stamp == self._stamp:
+                if self._promote_at is None or time.time() < self._promote_at:
+                    return False
+                self._apply(self._stored, self._staged)
+                logger.info("暂存的Kerberos密钥已提升为主密钥")
+                return True
+            self._apply(*self._read())
+            self._stamp = stamp
+            logger.info(f"已重新加载Kerberos密钥环: {self.path}")
+            return True
+        except Exception as e:
+            logger.error(f"重新加载密钥环失败，继续使用当前密钥: {str(e)}")
+            return False
+
+    def rotate(self, purposes=KEY_PURPOSES):
+        """
+        轮换密钥：生成新密钥，旧密钥保留用于验证，超出max_keys的最旧密钥被移除
+
+        共享文件中的新密钥暂存一个检查间隔后才成为主密钥；进程内密钥环立即生效。
+
+        Args:
+            purposes: 需要轮换的密钥用途
+        """
+        if self.path is None:
+            for purpose in purposes:
+                self.keys[purpose] = ([Fernet.generate_key()] + self.keys[purpose])[:self.max_keys]
+            return
+
+        with self._locked():
+            if os.path.exists(self.path):
+                keys, staged = self._read()
+            else:
+                keys, staged = dict(self._stored), dict(self._staged)
+            now = time.time()
+            staged = {purpose: at for purpose, at in staged.items() if at > now}
+            promote_at = now + self.check_interval
+            for purpose in purposes:
+                keys[purpose] = ([Fernet.generate_key()] + keys[purpose])[:self.max_keys]
+                staged[purpose] = promote_at
+            self._write(keys, staged)
+            self._apply(keys, staged)
+            self._stamp = self._file_stamp()
+        logger.info(f"已轮换Kerberos密钥: {', '.join(purposes)}")
+
+
+def main():
+    """命令行入口: python -m kerberos.keyring [init|rotate] [用途...]"""
+    logging.basicConfig(level=logging.INFO)
+    path = os.getenv('KERBEROS_KEYRING_PATH')
+    if not path:
+        print("请设置KERBEROS_KEYRING_PATH环境变量")
+        return 1
+
+    command = sys.argv[1] if len(sys.argv) > 1 else 'init'
+    keyring = KeyRing(path)
+    if command == 'rotate':
+        keyring.rotate(tuple(sys.argv[2:]) or KEY_PURPOSES)
+    elif command != 'init':
+        print(f"未知命令: {command}")
+        return 1
+    for purpose in KEY_PURPOSES:
+        print(f"{purpose}: {len(keyring.keys[purpose])}个密钥")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,207 @@
+import argparse
+import asyncio
+import json
+import math
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from .crypto import KerberosCrypto
+from .mock_auth import MockKDC
+from .network import AsyncKerberosClient, KerberosNetworkServer
+from .servers import KerberosAS, KerberosTGS
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """计算百分位数（最近秩法）"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(pct / 100.0 * len(ordered)) - 1))
+    return ordered[index]
+
+
+async def run_load(host: str, port: int, transport: str = 'tcp', concurrency: int = 16,
+                   requests: int = 1000, username: str = 'test_user',
+                   password: str = 'test_password', services: Optional[List[str]] = None,
+                   timeout: float = 5.0) -> Dict[str, Any]:
+    """
+    并发执行AS+TGS交换并统计吞吐量与延迟
+
+    Args:
+        host: 服务器地址
+        port: 服务器端口
+        transport: tcp或udp
+        concurrency: 并发客户端数
+        requests: 交换总次数（每次交换包含一个AS请求和一个TGS请求）
+        username: 用户名
+        password: 密码
+        services: 请求的服务列表
+        timeout: 单个请求超时
+
+    Returns:
+        Dict[str, Any]: 统计结果，延迟单位为毫秒
+    """
+    services = services or ['hdfs', 'yarn', 'hive']
+    latencies = {'as': [], 'tgs': []}
+    errors = 0
+    remaining = requests
+
+    async def worker():
+        nonlocal remaining, errors
+        async with AsyncKerberosClient(host, port, transport, timeout=timeout) as client:
+            while remaining > 0:
+                remaining -= 1
+                try:
+                    start = time.perf_counter()
+                    success, tgt, session_key = await client.get_tgt(username, password)
+                    latencies['as'].append(time.perf_counter() - start)
+                    if not success:
+                        errors += 1
+                        continue
+
+                    start = time.perf_counter()
+                    success, _, _ = await client.get_service_tickets(username, tgt, session_key, services)
+                    latencies['tgs'].append(time.perf_counter() - start)
+                    if not success:
+                        errors += 1
+                except (asyncio.TimeoutError, OSError):
+                    errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    total = len(latencies['as']) + len(latencies['tgs'])
+    result = {
+        'transport': transport,
+        'concurrency': concurrency,
+        'exchanges': requests,
+        'requests': total,
+        'errors': errors,
+        'elapsed': elapsed,
+        'rps': total / elapsed if elapsed else 0.0,
+    }
+    for name, values in latencies.items():
+        result[f'{name}_p50_ms'] = percentile(values, 50) * 1000
+        result[f'{name}_p99_ms'] = percentile(values, 99) * 1000
+    return result
+
+
+def run_mock_load(kdc: MockKDC, concurrency: int = 16, requests: int = 1000,
+                  principals: int = 1000, services: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    对模拟KDC并发执行登录（AS）、服务票据（TGS）和票据验证
+
+    Args:
+        kdc: 模拟KDC，延迟和错误率在其上配置
+        concurrency: 并发线程数
+        requests: 登录总次数，每次登录后为每个服务获取并验证一张票据
+        principals: 合成主体数量，登录按序号轮流使用
+        services: 服务主体列表
+
+    Returns:
+        Dict[str, Any]: 与run_load相同格式的统计结果，另含verify延迟
+    """
+    services = services or ['hdfs/localhost', 'yarn/localhost', 'hive/localhost']
+    users = kdc.add_synthetic_principals(principals)
+
+    def exchange(index: int):
+        name, password = users[index % len(users)]
+        timings = {'as': [], 'tgs': [], 'verify': []}
+        errors = 0
+        start = time.perf_counter()
+        success, tgt, _ = kdc.as_req(name, password)
+        timings['as'].append(time.perf_counter() - start)
+        if not success:
+            return timings, 1
+        for service in services:
+            start = time.perf_counter()
+            success, ticket, _ = kdc.tgs_req(tgt.ticket, service)
+            timings['tgs'].append(time.perf_counter() - start)
+            if not success:
+                errors += 1
+                continue
+            start = time.perf_counter()
+            if not kdc.verify(ticket.ticket, service)[0]:
+                errors += 1
+            timings['verify'].append(time.perf_counter() - start)
+        return timings, errors
+
+    latencies = {'as': [], 'tgs': [], 'verify': []}
+    errors = 0
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='mock-load') as executor:
+        for timings, failed in executor.map(exchange, range(requests)):
+            errors += failed
+            for name, values in timings.items():
+                latencies[name].extend(values)
+    elapsed = time.perf_counter() - start
+
+    total = len(latencies['as']) + len(latencies['tgs'])
+    result = {
+        'transport': 'mock',
+        'concurrency': concurrency,
+        'exchanges': requests,
+        'requests': total,
+        'errors': errors,
+        'elapsed': elapsed,
+        'rps': total / elapsed if elapsed else 0.0,
+    }
+    for name, values in latencies.items():
+        result[f'{name}_p50_ms'] = percentile(values, 50) * 1000
+        result[f'{name}_p99_ms'] = percentile(values, 99) * 1000
+    return result
+
+
+async def _run_local(args) -> Dict[str, Any]:
+    crypto = KerberosCrypto()
+    server = KerberosNetworkServer(KerberosAS(crypto), KerberosTGS(crypto))
+    await server.start()
+    try:
+        port = server.udp_port if args.transport == 'udp' else server.tcp_port
+        return await run_load('127.0.0.1', port, args.transport, args.concurrency,
+                              args.requests, args.username, args.password, args.services)
+    finally:
+        await server.close()
+
+
+def main():
+    """命令行入口: python -m kerberos.loadgen [--host H --port P] [--transport tcp|udp] [--mock] ..."""
+    parser = argparse.ArgumentParser(description='Kerberos AS/TGS网络前端负载生成器')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, help='不指定时在本进程内启动服务器')
+    parser.add_argument('--transport', choices=['tcp', 'udp'], default='tcp')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--username', default='test_user')
+    parser.add_argument('--password', default='test_password')
+    parser.add_argument('--services', nargs='+', default=['hdfs', 'yarn', 'hive'])
+    parser.add_argument('--mock', action='store_true', help='使用进程内模拟KDC（MockKDC）')
+    parser.add_argument('--realm', default='HADOOP.COM', help='模拟KDC的领域')
+    parser.add_argument('--principals', type=int, default=1000, help='模拟KDC的合成主体数量')
+    parser.add_argument('--latency-ms', type=float, help='模拟KDC每个请求的延迟（毫秒）')
+    parser.add_argument('--error-rate', type=float, help='模拟KDC的错误注入比例（0-1）')
+    args = parser.parse_args()
+
+    if args.mock:
+        kdc = MockKDC(args.realm,
+                      latency=args.latency_ms / 1000.0 if args.latency_ms is not None else None,
+                      error_rate=args.error_rate)
+        result = run_mock_load(kdc, args.concurrency, args.requests, args.principals,
+                               [f"{service}/localhost" for service in args.services])
+    elif args.port is None:
+        result = asyncio.run(_run_local(args))
+    else:
+        result = asyncio.run(run_load(args.host, args.port, args.transport, args.concurrency,
+                                      args.requests, args.username, args.password, args.services))
+
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+    print(f"吞吐量: {result['rps']:.0f} 请求/秒, "
+          f"AS p99: {result['as_p99_ms']:.2f}ms, TGS p99: {result['tgs_p99_ms']:.2f}ms")
+    return 0 if result['errors'] == 0 else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
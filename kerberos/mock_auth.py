@@ -1,9 +1,252 @@
+import hmac
 import logging
 import os
-from typing import Optional, Tuple
+import random
+import secrets
+import threading
+import time
+from collections import defaultdict
+from typing import Callable, Dict, List, NamedTuple, Optional, Set, Tuple
+
+# 与MIT Kerberos客户端一致的错误信息
+ERR_UNKNOWN_PRINCIPAL = "Client '{}' not found in Kerberos database"
+ERR_PASSWORD_INCORRECT = "Password incorrect while getting initial credentials"
+ERR_KDC_UNREACHABLE = "Cannot contact any KDC for realm '{}'"
+ERR_TICKET_EXPIRED = "Ticket expired"
+ERR_TICKET_UNKNOWN = "Ticket not found in credentials cache"
+ERR_WRONG_SERVER = "Wrong principal in request"
+
+
+class MockTicket(NamedTuple):
+    """模拟KDC签发的票据"""
+    ticket: str
+    client: str
+    server: str
+    session_key: str
+    authtime: float
+    endtime: float
+    renew_till: float
+
+    def is_tgt(self) -> bool:
+        return self.server.startswith('krbtgt/')
+
+
+class MockKDC:
+    """
+    用于本地负载测试的模拟KDC
+
+    主体、票据都保存在内存字典中：票据按票据ID索引，并按客户端主体建立反向索引，
+    验证、销毁都不需要遍历。票据带有签发时间、到期时间和可续期截止时间，
+    过期票据与真实KDC一样被拒绝；每签发purge_interval张票据顺带清理一次过期票据，
+    长时间的负载测试中票据字典不会无限增长。可以批量生成数千个合成主体，
+    并按配置为每个请求注入延迟和错误（KDC不可达）。
+    """
+
+    def __init__(self, realm: str, ticket_lifetime: Optional[float] = None,
+                 renew_lifetime: Optional[float] = None, latency: Optional[float] = None,
+                 jitter: Optional[float] = None, error_rate: Optional[float] = None,
+                 purge_interval: Optional[int] = None, seed: Optional[int] = None, clock: Callable[[], float] = time.time,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.realm = realm
+        self.ticket_lifetime = ticket_lifetime if ticket_lifetime is not None else \
+            float(os.getenv('KERBEROS_MOCK_TICKET_LIFETIME', 36000))
+        self.renew_lifetime = renew_lifetime if renew_lifetime is not None else \
+            float(os.getenv('KERBEROS_MOCK_RENEW_LIFETIME', 7 * 86400))
+        # 延迟和抖动在配置中以毫秒为单位
+        self.latency = latency if latency is not None else \
+            float(os.getenv('KERBEROS_MOCK_LATENCY_MS', 0)) / 1000.0
+        self.jitter = jitter if jitter is not None else \
+            float(os.getenv('KERBEROS_MOCK_JITTER_MS', 0)) / 1000.0
+        self.error_rate = error_rate if error_rate is not None else \
+            float(os.getenv('KERBEROS_MOCK_ERROR_RATE', 0))
+        self.purge_interval = purge_interval if purge_interval is not None else \
+            int(os.getenv('KERBEROS_MOCK_PURGE_INTERVAL', 1000))
+        self.clock = clock
+        self.sleep = sleep
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._principals: Dict[str, str] = {}
+        self._tickets: Dict[str, MockTicket] = {}
+        self._by_client: Dict[str, Set[str]] = defaultdict(set)
+        self._issued = 0
+        self.stats = {'as_req': 0, 'tgs_req': 0, 'verify': 0, 'injected_errors': 0}
+
+    def principal_name(self, name: str) -> str:
+        """补全主体的领域"""
+        return name if '@' in name else f"{name}@{self.realm}"
+
+    def add_principal(self, name: str, password: str):
+        """添加或更新主体"""
+        with self._lock:
+            self._principals[self.principal_name(name)] = password
+
+    def add_synthetic_principals(self, count: int, prefix: str = 'user',
+                                 password: str = 'password') -> List[Tuple[str, str]]:
+        """
+        批量生成合成主体
+
+        Args:
+            count: 主体数量
+            prefix: 主体名称前缀，生成<prefix>00000@REALM等
+            password: 密码前缀，每个主体的密码为<password>-<序号>
+
+        Returns:
+            List[Tuple[str, str]]: (主体, 密码) 列表
+        """
+        width = max(5, len(str(count)))
+        created = [(f"{prefix}{i:0{width}d}@{self.realm}", f"{password}-{i}") for i in range(count)]
+        with self._lock:
+            self._principals.update(created)
+        return created
+
+    def has_principal(self, name: str) -> bool:
+        """主体是否存在"""
+        return self.principal_name(name) in self._principals
+
+    def _simulate(self, kind: str) -> Optional[str]:
+        """记录请求并注入延迟和错误，返回注入的错误信息"""
+        with self._lock:
+            self.stats[kind] += 1
+            delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0.0)
+            failed = self.error_rate > 0 and self._random.random() < self.error_rate
+            if failed:
+                self.stats['injected_errors'] += 1
+        if delay > 0:
+            self.sleep(delay)
+        return ERR_KDC_UNREACHABLE.format(self.realm) if failed else None
+
+    def _issue(self, client: str, server: str, now: float, endtime: Optional[float] = None) -> MockTicket:
+        # 调用方持有self._lock
+        ticket = MockTicket(
+            ticket=secrets.token_urlsafe(24),
+            client=client,
+            server=server,
+            session_key=secrets.token_hex(16),
+            authtime=now,
+            endtime=endtime if endtime is not None else now + self.ticket_lifetime,
+            renew_till=now + self.renew_lifetime,
+        )
+        self._issued += 1
+        if self.purge_interval > 0 and self._issued % self.purge_interval == 0:
+            self._purge_expired(now)
+        self._tickets[ticket.ticket] = ticket
+        self._by_client[client].add(ticket.ticket)
+        return ticket
+
+    def as_req(self, name: str, password: str) -> Tuple[bool, Optional[MockTicket], Optional[str]]:
+        """
+        AS交换：用密码换取TGT
+
+        Returns:
+            Tuple[bool, Optional[MockTicket], Optional[str]]: (是否成功, TGT, 错误信息)
+        """
+        error = self._simulate('as_req')
+        if error is not None:
+            return False, None, error
+        client = self.principal_name(name)
+        expected = self._principals.get(client)
+        if expected is None:
+            return False, None, ERR_UNKNOWN_PRINCIPAL.format(client)
+        if not hmac.compare_digest(expected.encode('utf-8'), password.encode('utf-8')):
+            return False, None, ERR_PASSWORD_INCORRECT
+        with self._lock:
+            tgt = self._issue(client, f"krbtgt/{self.realm}@{self.realm}", self.clock())
+        return True, tgt, None
+
+    def tgs_req(self, tgt: str, service: str) -> Tuple[bool, Optional[MockTicket], Optional[str]]:
+        """
+        TGS交换：用TGT换取服务票据
+
+        Args:
+            tgt: TGT票据ID
+            service: 服务主体，例如HTTP/localhost，未包含领域时使用本领域
+
+        Returns:
+            Tuple[bool, Optional[MockTicket], Optional[str]]: (是否成功, 服务票据, 错误信息)
+        """
+        error = self._simulate('tgs_req')
+        if error is not None:
+            return False, None, error
+        now = self.clock()
+        with self._lock:
+            parent = self._tickets.get(tgt)
+            if parent is None or not parent.is_tgt():
+                return False, None, ERR_TICKET_UNKNOWN
+            if parent.endtime <= now:
+                return False, None, ERR_TICKET_EXPIRED
+            # 服务票据不会比TGT更晚到期
+            ticket = self._issue(parent.client, self.principal_name(service), now,
+                                 min(parent.endtime, now + self.ticket_lifetime))
+        return True, ticket, None
+
+    def verify(self, ticket: str, service: Optional[str] = None) -> Tuple[bool, Optional[str]]:
+        """
+        验证票据
+
+        Args:
+            ticket: 票据ID
+            service: 期望的服务主体，为None时不检查
+
+        Returns:
+            Tuple[bool, Optional[str]]: (是否有效, 错误信息)
+        """
+        with self._lock:
+            self.stats['verify'] += 1
+            entry = self._tickets.get(ticket)
+        if entry is None:
+            return False, ERR_TICKET_UNKNOWN
+        if entry.endtime <= self.clock():
+            return False, ERR_TICKET_EXPIRED
+        if service is not None and entry.server != self.principal_name(service):
+            return False, ERR_WRONG_SERVER
+        return True, None
+
+    def lookup(self, ticket: str) -> Optional[MockTicket]:
+        """按票据ID查找票据"""
+        return self._tickets.get(ticket)
+
+    def destroy(self, name: str) -> int:
+        """
+        销毁主体的全部票据（kdestroy）
+
+        Returns:
+            int: 销毁的票据数量
+        """
+        with self._lock:
+            ticket_ids = self._by_client.pop(self.principal_name(name), set())
+            for ticket_id in ticket_ids:
+                self._tickets.pop(ticket_id, None)
+        return len(ticket_ids)
+
+    def purge_expired(self) -> int:
+        """
+        删除过期票据
+
+        Returns:
+            int: 删除的票据数量
+        """
+        now = self.clock()
+        with self._lock:
+            return self._purge_expired(now)
+
+    def _purge_expired(self, now: float) -> int:
+        # 调用方持有self._lock
+        expired = [entry for entry in self._tickets.values() if entry.endtime <= now]
+        for entry in expired:
+            del self._tickets[entry.ticket]
+            client_tickets = self._by_client.get(entry.client)
+            if client_tickets is not None:
+                client_tickets.discard(entry.ticket)
+                if not client_tickets:
+                    del self._by_client[entry.client]
+        return len(expired)
+
+    def __len__(self):
+        return len(self._tickets)
+
 
 class MockKerberosAuth:
-    def __init__(self, service_name: str, realm: str):
+    def __init__(self, service_name: str, realm: str, kdc: Optional[MockKDC] = None):
         self.service_name = service_name
         self.realm = realm
         self.logger = logging.getLogger(__name__)
@@ -13,41 +256,65 @@ class MockKerberosAuth:
             'user1': 'user123',
             'user2': 'user123'
         }
-        self.session_keys = {}  # 添加session_keys字典
+        self.kdc = kdc if kdc is not None else MockKDC(realm)
+        for username, password in self.test_users.items():
+            self.kdc.add_principal(username, password)
+        self.session_keys = {}  # 用户名 -> TGT票据ID
 
     def authenticate(self, username: str, password: str) -> Tuple[bool, Optional[str]]:
         """
         模拟Kerberos认证
-        
+
         Args:
             username: 用户名
             password: 密码
-            
+
         Returns:
             Tuple[bool, Optional[str]]: (认证是否成功, 错误信息)
         """
-        # 开发环境下接受任意用户名和密码
+        # 开发环境下接受任意用户名和密码：以本次输入的密码登记主体
         if os.getenv('FLASK_ENV') == 'development':
-            # 生成一个模拟的会话密钥
-            self.session_keys[username] = f"mock_ticket_{username}"
-            return True, None
-            
-        if username in self.test_users and self.test_users[username] == password:
-            return True, None
-        return False, "用户名或密码错误"
+            self.kdc.add_principal(username, password)
+
+        success, tgt, error = self.kdc.as_req(username, password)
+        if not success:
+            if error.startswith('Client') or error.startswith('Password'):
+                return False, "用户名或密码错误"
+            return False, error
+        self.session_keys[username] = tgt.ticket
+        return True, None
+
+    def get_service_ticket(self, username: str, service: Optional[str] = None) -> Tuple[bool, Optional[str]]:
+        """
+        使用已登录用户的TGT获取服务票据
+
+        Args:
+            username: 用户名
+            service: 服务主体，默认<service_name>/localhost
+
+        Returns:
+            Tuple[bool, Optional[str]]: (是否成功, 服务票据ID或错误信息)
+        """
+        tgt = self.session_keys.get(username)
+        if tgt is None:
+            return False, "用户未登录"
+        success, ticket, error = self.kdc.tgs_req(tgt, service or f"{self.service_name}/localhost")
+        if not success:
+            return False, error
+        return True, ticket.ticket
 
     def verify_ticket(self, ticket: str) -> bool:
         """
         模拟票据验证
-        
+
         Args:
             ticket: 模拟的票据
-            
+
         Returns:
             bool: 验证是否成功
         """
         # 开发环境下接受任意票据
         if os.getenv('FLASK_ENV') == 'development':
             return True
-            
-        return ticket in self.session_keys.values() 
\ No newline at end of file
+
+        return self.kdc.verify(ticket)[0]
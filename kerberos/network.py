@@ -0,0 +1,415 @@
+import asyncio
+import base64
+import itertools
+import json
+import logging
+import os
+import struct
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from cryptography.fernet import InvalidToken
+
+from .cache import CipherCache
+from .crypto import KerberosCrypto, encode_authenticator
+from .principals import cipher_key, string_to_key
+from .servers import KerberosAS, KerberosTGS
+from .suites import TicketCipher
+
+logger = logging.getLogger(__name__)
+
+# 帧格式: 4字节大端长度 + UTF-8 JSON。TCP连接上连续传输多个帧，UDP每个数据报一个帧
+_LENGTH = struct.Struct('>I')
+MAX_FRAME_SIZE = 64 * 1024
+
+
+class ProtocolError(Exception):
+    """网络协议错误"""
+
+
+def encode_frame(message: Dict[str, Any]) -> bytes:
+    """将消息编码为带长度前缀的帧"""
+    payload = json.dumps(message, separators=(',', ':')).encode('utf-8')
+    if len(payload) > MAX_FRAME_SIZE:
+        raise ProtocolError(f"消息过大: {len(payload)}字节")
+    return _LENGTH.pack(len(payload)) + payload
+
+
+def decode_frame(data: bytes) -> Dict[str, Any]:
+    """解码一个完整的帧（UDP数据报）"""
+    if len(data) < _LENGTH.size:
+        raise ProtocolError("帧长度不足")
+    (length,) = _LENGTH.unpack_from(data)
+    if length != len(data) - _LENGTH.size:
+        raise ProtocolError("帧长度不匹配")
+    return json.loads(data[_LENGTH.size:].decode('utf-8'))
+
+
+async def read_frame(reader: asyncio.StreamReader) -> Optional[Dict[str, Any]]:
+    """从TCP流读取一个帧，连接关闭时返回None"""
+    try:
+        header = await reader.readexactly(_LENGTH.size)
+    except asyncio.IncompleteReadError:
+        return None
+    (length,) = _LENGTH.unpack(header)
+    if length > MAX_FRAME_SIZE:
+        raise ProtocolError(f"消息过大: {length}字节")
+    payload = await reader.readexactly(length)
+    return json.loads(payload.decode('utf-8'))
+
+
+class KerberosNetworkServer:
+    """
+    AS/TGS的asyncio网络前端
+
+    同时监听TCP和UDP端口，请求类型:
+        {"type": "as", "username": ...}
+            -> {"ok": false, "preauth": {"salt": ..., "iterations": ...}}
+        {"type": "as", "username": ..., "padata": 用长期密钥加密的时间戳}
+            -> {"ok": true, "tgt": ..., "enc_part": 用长期密钥加密的TGS会话密钥}
+        {"type": "tgs", "tgt": ..., "authenticator": ..., "services": [...]}
+    密码只在客户端用于派生长期密钥，不出现在网络上；服务票据的会话密钥仍以明文返回，
+    仅用于受信任的内部网络。加解密在线程池中执行，不阻塞事件循环。
+    """
+
+    def __init__(self, as_server: KerberosAS, tgs_server: KerberosTGS,
+                 host: str = '127.0.0.1', port: int = 0, udp: bool = True,
+                 max_workers: Optional[int] = None):
+        self.as_server = as_server
+        self.tgs_server = tgs_server
+        self.host = host
+        self.port = port
+        self.udp = udp
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers or int(os.getenv('KERBEROS_NETWORK_WORKERS', 8)),
+            thread_name_prefix='kerberos-net'
+        )
+        self._tcp_server = None
+        self._udp_transport = None
+        self._udp_protocol = None
+        self.tcp_port = None
+        self.udp_port = None
+
+    async def start(self):
+        """启动TCP和UDP监听"""
+        loop = asyncio.get_running_loop()
+        self._tcp_server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.tcp_port = self._tcp_server.sockets[0].getsockname()[1]
+
+        if self.udp:
+            # 未指定端口时UDP与TCP使用相同端口号
+            self._udp_transport, self._udp_protocol = await loop.create_datagram_endpoint(
+                lambda: _DatagramHandler(self),
+                local_addr=(self.host, self.port or self.tcp_port)
+            )
+            self.udp_port = self._udp_transport.get_extra_info('sockname')[1]
+
+        logger.info(f"Kerberos网络服务已启动: tcp={self.tcp_port}, udp={self.udp_port}")
+
+    async def serve_forever(self):
+        """启动并一直运行"""
+        if self._tcp_server is None:
+            await self.start()
+        await self._tcp_server.serve_forever()
+
+    async def close(self):
+        """停止服务"""
+        if self._udp_transport is not None:
+            self._udp_transport.close()
+        if self._tcp_server is not None:
+            self._tcp_server.close()
+            await self._tcp_server.wait_closed()
+        self.executor.shutdown(wait=False)
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request = await read_frame(reader)
+                if request is None:
+                    break
+                writer.write(encode_frame(await self.dispatch(request)))
+                await writer.drain()
+        except (ProtocolError, ValueError) as e:
+            logger.warning(f"关闭异常连接: {str(e)}")
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def dispatch(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        处理一个请求
+
+        Args:
+            request: 请求消息
+
+        Returns:
+            Dict[str, Any]: 响应消息，包含请求中的id
+        """
+        loop = asyncio.get_running_loop()
+        response: Dict[str, Any]
+        try:
+            request_type = request.get('type')
+            if request_type == 'as':
+                if 'password' in request:
+                    response = {'ok': False, 'error': "不接受明文密码，请使用预认证"}
+                elif 'padata' not in request:
+                    salt, iterations = self.as_server.preauth_info(request['username'])
+                    response = {'ok': False, 'error': "需要预认证",
+                                'preauth': {'salt': salt, 'iterations': iterations}}
+                else:
+                    success, tgt, enc_part = await loop.run_in_executor(
+                        self.executor, self.as_server.authenticate_preauth,
+                        request['username'], request['padata'])
+                    if success:
+                        response = {'ok': True, 'tgt': tgt, 'enc_part': enc_part}
+                    else:
+                        response = {'ok': False, 'error': tgt}
+            elif request_type == 'tgs':
+                success, error, tickets = await loop.run_in_executor(
+                    self.executor, self.tgs_server.grant_service_tickets,
+                    request['tgt'], request['authenticator'], list(request['services']))
+                if success:
+                    response = {'ok': True, 'tickets': {
+                        service_id: {'ticket': ticket, 'session_key': session_key.decode()}
+                        for service_id, (ticket, session_key) in tickets.items()
+                    }}
+                else:
+                    response = {'ok': False, 'error': error}
+            else:
+                response = {'ok': False, 'error': f"未知请求类型: {request_type}"}
+        except (KeyError, TypeError) as e:
+            response = {'ok': False, 'error': f"请求格式错误: {str(e)}"}
+        except Exception as e:
+            logger.error(f"处理请求出错: {str(e)}")
+            response = {'ok': False, 'error': "服务器内部错误"}
+
+        response['id'] = request.get('id') if isinstance(request, dict) else None
+        return response
+
+
+class _DatagramHandler(asyncio.DatagramProtocol):
+    def __init__(self, server: KerberosNetworkServer):
+        self.server = server
+        self.transport = None
+        # 处理中的请求，保留引用以免任务在完成前被回收
+        self.tasks: Set[asyncio.Task] = set()
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def connection_lost(self, exc):
+        for task in self.tasks:
+            task.cancel()
+
+    def datagram_received(self, data: bytes, addr):
+        try:
+            request = decode_frame(data)
+        except (ProtocolError, ValueError) as e:
+            logger.warning(f"丢弃无效数据报 {addr}: {str(e)}")
+            return
+        task = asyncio.get_running_loop().create_task(self._respond(request, addr))
+        self.tasks.add(task)
+        task.add_done_callback(self._task_done)
+
+    def _task_done(self, task: asyncio.Task):
+        self.tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"处理UDP请求出错: {task.exception()}")
+
+    async def _respond(self, request: Dict[str, Any], addr):
+        response = await self.server.dispatch(request)
+        if self.transport is not None and not self.transport.is_closing():
+            self.transport.sendto(encode_frame(response), addr)
+
+
+class _DatagramClient(asyncio.DatagramProtocol):
+    def __init__(self):
+        self.pending: Dict[int, asyncio.Future] = {}
+
+    def datagram_received(self, data: bytes, addr):
+        try:
+            response = decode_frame(data)
+        except (ProtocolError, ValueError):
+            return
+        future = self.pending.pop(response.get('id'), None)
+        if future is not None and not future.done():
+            future.set_result(response)
+
+    def error_received(self, exc):
+        for future in self.pending.values():
+            if not future.done():
+                future.set_exception(exc)
+        self.pending.clear()
+
+
+class AsyncKerberosClient:
+    """
+    Kerberos网络前端的异步客户端
+
+    TCP模式下请求在同一连接上依次发送；UDP模式下按请求id匹配响应，超时后重试。
+    """
+
+    def __init__(self, host: str, port: int, transport: str = 'tcp',
+                 timeout: float = 5.0, retries: int = 2, cipher_suite: str = 'fernet'):
+        if transport not in ('tcp', 'udp'):
+            raise ValueError(f"不支持的传输方式: {transport}")
+        self.host = host
+        self.port = port
+        self.transport = transport
+        self.timeout = timeout
+        self.retries = retries
+        self.cipher_cache = CipherCache(lambda key: TicketCipher([key], cipher_suite))
+        # 各用户的预认证参数(盐, 迭代次数)，避免每次AS交换多一次往返
+        self._preauth: Dict[str, Tuple[bytes, int]] = {}
+
+        self._ids = itertools.count(1)
+        self._lock = asyncio.Lock()
+        self._reader = None
+        self._writer = None
+        self._udp_transport = None
+        self._udp_protocol = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def close(self):
+        """关闭连接"""
+        if self._writer is not None:
+            self._writer.close()
+            self._reader = self._writer = None
+        if self._udp_transport is not None:
+            self._udp_transport.close()
+            self._udp_transport = self._udp_protocol = None
+
+    async def _request_tcp(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        async with self._lock:
+            if self._writer is None:
+                self._reader, self._writer = await asyncio.wait_for(
+                    asyncio.open_connection(self.host, self.port), self.timeout)
+            try:
+                self._writer.write(encode_frame(message))
+                await self._writer.drain()
+                response = await asyncio.wait_for(read_frame(self._reader), self.timeout)
+            except Exception:
+                # 连接状态未知，下次请求重新建立连接
+                self._writer.close()
+                self._reader = self._writer = None
+                raise
+            if response is None:
+                self._writer.close()
+                self._reader = self._writer = None
+                raise ConnectionError("服务器关闭了连接")
+            return response
+
+    async def _request_udp(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        if self._udp_transport is None:
+            self._udp_transport, self._udp_protocol = await loop.create_datagram_endpoint(
+                _DatagramClient, remote_addr=(self.host, self.port))
+
+        frame = encode_frame(message)
+        for attempt in range(self.retries + 1):
+            future = loop.create_future()
+            self._udp_protocol.pending[message['id']] = future
+            self._udp_transport.sendto(frame)
+            try:
+                return await asyncio.wait_for(future, self.timeout)
+            except asyncio.TimeoutError:
+                self._udp_protocol.pending.pop(message['id'], None)
+                if attempt == self.retries:
+                    raise
+        raise asyncio.TimeoutError
+
+    async def request(self, message: Dict[str, Any]) -> Dict[str, Any]:
+        """发送请求并等待响应"""
+        message = dict(message, id=next(self._ids))
+        if self.transport == 'udp':
+            return await self._request_udp(message)
+        return await self._request_tcp(message)
+
+    async def get_tgt(self, username: str, password: str) -> Tuple[bool, Optional[str], Optional[bytes]]:
+        """
+        AS交换：获取TGT
+
+        密码只在本地派生长期密钥，请求中只携带用长期密钥加密的时间戳，
+        TGS会话密钥用长期密钥解密得到。
+
+        Returns:
+            Tuple[bool, Optional[str], Optional[bytes]]: (是否成功, TGT或错误信息, TGS会话密钥)
+        """
+        loop = asyncio.get_running_loop()
+        cached = username in self._preauth
+        while True:
+            params = self._preauth.get(username)
+            if params is None:
+                response = await self.request({'type': 'as', 'username': username})
+                preauth = response.get('preauth')
+                if preauth is None:
+                    return False, response.get('error'), None
+                params = self._preauth[username] = (base64.b64decode(preauth['salt']),
+                                                    int(preauth['iterations']))
+
+            key = await loop.run_in_executor(None, string_to_key, password, *params)
+            cipher = self.cipher_cache.get(cipher_key(key))
+            padata = encode_authenticator(username, datetime.utcnow(), cipher)
+            response = await self.request({'type': 'as', 'username': username, 'padata': padata})
+            if response.get('ok'):
+                break
+            self._preauth.pop(username, None)
+            if not cached:
+                return False, response.get('error'), None
+            # 缓存的盐可能已过期（主体密码被重置），重新获取一次
+            cached = False
+
+        try:
+            session_key = cipher.decrypt(response['enc_part'].encode())
+        except InvalidToken:
+            return False, "无法解密TGS会话密钥", None
+        return True, response['tgt'], session_key
+
+    async def get_service_tickets(self, username: str, tgt: str, session_key: bytes,
+                                  services: List[str]) -> Tuple[bool, Optional[str], Dict[str, Tuple[str, bytes]]]:
+        """
+        TGS交换：一次获取多个服务票据
+
+        Returns:
+            Tuple[bool, Optional[str], Dict[str, Tuple[str, bytes]]]:
+                (是否成功, 错误信息, {服务ID: (服务票据, 服务会话密钥)})
+        """
+        authenticator = encode_authenticator(
+            username, datetime.utcnow(), self.cipher_cache.get(session_key))
+        response = await self.request({
+            'type': 'tgs', 'tgt': tgt, 'authenticator': authenticator, 'services': list(services)
+        })
+        if not response.get('ok'):
+            return False, response.get('error'), {}
+        return True, None, {
+            service_id: (item['ticket'], item['session_key'].encode())
+            for service_id, item in response['tickets'].items()
+        }
+
+
+def main():
+    """命令行入口: python -m kerberos.network，监听KERBEROS_NETWORK_HOST:KERBEROS_NETWORK_PORT"""
+    logging.basicConfig(level=logging.INFO)
+    crypto = KerberosCrypto()
+    server = KerberosNetworkServer(
+        KerberosAS(crypto), KerberosTGS(crypto),
+        host=os.getenv('KERBEROS_NETWORK_HOST', '127.0.0.1'),
+        port=int(os.getenv('KERBEROS_NETWORK_PORT', 8888))
+    )
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,238 @@
+import base64
+import hashlib
+import hmac
+import logging
+import os
+import sqlite3
+import threading
+from typing import Dict, Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 主体记录: (盐, 迭代次数, 长期密钥)
+PrincipalRecord = Tuple[bytes, int, bytes]
+
+DEFAULT_ITERATIONS = 4096
+KEY_LENGTH = 32
+
+# 未知主体时用于对齐耗时的虚拟记录
+_DUMMY_SALT = b'\x00' * 16
+
+STORE_HEADER = '# principal\tsalt\titerations\tkey'
+
+
+def string_to_key(password: str, salt: bytes, iterations: int) -> bytes:
+    """
+    由密码派生长期密钥（PBKDF2-HMAC-SHA256）
+
+    Args:
+        password: 密码
+        salt: 盐
+        iterations: 迭代次数
+
+    Returns:
+        bytes: 长期密钥
+    """
+    return hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt, iterations, KEY_LENGTH)
+
+
+def cipher_key(key: bytes) -> bytes:
+    """将长期密钥转换为TicketCipher使用的Fernet格式密钥"""
+    return base64.urlsafe_b64encode(key)
+
+
+class PrincipalStore:
+    """
+    AS主体存储
+
+    保存每个主体的盐、迭代次数和派生后的长期密钥，首次加载后全部保存在内存索引中，
+    AS认证时只进行一次密钥派生和常量时间比较，不访问磁盘。
+    支持从制表符分隔的文件或SQLite表（kerberos_principals）加载。
+    """
+
+    def __init__(self, iterations: Optional[int] = None):
+        self.iterations = iterations if iterations is not None else \
+            int(os.getenv('KERBEROS_S2K_ITERATIONS', DEFAULT_ITERATIONS))
+        self._lock = threading.Lock()
+        self._index: Dict[str, PrincipalRecord] = {}
+        # 为未知主体生成稳定的虚拟盐，预认证参数不泄露主体是否存在
+        self._dummy_secret = os.urandom(32)
+
+    @classmethod
+    def from_env(cls) -> 'PrincipalStore':
+        """
+        根据KERBEROS_PRINCIPAL_STORE环境变量创建主体存储
+
+        未配置时只包含开发用的test_user主体
+        """
+        store = cls()
+        path = os.getenv('KERBEROS_PRINCIPAL_STORE')
+        if path:
+            if path.endswith(('.db', '.sqlite', '.sqlite3')):
+                store.load_sqlite(path)
+            else:
+                store.load_file(path)
+        else:
+            store.add_principal('test_user', 'test_password')
+        return store
+
+    def add_principal(self, principal: str, password: str, salt: Optional[bytes] = None):
+        """
+        添加或更新主体
+
+        Args:
+            principal: 主体名称
+            password: 密码
+            salt: 盐，默认随机生成
+        """
+        salt = salt if salt is not None else os.urandom(16)
+        key = string_to_key(password, salt, self.iterations)
+        with self._lock:
+            self._index[principal] = (salt, self.iterations, key)
+
+    def remove_principal(self, principal: str) -> bool:
+        """删除主体"""
+        with self._lock:
+            return self._index.pop(principal, None) is not None
+
+    def load_records(self, records: Iterable[Tuple[str, bytes, int, bytes]]) -> int:
+        """
+        批量加载已派生的主体记录
+
+        Args:
+            records: (主体, 盐, 迭代次数, 长期密钥) 序列
+
+        Returns:
+            int: 加载的主体数量
+        """
+        index = {principal: (salt, iterations, key) for principal, salt, iterations, key in records}
+        with self._lock:
+            self._index.update(index)
+        return len(index)
+
+    def load_file(self, path: str) -> int:
+        """
+        从文件加载主体，每行为: 主体<TAB>盐(base64)<TAB>迭代次数<TAB>密钥(base64)
+
+        Args:
+            path: 文件路径
+
+        Returns:
+            int: 加载的主体数量
+        """
+        b64decode = base64.b64decode
+
+        def records():
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    if not line.strip() or line.startswith('#'):
+                        continue
+                    principal, salt, iterations, key = line.rstrip('\n').split('\t')
+                    yield principal, b64decode(salt), int(iterations), b64decode(key)
+
+        count = self.load_records(records())
+        logger.info(f"从文件加载了{count}个主体: {path}")
+        return count
+
+    def save_file(self, path: str):
+        """将主体保存到文件"""
+        b64encode = base64.b64encode
+        with self._lock:
+            items = list(self._index.items())
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(STORE_HEADER + '\n')
+            f.writelines(
+                f"{principal}\t{b64encode(salt).decode()}\t{iterations}\t{b64encode(key).decode()}\n"
+                for principal, (salt, iterations, key) in items
+            )
+        os.replace(tmp_path, path)
+
+    def load_sqlite(self, db_path: str, table: str = 'kerberos_principals') -> int:
+        """
+        从SQLite数据库加载主体
+
+        Args:
+            db_path: 数据库路径
+            table: 表名，包含principal/salt/iterations/key列
+
+        Returns:
+            int: 加载的主体数量
+        """
+        conn = sqlite3.connect(db_path)
+        try:
+            rows = conn.execute(f"SELECT principal, salt, iterations, key FROM {table}")
+            count = self.load_records(
+                (principal, bytes(salt), int(iterations), bytes(key))
+                for principal, salt, iterations, key in rows
+            )
+        finally:
+            conn.close()
+        logger.info(f"从数据库加载了{count}个主体: {db_path}")
+        return count
+
+    def save_sqlite(self, db_path: str, table: str = 'kerberos_principals'):
+        """将主体保存到SQLite数据库"""
+        with self._lock:
+            items = list(self._index.items())
+        conn = sqlite3.connect(db_path)
+        try:
+            with conn:
+                conn.execute(
+                    f"CREATE TABLE IF NOT EXISTS {table} ("
+                    "principal TEXT PRIMARY KEY, salt BLOB NOT NULL, "
+                    "iterations INTEGER NOT NULL, key BLOB NOT NULL)"
+                )
+                conn.executemany(
+                    f"INSERT OR REPLACE INTO {table} (principal, salt, iterations, key) VALUES (?, ?, ?, ?)",
+                    ((principal, salt, iterations, key) for principal, (salt, iterations, key) in items)
+                )
+        finally:
+            conn.close()
+
+    def verify(self, principal: str, password: str) -> bool:
+        """
+        验证主体密码
+
+        Args:
+            principal: 主体名称
+            password: 密码
+
+        Returns:
+            bool: 密码是否正确
+        """
+        record = self._index.get(principal)
+        if record is None:
+            # 未知主体同样进行一次派生，避免通过耗时判断主体是否存在
+            string_to_key(password, _DUMMY_SALT, self.iterations)
+            return False
+        salt, iterations, key = record
+        return hmac.compare_digest(string_to_key(password, salt, iterations), key)
+
+    def preauth_params(self, principal: str) -> Tuple[bytes, int]:
+        """
+        获取客户端派生长期密钥所需的盐和迭代次数
+
+        Args:
+            principal: 主体名称
+
+        Returns:
+            Tuple[bytes, int]: (盐, 迭代次数)，未知主体返回由主体名决定的虚拟盐
+        """
+        record = self._index.get(principal)
+        if record is None:
+            salt = hmac.new(self._dummy_secret, str(principal).encode('utf-8'), hashlib.sha256).digest()
+            return salt[:16], self.iterations
+        return record[0], record[1]
+
+    def long_term_key(self, principal: str) -> Optional[bytes]:
+        """获取主体的长期密钥，未知主体返回None"""
+        record = self._index.get(principal)
+        return record[2] if record is not None else None
+
+    def __contains__(self, principal: str) -> bool:
+        return principal in self._index
+
+    def __len__(self):
+        return len(self._index)
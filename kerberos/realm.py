@@ -0,0 +1,346 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .kadmin import KadminError, full_principal_name, parse_principal_records, quote_arg
+
+logger = logging.getLogger(__name__)
+
+# db2后端KDB的文件后缀（与kdb/目录下的模板一致）
+KDB_SUFFIXES = ('', '.kadm5', '.kadm5.lock', '.ok')
+
+# 快照中的文件名
+SNAPSHOT_DB = 'principal'
+SNAPSHOT_STASH = 'principal.stash'
+SNAPSHOT_DUMP = 'realm.dump'
+SNAPSHOT_META = 'snapshot.json'
+
+# (主体, 密码)，密码为None时使用随机密钥（服务主体）
+PrincipalSpec = Tuple[str, Optional[str]]
+
+# 允许从快照克隆的领域：克隆出的KDB与快照共用主密钥和krbtgt密钥，只能用于测试领域
+DEFAULT_SNAPSHOT_REALMS = 'TEST.COM,DEV.LOCAL'
+
+
+def profile_value(profile: str, realm: str, name: str) -> Optional[str]:
+    """
+    读取kdc.conf中[realms]下某个领域的配置项
+
+    Args:
+        profile: kdc.conf路径
+        realm: 领域
+        name: 配置项名称
+
+    Returns:
+        Optional[str]: 配置值，文件或配置项不存在时返回None
+    """
+    try:
+        with open(profile) as f:
+            lines = f.read().splitlines()
+    except OSError:
+        return None
+    section, current = None, None
+    for line in lines:
+        line = line.split('#', 1)[0].strip()
+        if line.startswith('[') and line.endswith(']'):
+            section, current = line[1:-1].strip(), None
+        elif section == 'realms' and line.endswith('{'):
+            current = line[:-1].split('=', 1)[0].strip()
+        elif line == '}':
+            current = None
+        elif current == realm and '=' in line:
+            key, value = (part.strip() for part in line.split('=', 1))
+            if key == name:
+                return value
+    return None
+
+
+class RealmBootstrapper:
+    """
+    基于KDB快照的测试领域初始化
+
+    同一组(领域, 主密码, 主体列表)只在第一次使用时执行kdb5_util create和一个kadmin.local
+    批量会话，生成的KDB文件、stash和kdb5_util dump文件保存为快照。之后初始化新领域只需
+    复制快照中的KDB文件和stash，不启动任何子进程；快照中没有KDB文件（只有dump）时用一次
+    kdb5_util load恢复。额外的主体可以通过kdb5_util load -update导入dump文件。
+
+    创建快照时叠加使用env中的KRB5_KDC_PROFILE，票据有效期、可续期时间、加密类型和
+    默认主体标志与正式kdc.conf一致。克隆出的KDB共用快照的主密钥和krbtgt密钥，因此只允许
+    KERBEROS_REALM_SNAPSHOT_REALMS中的测试领域使用快照，生产KDB应直接用kdb5_util create创建。
+    """
+
+    def __init__(self, snapshot_dir: Optional[str] = None, kdb5_util: Optional[str] = None,
+                 kadmin_local: Optional[str] = None, env: Optional[Dict[str, str]] = None,
+                 timeout: Optional[float] = None, snapshot_realms: Optional[Iterable[str]] = None):
+        self.snapshot_dir = snapshot_dir or os.getenv(
+            'KERBEROS_REALM_SNAPSHOT_DIR', os.path.join(tempfile.gettempdir(), 'kerberos_realm_snapshots'))
+        self.kdb5_util = kdb5_util or os.getenv('KRB5_UTIL_PATH', 'kdb5_util')
+        self.kadmin_local = kadmin_local or os.getenv('KADMIN_LOCAL_PATH', 'kadmin.local')
+        self.env = env if env is not None else os.environ.copy()
+        self.timeout = timeout if timeout is not None else float(os.getenv('KADMIN_TIMEOUT', 600))
+        if snapshot_realms is None:
+            snapshot_realms = os.getenv('KERBEROS_REALM_SNAPSHOT_REALMS', DEFAULT_SNAPSHOT_REALMS).split(',')
+        self.snapshot_realms = {realm.strip() for realm in snapshot_realms if realm.strip()}
+        os.makedirs(self.snapshot_dir, mode=0o700, exist_ok=True)
+
+    @staticmethod
+    def _normalize(realm: str, principals: Iterable[PrincipalSpec]) -> List[PrincipalSpec]:
+        return sorted((full_principal_name(principal, realm), password)
+                      for principal, password in principals)
+
+    def snapshot_key(self, realm: str, master_password: str,
+                     principals: Iterable[PrincipalSpec] = ()) -> str:
+        """
+        计算快照键
+
+        Args:
+            realm: 领域
+            master_password: 主密码
+            principals: 领域中的主体
+
+        Returns:
+            str: 由领域、主密码和主体列表决定的快照键
+        """
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(json.dumps([realm, master_password, self._normalize(realm, principals)]).encode('utf-8'))
+        return f"{realm.lower()}_{digest.hexdigest()}"
+
+    def snapshot_path(self, key: str) -> str:
+        """快照目录"""
+        return os.path.join(self.snapshot_dir, key)
+
+    def _run(self, args: List[str], input: Optional[str] = None,
+             env: Optional[Dict[str, str]] = None) -> subprocess.CompletedProcess:
+        try:
+            result = subprocess.run(args, input=(input or '').encode('utf-8'),
+                                    stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                    env=env if env is not None else self.env, timeout=self.timeout)
+        except (OSError, subprocess.TimeoutExpired) as e:
+            raise KadminError(f"执行{os.path.basename(args[0])}失败: {str(e)}") from e
+        if result.returncode != 0:
+            raise KadminError(f"{os.path.basename(args[0])} {' '.join(args[1:2])}失败: "
+                              f"{result.stderr.decode('utf-8', 'replace').strip()}")
+        return result
+
+    def _kdb5_util(self, realm: str, database_name: str, stash_file: str, *args: str,
+                   input: Optional[str] = None, env: Optional[Dict[str, str]] = None):
+        return self._run([self.kdb5_util, '-r', realm, '-d', database_name, '-sf', stash_file] + list(args),
+                         input=input, env=env)
+
+    def _write_configs(self, directory: str, realm: str, database_name: str, stash_file: str) -> Dict[str, str]:
+        """
+        生成只覆盖KDB路径的krb5.conf和kdc.conf，返回对应的环境变量
+
+        生成的文件排在原有配置之前（profile路径以冒号分隔，先出现的配置项优先），
+        其余配置项仍取自env中的KRB5_CONFIG和KRB5_KDC_PROFILE。
+        """
+        krb5_conf = os.path.join(directory, 'krb5.conf')
+        kdc_conf = os.path.join(directory, 'kdc.conf')
+        with open(krb5_conf, 'w') as f:
+            f.write(f"[libdefaults]\n    default_realm = {realm}\n")
+        with open(kdc_conf, 'w') as f:
+            f.write(f"[realms]\n    {realm} = {{\n"
+                    f"        database_name = {database_name}\n"
+                    f"        key_stash_file = {stash_file}\n"
+                    f"    }}\n")
+        configs = {}
+        for name, path in (('KRB5_CONFIG', krb5_conf), ('KRB5_KDC_PROFILE', kdc_conf)):
+            base = self.env.get(name)
+            configs[name] = f"{path}:{base}" if base else path
+        return configs
+
+    def build_snapshot(self, realm: str, master_password: str,
+                       principals: Iterable[PrincipalSpec] = ()) -> str:
+        """
+        创建快照（慢路径，每组参数只执行一次）
+
+        Args:
+            realm: 领域
+            master_password: 主密码
+            principals: (主体, 密码) 序列，密码为None时使用-randkey
+
+        Returns:
+            str: 快照目录
+        """
+        principals = self._normalize(realm, principals)
+        final = self.snapshot_path(self.snapshot_key(realm, master_password, principals))
+        if os.path.exists(os.path.join(final, SNAPSHOT_META)):
+            return final
+
+        started = time.monotonic()
+        work = tempfile.mkdtemp(prefix='.build_', dir=self.snapshot_dir)
+        try:
+            database_name = os.path.join(work, SNAPSHOT_DB)
+            stash_file = os.path.join(work, SNAPSHOT_STASH)
+            env = dict(self.env, **self._write_configs(work, realm, database_name, stash_file))
+
+            # 主密码通过标准输入提供，不出现在进程参数中
+            self._kdb5_util(realm, database_name, stash_file, 'create', '-s',
+                            input=f"{master_password}\n{master_password}\n", env=env)
+
+            if principals:
+                commands = ''.join(
+                    f"addprinc -randkey {quote_arg(principal)}\n" if password is None
+                    else f"addprinc -pw {quote_arg(password)} {quote_arg(principal)}\n"
+                    for principal, password in principals
+                )
+                self._run([self.kadmin_local, '-r', realm], input=commands, env=env)
+
+            self._kdb5_util(realm, database_name, stash_file, 'dump',
+                            os.path.join(work, SNAPSHOT_DUMP), env=env)
+            self._write_meta(work, realm, principals)
+            self._publish(work, final)
+        finally:
+            shutil.rmtree(work, ignore_errors=True)
+
+        logger.info(f"领域快照已创建: {realm}，{len(principals)}个主体，"
+                    f"耗时{time.monotonic() - started:.2f}秒")
+        return final
+
+    def import_template(self, database_name: str, stash_file: str, realm: str, master_password: str,
+                        principals: Iterable[PrincipalSpec] = ()) -> str:
+        """
+        把已有的KDB（例如仓库kdb/目录下的模板）登记为快照
+
+        Args:
+            database_name: 模板KDB路径（不含后缀）
+            stash_file: 模板的stash文件
+            realm: 模板的领域
+            master_password: 模板的主密码
+            principals: 模板中已有的主体，用于计算快照键
+
+        Returns:
+            str: 快照目录
+        """
+        principals = self._normalize(realm, principals)
+        final = self.snapshot_path(self.snapshot_key(realm, master_password, principals))
+        if os.path.exists(os.path.join(final, SNAPSHOT_META)):
+            return final
+
+        work = tempfile.mkdtemp(prefix='.import_', dir=self.snapshot_dir)
+        try:
+            for suffix in KDB_SUFFIXES:
+                if os.path.exists(database_name + suffix):
+                    shutil.copyfile(database_name + suffix, os.path.join(work, SNAPSHOT_DB + suffix))
+            shutil.copyfile(stash_file, os.path.join(work, SNAPSHOT_STASH))
+            self._kdb5_util(realm, database_name, stash_file, 'dump', os.path.join(work, SNAPSHOT_DUMP))
+            self._write_meta(work, realm, principals)
+            self._publish(work, final)
+        finally:
+            shutil.rmtree(work, ignore_errors=True)
+        return final
+
+    @staticmethod
+    def _write_meta(directory: str, realm: str, principals: List[PrincipalSpec]):
+        with open(os.path.join(directory, SNAPSHOT_META), 'w') as f:
+            json.dump({'realm': realm, 'principals': [principal for principal, _ in principals],
+                       'created_at': time.time()}, f)
+
+    @staticmethod
+    def _publish(work: str, final: str):
+        # 并发创建同一个快照时，先完成的生效
+        try:
+            os.rename(work, final)
+        except OSError:
+            if not os.path.exists(os.path.join(final, SNAPSHOT_META)):
+                raise
+
+    def bootstrap(self, database_name: str, stash_file: str, realm: str, master_password: str,
+                  principals: Iterable[PrincipalSpec] = (), dumps: Sequence[str] = (),
+                  overwrite: bool = False) -> float:
+        """
+        从快照初始化领域
+
+        Args:
+            database_name: 目标KDB路径（不含后缀）
+            stash_file: 目标stash文件
+            realm: 领域
+            master_password: 主密码
+            principals: 领域中的主体，(主体, 密码) 序列，密码为None时使用-randkey
+            dumps: 额外用kdb5_util load -update导入的dump文件
+            overwrite: 目标KDB已存在时是否覆盖
+
+        Returns:
+            float: 初始化耗时（秒），不包括第一次创建快照的时间
+        """
+        if realm not in self.snapshot_realms:
+            raise ValueError(f"领域{realm}不允许从快照克隆（克隆出的KDB共用主密钥和krbtgt密钥），"
+                             f"请使用kdb5_util create创建")
+        if os.path.exists(database_name) and not overwrite:
+            raise FileExistsError(f"KDB已存在: {database_name}")
+        snapshot = self.build_snapshot(realm, master_password, principals)
+
+        started = time.monotonic()
+        target_dir = os.path.dirname(os.path.abspath(database_name))
+        os.makedirs(target_dir, mode=0o700, exist_ok=True)
+        for suffix in KDB_SUFFIXES:
+            if os.path.exists(database_name + suffix):
+                os.remove(database_name + suffix)
+
+        shutil.copyfile(os.path.join(snapshot, SNAPSHOT_STASH), stash_file)
+        os.chmod(stash_file, 0o600)
+        source = os.path.join(snapshot, SNAPSHOT_DB)
+        if os.path.exists(source):
+            # 快路径: 直接复制KDB文件
+            for suffix in KDB_SUFFIXES:
+                if os.path.exists(source + suffix):
+                    shutil.copyfile(source + suffix, database_name + suffix)
+                    os.chmod(database_name + suffix, 0o600)
+        else:
+            self._kdb5_util(realm, database_name, stash_file, 'load', os.path.join(snapshot, SNAPSHOT_DUMP))
+
+        for dump in dumps:
+            self._kdb5_util(realm, database_name, stash_file, 'load', '-update', dump)
+
+        elapsed = time.monotonic() - started
+        logger.info(f"领域已初始化: {realm} -> {database_name}，耗时{elapsed * 1000:.1f}毫秒")
+        return elapsed
+
+
+def main():
+    """
+    命令行入口: python -m kerberos.realm <KDB路径> [主体文件.csv|.jsonl]
+
+    领域和主密码取自KERBEROS_REALM和KRB5_MASTER_PASSWORD。stash文件取自KRB5_KDC_PROFILE中
+    该领域的key_stash_file，未配置时为<KDB路径>.stash。主体文件中密码为空的主体使用随机密钥。
+    """
+    logging.basicConfig(level=logging.INFO)
+    if len(sys.argv) < 2:
+        print("用法: python -m kerberos.realm <KDB路径> [主体文件.csv|.jsonl]")
+        return 1
+    realm = os.getenv('KERBEROS_REALM', 'TEST.COM')
+    master_password = os.getenv('KRB5_MASTER_PASSWORD')
+    if not master_password:
+        print("请设置KRB5_MASTER_PASSWORD环境变量")
+        return 1
+
+    principals: List[PrincipalSpec] = []
+    if len(sys.argv) > 2:
+        path = sys.argv[2]
+        fmt = 'jsonl' if path.endswith(('.jsonl', '.ndjson')) else 'csv'
+        with open(path, encoding='utf-8-sig') as f:
+            principals = [(principal, password or None)
+                          for principal, password in parse_principal_records(f.read(), fmt)]
+
+    database_name = sys.argv[1]
+    stash_file = profile_value(os.getenv('KRB5_KDC_PROFILE', ''), realm, 'key_stash_file') \
+        or database_name + '.stash'
+    try:
+        elapsed = RealmBootstrapper().bootstrap(database_name, stash_file, realm,
+                                                master_password, principals, overwrite=True)
+    except (KadminError, ValueError) as e:
+        print(str(e))
+        return 1
+    print(f"{realm}: {len(principals)}个主体，耗时{elapsed * 1000:.1f}毫秒")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
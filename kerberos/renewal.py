@@ -0,0 +1,286 @@
+import heapq
+import itertools
+import logging
+import os
+import subprocess
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .ccache import CCacheFormatError, CCacheManager, CredentialCacheReader
+
+logger = logging.getLogger(__name__)
+
+# 执行kinit的函数，参数与subprocess.run相同
+Runner = Callable[..., subprocess.CompletedProcess]
+
+
+class RenewalEntry:
+    """续期表中的一个服务主体"""
+
+    def __init__(self, principal: str, keytab: str, ccache_path: str):
+        self.principal = principal
+        self.keytab = keytab
+        self.ccache_path = ccache_path
+        self.expires_at = 0.0
+        self.renew_till = 0.0
+        self.next_renewal = 0.0
+        self.failures = 0
+        self.last_error: Optional[str] = None
+        # 调度代数，重新调度后堆中的旧条目作废
+        self.generation = 0
+        self.lock = threading.Lock()
+
+
+class TicketRenewalScheduler:
+    """
+    服务主体TGT续期调度器
+
+    内存表记录每个服务主体的keytab、凭据缓存和票据到期时间，所有主体共用一个最小堆和
+    一个后台线程。票据在有效期的固定比例（默认80%）处续期：可续期时使用kinit -R，
+    否则从keytab重新kinit。失败后按指数退避重试。服务操作只需调用ensure()检查内存表，
+    票据有效时不执行kinit。
+    """
+
+    def __init__(self, ccache_manager: Optional[CCacheManager] = None,
+                 fraction: Optional[float] = None, retry_interval: Optional[float] = None,
+                 default_lifetime: Optional[float] = None, env: Optional[Dict[str, str]] = None,
+                 run: Runner = subprocess.run, clock: Callable[[], float] = time.time):
+        self.ccache_manager = ccache_manager if ccache_manager is not None else \
+            CCacheManager(os.getenv('KERBEROS_SERVICE_CCACHE_DIR'))
+        self.fraction = fraction if fraction is not None else \
+            float(os.getenv('KERBEROS_RENEWAL_FRACTION', 0.8))
+        self.retry_interval = retry_interval if retry_interval is not None else \
+            float(os.getenv('KERBEROS_RENEWAL_RETRY_INTERVAL', 30))
+        self.default_lifetime = default_lifetime if default_lifetime is not None else \
+            float(os.getenv('KERBEROS_RENEWAL_DEFAULT_LIFETIME', 36000))
+        self.env = env if env is not None else os.environ.copy()
+        self.run = run
+        self.clock = clock
+        self.reader = CredentialCacheReader()
+
+        self._entries: Dict[str, RenewalEntry] = {}
+        self._heap: List[Tuple[float, int, str, int]] = []
+        self._seq = itertools.count()
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = False
+
+    def register(self, principal: str, keytab: str) -> str:
+        """
+        登记服务主体，后台线程会立即为其获取票据
+
+        Args:
+            principal: 服务主体
+            keytab: keytab文件路径
+
+        Returns:
+            str: 该主体使用的KRB5CCNAME
+        """
+        with self._condition:
+            entry = self._entries.get(principal)
+            if entry is None or entry.keytab != keytab:
+                entry = RenewalEntry(principal, keytab, self.ccache_manager.path_for(principal))
+                self._entries[principal] = entry
+                self._schedule(entry, self.clock())
+        return self.ccname(principal)
+
+    def unregister(self, principal: str):
+        """移除服务主体，堆中的条目在出堆时丢弃"""
+        with self._condition:
+            self._entries.pop(principal, None)
+
+    def ccname(self, principal: str) -> str:
+        """服务主体的KRB5CCNAME"""
+        return self.ccache_manager.ccname(principal)
+
+    def env_for(self, principal: str, base_env: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+        """使用服务主体凭据缓存的子进程环境变量"""
+        return self.ccache_manager.env_for(base_env if base_env is not None else self.env, principal)
+
+    def is_valid(self, principal: str, margin: float = 60.0) -> bool:
+        """
+        根据内存表判断服务主体的票据是否有效
+
+        Args:
+            principal: 服务主体
+            margin: 距离到期少于该秒数时视为无效
+        """
+        entry = self._entries.get(principal)
+        return entry is not None and entry.expires_at > self.clock() + margin
+
+    def ensure(self, principal: str) -> bool:
+        """
+        确保服务主体持有有效票据
+
+        票据有效时直接返回；尚未获取或已过期时（例如刚登记、后台线程还没执行）同步kinit一次
+
+        Returns:
+            bool: 是否持有有效票据
+        """
+        if self.is_valid(principal):
+            return True
+        entry = self._entries.get(principal)
+        if entry is None:
+            logger.error(f"服务主体未登记: {principal}")
+            return False
+        return self._renew(entry)
+
+    def _schedule(self, entry: RenewalEntry, when: float):
+        # 调用方持有self._condition
+        entry.generation += 1
+        entry.next_renewal = when
+        heapq.heappush(self._heap, (when, next(self._seq), entry.principal, entry.generation))
+        self._condition.notify()
+
+    def _kinit(self, args: List[str], entry: RenewalEntry) -> Optional[str]:
+        """执行kinit，成功返回None，失败返回错误信息"""
+        env = self.ccache_manager.env_for(self.env, entry.principal)
+        try:
+            result = self.run(['kinit'] + args, env=env, stdin=subprocess.DEVNULL,
+                              stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        except OSError as e:
+            return str(e)
+        if result.returncode != 0:
+            stderr = result.stderr.decode('utf-8', 'replace') if isinstance(result.stderr, bytes) \
+                else (result.stderr or '')
+            return stderr.strip() or f"退出码{result.returncode}"
+        return None
+
+    def _renew(self, entry: RenewalEntry) -> bool:
+        """续期或重新获取票据，并安排下一次续期"""
+        with entry.lock:
+            now = self.clock()
+            # 其他线程刚刚续期过
+            if entry.expires_at > now + 60 and entry.next_renewal > now:
+                return True
+
+            renewable = entry.expires_at > now and entry.renew_till > now + 60
+            error = None
+            if renewable:
+                error = self._kinit(['-R', entry.principal], entry)
+                if error is not None:
+                    logger.info(f"续期失败，从keytab重新获取票据: {entry.principal}: {error}")
+            if not renewable or error is not None:
+                error = self._kinit(['-kt', entry.keytab, entry.principal], entry)
+
+            now = self.clock()
+            if error is not None:
+                entry.failures += 1
+                entry.last_error = error
+                delay = min(self.retry_interval * (2 ** (entry.failures - 1)), 3600.0)
+                logger.error(f"获取服务票据失败: {entry.principal}: {error}，{delay:.0f}秒后重试")
+                with self._condition:
+                    if self._entries.get(entry.principal) is entry:
+                        self._schedule(entry, now + delay)
+                return False
+
+            entry.failures = 0
+            entry.last_error = None
+            entry.expires_at, entry.renew_till = self._read_expiry(entry, now)
+            next_renewal = now + max(1.0, (entry.expires_at - now) * self.fraction)
+            with self._condition:
+                if self._entries.get(entry.principal) is entry:
+                    self._schedule(entry, next_renewal)
+            logger.info(f"服务票据已更新: {entry.principal}，"
+                        f"下次续期于{next_renewal - now:.0f}秒后")
+            return True
+
+    def _read_expiry(self, entry: RenewalEntry, now: float) -> Tuple[float, float]:
+        """从凭据缓存读取TGT的到期时间和可续期截止时间"""
+        try:
+            credential = self.reader.read(entry.ccache_path).tgt()
+            if credential is not None:
+                return float(credential.endtime), float(credential.renew_till)
+        except (CCacheFormatError, OSError) as e:
+            logger.warning(f"无法读取服务凭据缓存 {entry.ccache_path}: {str(e)}")
+        return now + self.default_lifetime, 0.0
+
+    def next_due(self) -> Optional[float]:
+        """下一次续期的时间（epoch秒）"""
+        with self._condition:
+            self._discard_stale()
+            return self._heap[0][0] if self._heap else None
+
+    def _discard_stale(self):
+        # 调用方持有self._condition
+        while self._heap:
+            _, _, principal, generation = self._heap[0]
+            entry = self._entries.get(principal)
+            if entry is not None and entry.generation == generation:
+                break
+            heapq.heappop(self._heap)
+
+    def run_pending(self, now: Optional[float] = None) -> int:
+        """
+        执行所有到期的续期
+
+        Args:
+            now: 当前时间（epoch秒）
+
+        Returns:
+            int: 执行的续期次数
+        """
+        now = self.clock() if now is None else now
+        due = []
+        with self._condition:
+            while True:
+                self._discard_stale()
+                if not self._heap or self._heap[0][0] > now:
+                    break
+                _, _, principal, _ = heapq.heappop(self._heap)
+                due.append(self._entries[principal])
+        for entry in due:
+            self._renew(entry)
+        return len(due)
+
+    def start(self):
+        """启动后台续期线程（重复调用无副作用）"""
+        with self._condition:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopped = False
+            self._thread = threading.Thread(target=self._loop, name='kerberos-renewal', daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        """停止后台续期线程"""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def _loop(self):
+        while True:
+            with self._condition:
+                if self._stopped:
+                    return
+                self._discard_stale()
+                wait = self._heap[0][0] - self.clock() if self._heap else None
+                if wait is None or wait > 0:
+                    self._condition.wait(wait)
+                    continue
+            try:
+                self.run_pending()
+            except Exception as e:
+                logger.error(f"续期线程出错: {str(e)}")
+
+    def status(self) -> Dict[str, Dict[str, object]]:
+        """续期表的当前状态"""
+        with self._condition:
+            return {
+                principal: {
+                    'keytab': entry.keytab,
+                    'ccache': self.ccname(principal),
+                    'expires_at': entry.expires_at,
+                    'next_renewal': entry.next_renewal,
+                    'failures': entry.failures,
+                    'last_error': entry.last_error,
+                }
+                for principal, entry in self._entries.items()
+            }
+
+    def __len__(self):
+        return len(self._entries)
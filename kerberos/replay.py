@@ -0,0 +1,87 @@
+import hashlib
+import os
+import threading
+import time
+from typing import Dict, Optional, Set
+
+
+def authenticator_digest(client_id: str, timestamp: str) -> bytes:
+    """
+    根据解密后的认证器内容（客户端ID和时间戳）计算重放缓存键
+
+    不使用认证器密文本身，同一认证器换一种编码重放时键保持不变
+    """
+    return hashlib.blake2b(f'{client_id}\0{timestamp}'.encode(), digest_size=16).digest()
+
+
+class ReplayCache:
+    """
+    按时间分桶的认证器重放缓存
+
+    每个桶覆盖一个时钟偏差区间，认证器按其自身时间戳落入对应的桶。
+    桶内的认证器在时间戳超过允许偏差后都不会再被接受，因此整桶丢弃即可，
+    内存只与最近两个区间内的认证次数有关。
+    """
+
+    def __init__(self, skew_seconds: Optional[int] = None):
+        self.skew_seconds = skew_seconds if skew_seconds is not None else \
+            int(os.getenv('KERBEROS_CLOCK_SKEW', 300))
+        if self.skew_seconds <= 0:
+            raise ValueError('时钟偏差必须为正数')
+
+        self._lock = threading.Lock()
+        self._buckets: Dict[int, Set[bytes]] = {}
+        self._oldest = None
+
+    def check_and_add(self, digest: bytes, timestamp: float, now: Optional[float] = None) -> bool:
+        """
+        检查认证器是否为重放，未见过则记录
+
+        Args:
+            digest: 认证器摘要
+            timestamp: 认证器中的时间戳（epoch秒）
+            now: 当前时间，默认为time.time()
+
+        Returns:
+            bool: 首次出现返回True，重放返回False
+        """
+        if now is None:
+            now = time.time()
+        bucket_id = int(timestamp // self.skew_seconds)
+
+        with self._lock:
+            self._expire(int(now // self.skew_seconds))
+            bucket = self._buckets.get(bucket_id)
+            if bucket is None:
+                bucket = self._buckets[bucket_id] = set()
+                if self._oldest is None or bucket_id < self._oldest:
+                    self._oldest = bucket_id
+            elif digest in bucket:
+                return False
+            bucket.add(digest)
+            return True
+
+    def _expire(self, current: int):
+        # 桶b中的时间戳都小于(b+1)*skew，到(b+2)*skew时已全部超出偏差范围
+        if self._oldest is None or self._oldest > current - 2:
+            return
+        for bucket_id in [b for b in self._buckets if b <= current - 2]:
+            del self._buckets[bucket_id]
+        self._oldest = min(self._buckets) if self._buckets else None
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._buckets.clear()
+            self._oldest = None
+
+    def stats(self) -> Dict[str, int]:
+        """获取缓存统计信息"""
+        with self._lock:
+            return {
+                'buckets': len(self._buckets),
+                'entries': sum(len(bucket) for bucket in self._buckets.values()),
+            }
+
+    def __len__(self):
+        return sum(len(bucket) for bucket in self._buckets.values())
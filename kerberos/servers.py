@@ -1,31 +1,32 @@
 from datetime import datetime, timedelta
-from typing import Optional, Tuple, Dict, Any
+import base64
+from typing import Optional, Tuple, Dict, List
 from .crypto import KerberosCrypto
-import hashlib
+from .principals import PrincipalStore, cipher_key
+from .replay import ReplayCache, authenticator_digest
 
 class KerberosAS:
     """认证服务器(Authentication Server)"""
-    def __init__(self, crypto: KerberosCrypto):
+    def __init__(self, crypto: KerberosCrypto, principals: Optional[PrincipalStore] = None):
         self.crypto = crypto
-        # 模拟用户数据库，实际应用中应该使用真实的数据库
-        self.users = {
-            'test_user': hashlib.sha256('test_password'.encode()).hexdigest()
-        }
+        # 主体存储，保存加盐派生后的长期密钥，加载后常驻内存
+        self.principals = principals if principals is not None else PrincipalStore.from_env()
         
     def authenticate(self, username: str, password: str) -> Tuple[bool, Optional[str], Optional[bytes]]:
         """
         AS认证：验证用户身份并发放TGT
         """
         # 验证用户凭据
-        if username not in self.users or \
-           self.users[username] != hashlib.sha256(password.encode()).hexdigest():
+        if not self.principals.verify(username, password):
             return False, "用户名或密码错误", None
             
         # 生成客户端/TGS会话密钥
         session_key = self.crypto.create_session_key()
-        
-        # 创建TGT
-        tgt = self.crypto.create_ticket(
+        return True, self._issue_tgt(username, session_key), session_key
+
+    def _issue_tgt(self, username: str, session_key: bytes) -> str:
+        """创建TGT"""
+        return self.crypto.create_ticket(
             client_id=username,
             server_id='krbtgs',
             session_key=session_key,
@@ -33,23 +34,65 @@ class KerberosAS:
             lifetime=timedelta(hours=10),
             crypto=self.crypto.tgs_crypto
         )
-        
-        return True, tgt, session_key
+
+    def preauth_info(self, username: str) -> Tuple[str, int]:
+        """
+        预认证参数：客户端据此由密码派生长期密钥
+
+        Returns:
+            Tuple[str, int]: (base64编码的盐, 迭代次数)
+        """
+        salt, iterations = self.principals.preauth_params(username)
+        return base64.b64encode(salt).decode(), iterations
+
+    def authenticate_preauth(self, username: str,
+                             encrypted_timestamp: str) -> Tuple[bool, Optional[str], Optional[str]]:
+        """
+        AS认证（预认证）：密码不经过网络
+
+        客户端用长期密钥加密当前时间（格式与认证器相同）证明自己知道密码，
+        TGS会话密钥用客户端长期密钥加密后返回。
+
+        Args:
+            username: 用户名
+            encrypted_timestamp: 用长期密钥加密的时间戳
+
+        Returns:
+            Tuple[bool, Optional[str], Optional[str]]:
+                (是否成功, TGT或错误信息, 用客户端长期密钥加密的TGS会话密钥)
+        """
+        key = self.principals.long_term_key(username)
+        if key is None:
+            return False, "用户名或密码错误", None
+        client_key = cipher_key(key)
+        valid, auth_data = self.crypto.verify_authenticator(encrypted_timestamp, client_key)
+        if not valid:
+            if auth_data.get('error') == '认证器已过期':
+                return False, "预认证时间戳超出允许的时钟偏差", None
+            return False, "用户名或密码错误", None
+        if auth_data['client_id'] != username:
+            return False, "用户名或密码错误", None
+
+        session_key = self.crypto.create_session_key()
+        enc_session_key = self.crypto.cipher_cache.get(client_key).encrypt(session_key).decode()
+        return True, self._issue_tgt(username, session_key), enc_session_key
 
 class KerberosTGS:
     """票据授予服务器(Ticket Granting Server)"""
     def __init__(self, crypto: KerberosCrypto):
         self.crypto = crypto
         
-    def grant_service_ticket(self, tgt: str, authenticator: str,
-                           service_id: str) -> Tuple[bool, Optional[str], Optional[bytes]]:
+    def _verify_request(self, tgt: str, authenticator: str) -> Tuple[bool, Optional[str]]:
         """
-        TGS服务：验证TGT和认证器，发放服务票据
+        验证TGT和认证器
+
+        Returns:
+            Tuple[bool, Optional[str]]: (是否有效, 客户端ID或错误信息)
         """
         # 验证TGT
         tgt_valid, tgt_data = self.crypto.verify_ticket(tgt, self.crypto.tgs_crypto)
         if not tgt_valid:
-            return False, "TGT无效", None
+            return False, "TGT无效"
             
         # 验证认证器
         auth_valid, auth_data = self.crypto.verify_authenticator(
@@ -57,32 +100,78 @@ class KerberosTGS:
             tgt_data['session_key'].encode()
         )
         if not auth_valid:
-            return False, "认证器无效", None
+            return False, "认证器无效"
             
         # 验证客户端身份
         if auth_data['client_id'] != tgt_data['client_id']:
-            return False, "客户端身份不匹配", None
+            return False, "客户端身份不匹配"
             
-        # 生成新的会话密钥
-        service_session_key = self.crypto.create_session_key()
+        return True, tgt_data['client_id']
         
-        # 创建服务票据
+    def _issue_service_ticket(self, client_id: str, service_id: str,
+                              timestamp: datetime) -> Tuple[str, bytes]:
+        """为单个服务生成会话密钥和服务票据"""
+        service_session_key = self.crypto.create_session_key()
         service_ticket = self.crypto.create_ticket(
-            client_id=tgt_data['client_id'],
+            client_id=client_id,
             server_id=service_id,
             session_key=service_session_key,
-            timestamp=datetime.utcnow(),
+            timestamp=timestamp,
             lifetime=timedelta(hours=10),
             crypto=self.crypto.service_crypto
         )
+        return service_ticket, service_session_key
+        
+    def grant_service_ticket(self, tgt: str, authenticator: str,
+                           service_id: str) -> Tuple[bool, Optional[str], Optional[bytes]]:
+        """
+        TGS服务：验证TGT和认证器，发放服务票据
+        """
+        valid, result = self._verify_request(tgt, authenticator)
+        if not valid:
+            return False, result, None
+            
+        service_ticket, service_session_key = self._issue_service_ticket(
+            result, service_id, datetime.utcnow())
         
         return True, service_ticket, service_session_key
+        
+    def grant_service_tickets(self, tgt: str, authenticator: str,
+                              service_ids: List[str]) -> Tuple[bool, Optional[str], Dict[str, Tuple[str, bytes]]]:
+        """
+        TGS服务：一次验证TGT和认证器，为多个服务发放票据
+        
+        Args:
+            tgt: 票据授予票据
+            authenticator: 使用TGS会话密钥加密的认证器
+            service_ids: 服务ID列表
+            
+        Returns:
+            Tuple[bool, Optional[str], Dict[str, Tuple[str, bytes]]]:
+                (是否成功, 错误信息, {服务ID: (服务票据, 服务会话密钥)})
+        """
+        if not service_ids:
+            return False, "未指定服务", {}
+            
+        valid, result = self._verify_request(tgt, authenticator)
+        if not valid:
+            return False, result, {}
+            
+        timestamp = datetime.utcnow()
+        tickets = {
+            service_id: self._issue_service_ticket(result, service_id, timestamp)
+            for service_id in dict.fromkeys(service_ids)
+        }
+        
+        return True, None, tickets
 
 class KerberosService:
     """Kerberos应用服务器"""
     def __init__(self, service_id: str, crypto: KerberosCrypto):
         self.service_id = service_id
         self.crypto = crypto
+        # 认证器重放缓存，桶大小与时钟偏差一致
+        self.replay_cache = ReplayCache(crypto.clock_skew)
         
     def verify_client(self, service_ticket: str,
                      authenticator: str) -> Tuple[bool, Optional[str]]:
@@ -113,4 +202,10 @@ class KerberosService:
         if auth_data['client_id'] != ticket_data['client_id']:
             return False, "客户端身份不匹配"
             
+        # 检查认证器重放
+        if not self.replay_cache.check_and_add(
+                authenticator_digest(auth_data['client_id'], auth_data['timestamp']),
+                auth_data['issued_at']):
+            return False, "认证器重放"
+            
         return True, None 
\ No newline at end of file
@@ -0,0 +1,111 @@
+import base64
+import os
+from typing import Dict, List
+
+from cryptography.exceptions import InvalidTag
+from cryptography.fernet import Fernet, InvalidToken, MultiFernet
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM, ChaCha20Poly1305
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
+
+# 密文头部的套件标识（Fernet令牌自带的版本字节为0x80）
+FERNET_SUITE_ID = 0x80
+AESGCM_SUITE_ID = 0x01
+CHACHA20_SUITE_ID = 0x02
+
+SUITE_IDS = {
+    'fernet': FERNET_SUITE_ID,
+    'aes-gcm': AESGCM_SUITE_ID,
+    'chacha20-poly1305': CHACHA20_SUITE_ID,
+}
+
+_AEAD_CLASSES = {
+    AESGCM_SUITE_ID: AESGCM,
+    CHACHA20_SUITE_ID: ChaCha20Poly1305,
+}
+
+_NONCE_SIZE = 12
+
+
+def _derive_key(key: bytes, suite_id: int) -> bytes:
+    """从Fernet格式的长期密钥为AEAD套件派生独立的256位密钥"""
+    return HKDF(
+        algorithm=hashes.SHA256(),
+        length=32,
+        salt=None,
+        info=b'kerberos-ticket-suite-%d' % suite_id,
+    ).derive(base64.urlsafe_b64decode(key))
+
+
+class TicketCipher:
+    """
+    可插拔加密套件
+
+    使用配置的套件加密，解密时根据密文头部的套件标识选择算法，
+    因此不同套件签发的票据可以混合验证。与MultiFernet一致，第一个密钥用于加密，
+    所有密钥都可用于解密。
+    """
+
+    def __init__(self, keys: List[bytes], suite: str = 'fernet'):
+        if suite not in SUITE_IDS:
+            raise ValueError(f"不支持的加密套件: {suite}")
+        self.suite = suite
+        self.suite_id = SUITE_IDS[suite]
+        self.keys = list(keys)
+        self._fernet = MultiFernet([Fernet(key) for key in self.keys])
+        self._aead: Dict[int, list] = {}
+
+    def _aead_ciphers(self, suite_id: int) -> list:
+        ciphers = self._aead.get(suite_id)
+        if ciphers is None:
+            cipher_class = _AEAD_CLASSES[suite_id]
+            ciphers = [cipher_class(_derive_key(key, suite_id)) for key in self.keys]
+            self._aead[suite_id] = ciphers
+        return ciphers
+
+    def encrypt(self, data: bytes) -> bytes:
+        """
+        加密数据
+
+        Args:
+            data: 明文
+
+        Returns:
+            bytes: URL安全base64编码的密文，首字节为套件标识
+        """
+        if self.suite_id == FERNET_SUITE_ID:
+            return self._fernet.encrypt(data)
+
+        header = bytes((self.suite_id,))
+        nonce = os.urandom(_NONCE_SIZE)
+        ciphertext = self._aead_ciphers(self.suite_id)[0].encrypt(nonce, data, header)
+        return base64.urlsafe_b64encode(header + nonce + ciphertext)
+
+    def decrypt(self, token: bytes) -> bytes:
+        """
+        解密数据
+
+        Args:
+            token: encrypt生成的密文
+
+        Returns:
+            bytes: 明文
+        """
+        # Fernet令牌以版本字节0x80开头，base64后固定为'g'
+        if token[:1] == b'g':
+            return self._fernet.decrypt(token)
+
+        try:
+            raw = base64.urlsafe_b64decode(token)
+        except (ValueError, TypeError) as e:
+            raise InvalidToken from e
+        if len(raw) <= 1 + _NONCE_SIZE or raw[0] not in _AEAD_CLASSES:
+            raise InvalidToken
+
+        header, nonce, ciphertext = raw[:1], raw[1:1 + _NONCE_SIZE], raw[1 + _NONCE_SIZE:]
+        for cipher in self._aead_ciphers(raw[0]):
+            try:
+                return cipher.decrypt(nonce, ciphertext, header)
+            except InvalidTag:
+                continue
+        raise InvalidToken
@@ -0,0 +1,341 @@
+import logging
+import logging.handlers
+import os
+import socket
+import subprocess
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 就绪探测目标: (主机, 端口, tcp或udp)
+Probe = Tuple[str, int, str]
+
+
+def probe_port(host: str, port: int, proto: str = 'tcp', timeout: float = 0.5) -> bool:
+    """
+    探测端口是否在服务
+
+    TCP端口能建立连接即视为就绪；UDP端口发送一个空数据报，收到任意回复才视为就绪
+    （超时可能是端口关闭但ICMP被丢弃，不能当作就绪）。
+
+    Args:
+        host: 主机
+        port: 端口
+        proto: tcp或udp
+        timeout: 超时时间（秒）
+
+    Returns:
+        bool: 是否就绪
+    """
+    if proto == 'tcp':
+        try:
+            with socket.create_connection((host, port), timeout=timeout):
+                return True
+        except OSError:
+            return False
+
+    family = socket.AF_INET6 if ':' in host else socket.AF_INET
+    with socket.socket(family, socket.SOCK_DGRAM) as sock:
+        sock.settimeout(timeout)
+        try:
+            sock.connect((host, port))
+            sock.send(b'\x00')
+            sock.recv(1)
+        except OSError:
+            return False
+    return True
+
+
+class SupervisedDaemon:
+    """被监管的守护进程"""
+
+    def __init__(self, name: str, command: List[str], probes: List[Probe],
+                 env: Optional[Dict[str, str]] = None, log_path: Optional[str] = None):
+        self.name = name
+        self.command = command
+        self.probes = probes
+        self.env = env
+        self.log_path = log_path
+        self.process: Optional[subprocess.Popen] = None
+        self.started_at: Optional[float] = None
+        self.ready = False
+        self.ready_latency: Optional[float] = None
+        self.restarts = 0
+        self.next_restart = 0.0
+        self.restart_delay = 0.0
+        self.stopping = False
+        # 端口已由外部进程（如start_kdc.sh启动的KDC）提供时沿用，不启动也不监管
+        self.external = False
+        # 监控线程中的非阻塞就绪探测: 截止时间、下次探测时间、当前退避间隔
+        self.ready_deadline = 0.0
+        self.next_probe = 0.0
+        self.probe_delay = 0.05
+        self.drain_thread: Optional[threading.Thread] = None
+        self.log_handler: Optional[logging.Handler] = None
+        self.lock = threading.Lock()
+
+    @property
+    def running(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+
+class ProcessSupervisor:
+    """
+    KDC/kadmind进程监管
+
+    守护进程以前台模式运行，标准输出和标准错误合并后由专门的线程持续读取并写入按大小
+    轮转的日志文件，管道不会写满阻塞守护进程。启动后按指数退避探测端口直到就绪，并记录
+    启动到就绪的耗时。一个监控线程检查所有进程，意外退出的进程按退避间隔重启；
+    监控线程中的就绪探测每轮每个进程最多探测一次，不会因为某个进程迟迟未就绪而阻塞其他进程。
+    启动前先探测端口，端口已在服务时沿用外部进程，不再启动。
+    """
+
+    def __init__(self, log_dir: Optional[str] = None, ready_timeout: Optional[float] = None,
+                 check_interval: float = 1.0, max_restart_delay: float = 60.0):
+        self.log_dir = log_dir or os.getenv('KDC_LOG_DIR', os.path.join(os.getcwd(), 'logs'))
+        self.ready_timeout = ready_timeout if ready_timeout is not None else \
+            float(os.getenv('KDC_READY_TIMEOUT', 30))
+        self.log_max_bytes = int(os.getenv('KDC_LOG_MAX_BYTES', 10 * 1024 * 1024))
+        self.log_backup_count = int(os.getenv('KDC_LOG_BACKUP_COUNT', 5))
+        self.check_interval = check_interval
+        self.max_restart_delay = max_restart_delay
+        self.daemons: Dict[str, SupervisedDaemon] = {}
+        self._monitor: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    def add(self, name: str, command: List[str], probes: List[Probe],
+            env: Optional[Dict[str, str]] = None) -> SupervisedDaemon:
+        """
+        登记守护进程
+
+        Args:
+            name: 名称，也用作日志文件名
+            command: 前台运行的命令
+            probes: 就绪探测目标
+            env: 环境变量
+
+        Returns:
+            SupervisedDaemon: 登记的守护进程
+        """
+        daemon = SupervisedDaemon(name, command, probes, env,
+                                  os.path.join(self.log_dir, f"{name}.log"))
+        self.daemons[name] = daemon
+        return daemon
+
+    def _open_log(self, daemon: SupervisedDaemon) -> logging.Handler:
+        # 每个守护进程独立的轮转日志，不经过全局logger注册表
+        if daemon.log_handler is None:
+            os.makedirs(self.log_dir, exist_ok=True)
+            daemon.log_handler = logging.handlers.RotatingFileHandler(
+                daemon.log_path, maxBytes=self.log_max_bytes, backupCount=self.log_backup_count)
+            daemon.log_handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+        return daemon.log_handler
+
+    @staticmethod
+    def _drain(process: subprocess.Popen, handler: logging.Handler, name: str):
+        # 持续读取直到管道关闭（进程退出）
+        for line in iter(process.stdout.readline, b''):
+            handler.handle(logging.LogRecord(
+                name, logging.INFO, '', 0, line.decode('utf-8', 'replace').rstrip('\n'), None, None))
+        process.stdout.close()
+
+    def _spawn(self, daemon: SupervisedDaemon):
+        handler = self._open_log(daemon)
+        daemon.process = subprocess.Popen(
+            daemon.command,
+            env=daemon.env,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT
+        )
+        daemon.started_at = time.monotonic()
+        daemon.ready = False
+        daemon.ready_deadline = daemon.started_at + self.ready_timeout
+        daemon.next_probe = daemon.started_at
+        daemon.probe_delay = 0.05
+        daemon.drain_thread = threading.Thread(
+            target=self._drain, args=(daemon.process, handler, daemon.name),
+            name=f"drain-{daemon.name}", daemon=True)
+        daemon.drain_thread.start()
+        logger.info(f"已启动{daemon.name}: pid={daemon.process.pid}")
+
+    @staticmethod
+    def _probe(daemon: SupervisedDaemon) -> bool:
+        return bool(daemon.probes) and \
+            all(probe_port(host, port, proto) for host, port, proto in daemon.probes)
+
+    @staticmethod
+    def _mark_ready(daemon: SupervisedDaemon):
+        daemon.ready = True
+        daemon.ready_latency = time.monotonic() - daemon.started_at
+        logger.info(f"{daemon.name}已就绪，耗时{daemon.ready_latency:.3f}秒")
+
+    def _adopt(self, daemon: SupervisedDaemon) -> bool:
+        """端口已在服务时沿用外部进程"""
+        if not self._probe(daemon):
+            return False
+        daemon.external = True
+        daemon.ready = True
+        daemon.ready_latency = None
+        logger.info(f"{daemon.name}的端口已在服务，沿用外部进程，不再启动")
+        return True
+
+    def wait_ready(self, name: str, timeout: Optional[float] = None) -> bool:
+        """
+        按指数退避探测守护进程是否就绪
+
+        Args:
+            name: 守护进程名称
+            timeout: 超时时间（秒），默认KDC_READY_TIMEOUT
+
+        Returns:
+            bool: 是否在超时前就绪
+        """
+        daemon = self.daemons[name]
+        deadline = time.monotonic() + (timeout if timeout is not None else self.ready_timeout)
+        delay = 0.05
+        while True:
+            if not daemon.running:
+                logger.error(f"{name}在就绪前退出，退出码: {daemon.process.returncode if daemon.process else None}")
+                return False
+            if self._probe(daemon):
+                self._mark_ready(daemon)
+                return True
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                logger.error(f"{name}在{timeout or self.ready_timeout}秒内未就绪")
+                return False
+            time.sleep(min(delay, remaining))
+            delay = min(delay * 2, 1.0)
+
+    def start(self, name: str, wait: bool = True) -> bool:
+        """
+        启动守护进程
+
+        Args:
+            name: 守护进程名称
+            wait: 是否等待就绪
+
+        Returns:
+            bool: 是否已就绪（wait为False时返回是否已启动）
+        """
+        daemon = self.daemons[name]
+        with daemon.lock:
+            daemon.stopping = False
+            if not daemon.running:
+                if self._adopt(daemon):
+                    return True
+                daemon.external = False
+                self._spawn(daemon)
+        self._start_monitor()
+        return self.wait_ready(name) if wait else daemon.running
+
+    def stop(self, name: str, timeout: float = 10.0):
+        """停止守护进程，不再自动重启"""
+        daemon = self.daemons[name]
+        with daemon.lock:
+            daemon.stopping = True
+            process = daemon.process
+            if process is None or process.poll() is not None:
+                return
+            process.terminate()
+            try:
+                process.wait(timeout)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+        if daemon.drain_thread is not None:
+            daemon.drain_thread.join(timeout)
+        daemon.ready = False
+        logger.info(f"已停止{name}")
+
+    def stop_all(self):
+        """停止监控线程和全部守护进程"""
+        self._stopped.set()
+        for name in list(self.daemons):
+            self.stop(name)
+        if self._monitor is not None:
+            self._monitor.join(self.check_interval * 2)
+            self._monitor = None
+        for daemon in self.daemons.values():
+            if daemon.log_handler is not None:
+                daemon.log_handler.close()
+                daemon.log_handler = None
+
+    def _start_monitor(self):
+        if self._monitor is not None and self._monitor.is_alive():
+            return
+        self._stopped.clear()
+        self._monitor = threading.Thread(target=self._monitor_loop, name='kdc-supervisor', daemon=True)
+        self._monitor.start()
+
+    def _monitor_loop(self):
+        while not self._stopped.wait(self.check_interval):
+            for daemon in list(self.daemons.values()):
+                try:
+                    self._check(daemon)
+                except Exception as e:
+                    logger.error(f"检查{daemon.name}出错: {str(e)}")
+
+    def _poll_ready(self, daemon: SupervisedDaemon, now: float):
+        """非阻塞地探测一次就绪状态，按指数退避安排下次探测；超时未就绪时终止进程，按崩溃重启"""
+        if now < daemon.next_probe:
+            return
+        if self._probe(daemon):
+            self._mark_ready(daemon)
+            return
+        if now >= daemon.ready_deadline:
+            logger.error(f"{daemon.name}在{self.ready_timeout}秒内未就绪，终止后重启")
+            daemon.process.terminate()
+            return
+        daemon.next_probe = now + daemon.probe_delay
+        daemon.probe_delay = min(daemon.probe_delay * 2, 1.0)
+
+    def _check(self, daemon: SupervisedDaemon):
+        """检查守护进程，未就绪时探测一次，意外退出时按退避间隔重启"""
+        with daemon.lock:
+            if daemon.stopping or daemon.external or daemon.process is None:
+                return
+            now = time.monotonic()
+            if daemon.running:
+                if not daemon.ready:
+                    self._poll_ready(daemon, now)
+                # 连续运行足够长时间后重置退避
+                elif daemon.restart_delay and now - daemon.started_at > self.max_restart_delay:
+                    daemon.restart_delay = 0.0
+                return
+            if daemon.next_restart == 0.0:
+                daemon.ready = False
+                daemon.restart_delay = min(max(daemon.restart_delay * 2, 1.0), self.max_restart_delay)
+                daemon.next_restart = now + daemon.restart_delay
+                logger.warning(f"{daemon.name}意外退出（退出码{daemon.process.returncode}），"
+                               f"{daemon.restart_delay:.0f}秒后重启")
+            if now < daemon.next_restart:
+                return
+            daemon.next_restart = 0.0
+            if self._adopt(daemon):
+                return
+            daemon.restarts += 1
+            self._spawn(daemon)
+
+    def metrics(self) -> Dict[str, Dict[str, object]]:
+        """
+        守护进程状态和指标
+
+        Returns:
+            Dict[str, Dict[str, object]]: 名称 -> {pid, running, ready, restarts, external, start_to_ready_seconds}
+        """
+        return {
+            name: {
+                'pid': daemon.process.pid if daemon.process is not None else None,
+                'running': daemon.running,
+                'ready': daemon.ready,
+                'restarts': daemon.restarts,
+                'external': daemon.external,
+                'start_to_ready_seconds': daemon.ready_latency,
+                'log_path': daemon.log_path,
+            }
+            for name, daemon in self.daemons.items()
+        }
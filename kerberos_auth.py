@@ -1,6 +1,8 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import asyncio
+import functools
 import os
 import subprocess
 import logging
@@ -9,6 +11,14 @@ import tempfile
 from datetime import datetime, timedelta
 from flask import session
 from dotenv import load_dotenv
+from kerberos.ccache import CCacheFormatError, CCacheManager, CredentialCacheReader, ccache_path
+from kerberos.kadmin import KadminProvisioner, PrincipalInfoCache, parse_getprinc, parse_listprincs, quote_arg
+
+try:
+    import gssapi
+    from gssapi.raw import acquire_cred_with_password
+except ImportError:
+    gssapi = None
 
 # 加载环境变量
 load_dotenv()
@@ -17,8 +27,8 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger('kerberos_auth')
 
-class KerberosAuth:
-    """Kerberos认证管理类"""
+class KerberosAuthBase:
+    """Kerberos认证管理的公共部分（配置、凭据缓存、主体缓存、命令输出解析），同步和异步版本共用"""
     
     def __init__(self):
         """初始化Kerberos环境"""
@@ -33,7 +43,20 @@ class KerberosAuth:
         
         # 初始化环境变量
         self.env = os.environ.copy()
-        self.env['KRB5_CONFIG'] = self.conf_file
+        if self.conf_file:
+            self.env['KRB5_CONFIG'] = self.conf_file
+        
+        # 凭据缓存读取器，文件未变化时不重新解析
+        self.ccache_reader = CredentialCacheReader()
+        
+        # 每个主体独立的凭据缓存，并发登录互不覆盖
+        self.ccache_manager = CCacheManager()
+        
+        # 主体元数据缓存，登录时不再调用kadmin.local查询主体
+        self.principal_cache = PrincipalInfoCache(self._load_principal_info, self._list_principals)
+        
+        # 登录后端: auto（优先进程内GSSAPI，不可用时使用kinit）、gssapi、kinit
+        self.login_backend = os.getenv('KERBEROS_LOGIN_BACKEND', 'auto')
     
     def set_mode(self, dev_mode=True):
         """设置认证模式
@@ -69,41 +92,143 @@ class KerberosAuth:
                 self.logger.info(f"已创建示例配置文件: {self.conf_file}")
         else:
             self.logger.info(f"使用Kerberos配置: {self.conf_file}")
+        
+        # 进程内GSSAPI从进程环境读取配置文件，只在启动时设置一次，登录路径不再修改全局环境
+        if gssapi is not None and self.conf_file:
+            os.environ['KRB5_CONFIG'] = self.conf_file
+        
+        self.warm_principal_cache()
     
-    def authenticate(self, principal, password, realm='HADOOP.COM'):
-        """使用Kerberos认证用户
+    def warm_principal_cache(self):
+        """用一次listprincs预热主体缓存
+        
+        Returns:
+            int: 加载的主体数量，kadmin.local不可用时返回0
+        """
+        try:
+            return self.principal_cache.warm()
+        except Exception as e:
+            self.logger.warning(f"预热主体缓存失败: {str(e)}")
+            return 0
+    
+    def _kadmin_query(self, query):
+        """执行一条kadmin.local查询并返回标准输出"""
+        env = self.env.copy()
+        if self.conf_file:
+            env['KRB5_CONFIG'] = self.conf_file
+        process = subprocess.Popen(
+            ['kadmin.local', '-q', query],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            env=env
+        )
+        stdout, stderr = process.communicate()
+        return stdout.decode()
+    
+    def _load_principal_info(self, principal):
+        """通过getprinc加载主体元数据，主体不存在时返回None"""
+        return parse_getprinc(self._kadmin_query(f'getprinc {principal}'))
+    
+    def _list_principals(self):
+        """通过listprincs列出全部主体"""
+        process = subprocess.run(
+            ['kadmin.local', '-q', 'listprincs'],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            env=self.env
+        )
+        if process.returncode != 0:
+            raise RuntimeError(process.stderr.decode().strip() or f"退出码{process.returncode}")
+        return parse_listprincs(process.stdout.decode())
+    
+    @staticmethod
+    def _parse_principal(principal, realm):
+        """拆分principal@REALM
         
         Args:
-            principal (str): 主体名称
-            password (str): 密码
-            realm (str): 领域
+            principal (str): 主体名称，可以包含领域
+            realm (str): 默认领域
         
         Returns:
-            bool: 认证是否成功
+            tuple: (主体名称, 领域, 完整主体名称)
         """
-        # 在开发模式下使用系统内置认证
-        if self.dev_mode:
-            return self.simulate_auth(principal, password, realm)
-            
-        # 从principal中提取领域信息
         if '@' in principal:
             parts = principal.split('@')
-            principal_name = parts[0]
             # 如果在principal中指定了领域，则覆盖参数传入的领域
             if len(parts) > 1:
                 realm = parts[1]
-            full_principal = principal
-        else:
-            principal_name = principal
-            full_principal = f"{principal}@{realm}"
+            return parts[0], realm, principal
+        return principal, realm, f"{principal}@{realm}"
+    
+    def _kinit_env(self, full_principal):
+        """kinit子进程的环境变量，使用该主体独立的凭据缓存"""
+        env = self.ccache_manager.env_for(self.env, full_principal)
+        if self.conf_file:
+            env['KRB5_CONFIG'] = self.conf_file
+        return env
+    
+    def _kinit_outcome(self, full_principal, returncode, stderr):
+        """根据kinit的退出码判断认证结果"""
+        if returncode == 0:
+            self.logger.info(f"认证成功: {full_principal}")
+            return True
+        self.logger.error(f"认证失败: {stderr.decode()}")
+        return False
+    
+    def _register_ccache(self, full_principal):
+        """登记主体的凭据缓存，到期时间取自缓存中的票据"""
+        expiry = None
+        try:
+            expiry = self.ccache_reader.read(self.ccache_manager.path_for(full_principal)).expiry()
+        except (CCacheFormatError, OSError):
+            pass
+        self.ccache_manager.register(full_principal, expiry)
+    
+    def _authenticate_gssapi(self, full_principal, password, ccache):
+        """在进程内通过GSSAPI获取初始凭据
         
-        # 使用真实的Kerberos认证
-        self.logger.info(f"尝试Kerberos认证: {full_principal}")
+        Args:
+            full_principal (str): 完整主体名称
+            password (str): 密码
+            ccache (str): 凭据缓存名称
+        
+        Returns:
+            bool: 认证是否成功；GSSAPI不可用时返回None，由调用方回退到kinit
+        """
+        try:
+            name = gssapi.Name(full_principal, gssapi.NameType.kerberos_principal)
+            result = acquire_cred_with_password(name, password.encode(), usage='initiate')
+        except gssapi.exceptions.GSSError as e:
+            self.logger.error(f"认证失败: {str(e)}")
+            return False
+        except Exception as e:
+            self.logger.warning(f"GSSAPI认证不可用，回退到kinit: {str(e)}")
+            return None
+        
+        # 与kinit一致，将票据写入凭据缓存供后续klist/Hadoop命令使用；
+        # 写入失败时由调用方回退到kinit，否则后续命令找不到凭据缓存
+        try:
+            gssapi.raw.store_cred_into({b'ccache': ccache.encode()}, result.creds,
+                                       usage='initiate', overwrite=True)
+        except Exception as e:
+            self.logger.warning(f"写入凭据缓存失败，回退到kinit: {str(e)}")
+            return None
+        
+        self.logger.info(f"认证成功: {full_principal}")
+        return True
+    
+    def _authenticate_kinit(self, full_principal, password):
+        """通过kinit子进程获取初始凭据，票据写入该主体独立的凭据缓存
         
+        Args:
+            full_principal (str): 完整主体名称
+            password (str): 密码
+        
+        Returns:
+            bool: 认证是否成功
+        """
         try:
-            # 设置特定领域的环境变量
-            env = self.env.copy()
-            env['KRB5CCNAME'] = f"FILE:/tmp/krb5cc_{os.getuid()}_{realm.lower()}"
+            env = self._kinit_env(full_principal)
             
             # 使用kinit获取票据
             kinit_process = subprocess.Popen(
@@ -114,28 +239,59 @@ class KerberosAuth:
                 env=env
             )
             
-            # 输入密码
-            kinit_process.stdin.write(f"{password}\n".encode())
-            kinit_process.stdin.flush()
-            
-            # 获取输出
-            stdout, stderr = kinit_process.communicate()
+            # 输入密码并获取输出
+            stdout, stderr = kinit_process.communicate(f"{password}\n".encode())
             
             # 检查结果
-            if kinit_process.returncode == 0:
-                self.logger.info(f"认证成功: {full_principal}")
-                return True
-            else:
-                stderr_str = stderr.decode()
-                self.logger.error(f"认证失败: {stderr_str}")
-                return False
+            return self._kinit_outcome(full_principal, kinit_process.returncode, stderr)
         
         except Exception as e:
             self.logger.error(f"认证过程出错: {str(e)}")
             return False
     
-    def verify_ticket(self):
-        """验证当前票据是否有效
+    def _ticket_env(self, principal=None):
+        """票据命令的环境变量，指定主体时使用该主体的隔离缓存"""
+        if principal:
+            return self.ccache_manager.env_for(self.env, principal)
+        return self.env
+    
+    def _verify_ticket_file(self, env):
+        """直接读取FILE类型凭据缓存验证票据
+        
+        Returns:
+            tuple: (是否有效, 主体名称, 到期时间)；需要回退到klist时返回None
+        """
+        ccname = env.get('KRB5CCNAME')
+        path = ccache_path(ccname)
+        if path is None:
+            return None
+        
+        try:
+            ccache = self.ccache_reader.read(path)
+        except FileNotFoundError:
+            if not ccname:
+                # 默认缓存文件在检查后被删除，由klist按default_ccache_name判断
+                return None
+            self.logger.warning("没有找到Kerberos票据")
+            return (False, None, None)
+        except (CCacheFormatError, OSError) as e:
+            self.logger.warning(f"无法读取凭据缓存，使用klist: {str(e)}")
+            return None
+        
+        principal = str(ccache.principal)
+        expiry = ccache.expiry()
+        if expiry is None:
+            self.logger.warning("凭据缓存中没有票据")
+            return (False, principal, None)
+        
+        expiry_time = datetime.fromtimestamp(expiry)
+        return (expiry_time > datetime.now(), principal, expiry_time)
+    
+    def _verify_ticket_klist(self, env=None):
+        """通过klist输出验证当前票据
+        
+        Args:
+            env (dict): 子进程环境变量，默认使用self.env
         
         Returns:
             tuple: (是否有效, 主体名称, 到期时间)
@@ -146,101 +302,67 @@ class KerberosAuth:
                 ['klist'],
                 stdout=subprocess.PIPE,
                 stderr=subprocess.PIPE,
-                env=self.env
+                env=env or self.env
             )
             
             # 获取输出
             stdout, stderr = klist_process.communicate()
-            output = stdout.decode()
-            
-            # 检查是否有票据
-            if "No credentials cache found" in output or "票据缓存中没有凭据" in output:
-                self.logger.warning("没有找到Kerberos票据")
-                return (False, None, None)
-            
-            # 解析主体名称
-            principal_line = [line for line in output.split('\n') if "Default principal:" in line or "默认主体:" in line]
-            if not principal_line:
-                self.logger.warning("无法解析主体名称")
-                return (False, None, None)
-            
-            principal = principal_line[0].split(':')[1].strip()
-            
-            # 解析到期时间
-            expiry_lines = [line for line in output.split('\n') if "valid until" in line or "有效期至" in line]
-            if not expiry_lines:
-                self.logger.warning("无法解析票据到期时间")
-                return (False, principal, None)
-            
-            # 尝试解析日期时间
-            try:
-                expiry_text = expiry_lines[0].split('valid until')[1].strip()
-                expiry_time = datetime.strptime(expiry_text, "%m/%d/%Y %H:%M:%S")
-            except:
-                try:
-                    # 尝试其他日期格式
-                    expiry_text = expiry_lines[0].split('有效期至')[1].strip()
-                    expiry_time = datetime.strptime(expiry_text, "%Y-%m-%d %H:%M:%S")
-                except:
-                    self.logger.warning(f"无法解析到期时间: {expiry_lines[0]}")
-                    expiry_time = datetime.now() + timedelta(hours=10)  # 默认10小时
-            
-            # 检查是否过期
-            is_valid = expiry_time > datetime.now()
-            
-            return (is_valid, principal, expiry_time)
+            return self._parse_klist_output(stdout.decode())
         
         except Exception as e:
             self.logger.error(f"验证票据出错: {str(e)}")
             return (False, None, None)
     
-    def logout(self):
-        """销毁Kerberos票据"""
-        try:
-            # 执行kdestroy命令销毁票据
-            subprocess.run(['kdestroy'], env=self.env, check=True)
-            self.logger.info("已销毁Kerberos票据")
-            return True
-        except Exception as e:
-            self.logger.error(f"销毁票据出错: {str(e)}")
-            return False
-    
-    def get_principal_info(self, principal):
-        """获取主体信息
-        
-        Args:
-            principal (str): 主体名称
+    def _parse_klist_output(self, output):
+        """解析klist输出
         
         Returns:
-            dict: 主体信息
+            tuple: (是否有效, 主体名称, 到期时间)
         """
+        # 检查是否有票据
+        if "No credentials cache found" in output or "票据缓存中没有凭据" in output:
+            self.logger.warning("没有找到Kerberos票据")
+            return (False, None, None)
+        
+        # 解析主体名称
+        principal_line = [line for line in output.split('\n') if "Default principal:" in line or "默认主体:" in line]
+        if not principal_line:
+            self.logger.warning("无法解析主体名称")
+            return (False, None, None)
+        
+        principal = principal_line[0].split(':')[1].strip()
+        
+        # 解析到期时间
+        expiry_lines = [line for line in output.split('\n') if "valid until" in line or "有效期至" in line]
+        if not expiry_lines:
+            self.logger.warning("无法解析票据到期时间")
+            return (False, principal, None)
+        
+        # 尝试解析日期时间
         try:
-            # 执行kadmin.local命令获取主体信息
-            cmd = ['kadmin.local', '-q', f'getprinc {principal}']
-            process = subprocess.Popen(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                env=self.env
-            )
-            
-            # 获取输出
-            stdout, stderr = process.communicate()
-            output = stdout.decode()
-            
-            # 解析输出
-            info = {}
-            lines = output.split('\n')
-            for line in lines:
-                if ':' in line:
-                    key, value = line.split(':', 1)
-                    info[key.strip()] = value.strip()
-            
-            return info
+            expiry_text = expiry_lines[0].split('valid until')[1].strip()
+            expiry_time = datetime.strptime(expiry_text, "%m/%d/%Y %H:%M:%S")
+        except:
+            try:
+                # 尝试其他日期格式
+                expiry_text = expiry_lines[0].split('有效期至')[1].strip()
+                expiry_time = datetime.strptime(expiry_text, "%Y-%m-%d %H:%M:%S")
+            except:
+                self.logger.warning(f"无法解析到期时间: {expiry_lines[0]}")
+                expiry_time = datetime.now() + timedelta(hours=10)  # 默认10小时
         
-        except Exception as e:
-            self.logger.error(f"获取主体信息出错: {str(e)}")
-            return {}
+        # 检查是否过期
+        is_valid = expiry_time > datetime.now()
+        
+        return (is_valid, principal, expiry_time)
+    
+    def _remove_ccache(self, principal):
+        """删除主体的隔离缓存"""
+        # 隔离缓存是FILE类型，直接删除文件即可，无需启动kdestroy
+        self.ccache_manager.remove(principal)
+        self.ccache_reader.invalidate(self.ccache_manager.path_for(principal))
+        self.logger.info(f"已销毁Kerberos票据: {principal}")
+        return True
     
     def create_sample_config(self):
         """创建示例配置文件（用于开发环境）"""
@@ -276,82 +398,17 @@ class KerberosAuth:
         with open(self.conf_file, 'w') as f:
             f.write(krb5_conf)
     
-    def simulate_auth(self, principal, password, realm='HADOOP.COM'):
-        """Kerberos认证（开发环境）
+    def _builtin_auth(self, principal, password, realm):
+        """使用系统内置凭据认证（开发环境）
         
         Args:
-            principal (str): 主体名称
+            principal (str): 不含领域的主体名称
             password (str): 密码
             realm (str): 领域
         
         Returns:
             bool: 认证是否成功
         """
-        self.logger.info(f"进行Kerberos认证: {principal}@{realm}")
-        
-        # 从principal@REALM格式中提取主体名称
-        if '@' in principal:
-            parts = principal.split('@')
-            principal = parts[0]
-            # 如果在principal中指定了领域，则覆盖参数传入的领域
-            if len(parts) > 1:
-                realm = parts[1]
-        
-        # 首先尝试使用KDC验证（如果KDC服务正在运行）
-        try:
-            # 构建完整的主体名称
-            full_principal = f"{principal}@{realm}"
-            
-            # 设置环境变量
-            env = self.env.copy()
-            env['KRB5_CONFIG'] = self.conf_file
-            
-            # 使用kadmin.local检查主体是否存在
-            cmd = f"kadmin.local -q \"getprinc {full_principal}\" | grep Principal"
-            process = subprocess.Popen(
-                cmd,
-                shell=True,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                env=env
-            )
-            
-            stdout, stderr = process.communicate()
-            output = stdout.decode()
-            
-            # 如果主体存在，尝试使用kinit进行认证
-            if full_principal in output:
-                self.logger.info(f"发现KDC中的主体: {full_principal}，尝试认证")
-                
-                # 使用kinit尝试认证
-                kinit_cmd = f"echo '{password}' | kinit {full_principal}"
-                kinit_process = subprocess.Popen(
-                    kinit_cmd,
-                    shell=True,
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    env=env
-                )
-                
-                stdout, stderr = kinit_process.communicate()
-                
-                # 判断认证是否成功
-                if kinit_process.returncode == 0:
-                    self.logger.info(f"KDC认证成功: {full_principal}")
-                    
-                    # 清理票据缓存
-                    subprocess.run(['kdestroy'], env=env)
-                    
-                    return True
-                else:
-                    self.logger.warning(f"KDC认证失败: {full_principal}, {stderr.decode()}")
-            else:
-                self.logger.warning(f"KDC中未找到主体: {full_principal}")
-        
-        except Exception as e:
-            self.logger.warning(f"KDC认证过程出错，使用系统内置凭据: {str(e)}")
-        
-        # 如果KDC认证失败或出错，回退到内置的凭据验证
         # 不同领域的认证凭据
         realm_credentials = {
             'HADOOP.COM': {
@@ -386,6 +443,228 @@ class KerberosAuth:
             self.logger.warning(f"认证失败: {principal}@{realm}")
             return False
             
+    def _addprinc_env(self):
+        """addprinc的环境变量"""
+        env = self.env.copy()
+        env.update({
+            'KRB5_CONFIG': self.conf_file,
+            'KRB5_KDC_PROFILE': self.kdc_conf,
+            'KRB5_TRACE': '/dev/stdout'  # 启用详细调试输出
+        })
+        return {key: value for key, value in env.items() if value is not None}
+    
+    def _addprinc_command(self, full_principal, password):
+        """构建kadmin.local addprinc命令"""
+        return ['kadmin.local', '-q', f'addprinc -pw {quote_arg(password)} {quote_arg(full_principal)}']
+    
+    def _addprinc_outcome(self, full_principal, returncode, output, error):
+        """根据addprinc的输出判断是否创建成功，成功时使主体缓存失效
+        
+        Returns:
+            bool: 主体是否已创建或已存在
+        """
+        # 检查是否创建成功
+        if returncode == 0 and ("Principal" in output and "created" in output):
+            self.logger.info(f"成功创建主体: {full_principal}")
+            self.principal_cache.invalidate(full_principal)
+            return True
+        
+        # 详细记录错误信息
+        self.logger.error(f"创建主体失败: {full_principal}")
+        self.logger.error(f"命令输出: {output}")
+        self.logger.error(f"错误信息: {error}")
+        
+        # 检查常见错误
+        if "Permission denied" in error or "权限被拒绝" in error:
+            self.logger.error("执行kadmin.local需要root权限")
+        elif "Cannot fetch master key" in error:
+            self.logger.error("无法获取KDC主密钥，请检查KDC数据库权限")
+        elif "Database not initialized" in error:
+            self.logger.error("KDC数据库未初始化")
+        elif "already exists" in error.lower():
+            self.logger.info(f"主体已存在: {full_principal}")
+            self.principal_cache.invalidate(full_principal)
+            return True
+        
+        return False
+    
+    def _create_principals(self, items, realm='HADOOP.COM', progress=None):
+        """批量创建Kerberos主体
+        
+        所有addprinc命令通过同一个kadmin.local会话执行，不再为每个主体启动两次进程
+        
+        Args:
+            items (iterable): (主体名称, 密码) 序列
+            realm (str): 默认领域
+            progress (callable): 进度回调 progress(已完成数量, 总数量)
+        
+        Returns:
+            list: 每个主体的ProvisionResult，与输入顺序一致
+        """
+        env = self.env.copy()
+        if self.conf_file:
+            env['KRB5_CONFIG'] = self.conf_file
+        if self.kdc_conf:
+            env['KRB5_KDC_PROFILE'] = self.kdc_conf
+        provisioner = KadminProvisioner(env=env)
+        results = provisioner.provision(items, realm, progress)
+        
+        # 批量变更后用一次listprincs重新加载，而不是逐个getprinc
+        if any(result.status == 'created' for result in results):
+            self.principal_cache.invalidate()
+            self.warm_principal_cache()
+        return results
+    
+    def _refresh_principal(self, full_principal):
+        """主体变更后重新加载其元数据，使登录时能立即从缓存中找到"""
+        try:
+            self.principal_cache.get(full_principal)
+        except Exception as e:
+            self.logger.warning(f"刷新主体缓存失败: {str(e)}")
+
+class KerberosAuth(KerberosAuthBase):
+    """Kerberos认证管理类"""
+    
+    def authenticate(self, principal, password, realm='HADOOP.COM'):
+        """使用Kerberos认证用户
+        
+        Args:
+            principal (str): 主体名称
+            password (str): 密码
+            realm (str): 领域
+        
+        Returns:
+            bool: 认证是否成功
+        """
+        # 在开发模式下使用系统内置认证
+        if self.dev_mode:
+            return self.simulate_auth(principal, password, realm)
+            
+        # 从principal中提取领域信息
+        principal_name, realm, full_principal = self._parse_principal(principal, realm)
+        
+        # 使用真实的Kerberos认证
+        self.logger.info(f"尝试Kerberos认证: {full_principal}")
+        ccache = self.ccache_manager.ccname(full_principal)
+        
+        result = None
+        if self.login_backend != 'kinit' and gssapi is not None:
+            result = self._authenticate_gssapi(full_principal, password, ccache)
+        elif self.login_backend == 'gssapi':
+            self.logger.warning("未安装gssapi模块，使用kinit认证")
+        if result is None:
+            result = self._authenticate_kinit(full_principal, password)
+        
+        if result:
+            self._register_ccache(full_principal)
+        return result
+    
+    def verify_ticket(self, principal=None):
+        """验证当前票据是否有效
+        
+        直接读取FILE类型的凭据缓存；非FILE类型或无法解析时回退到klist
+        
+        Args:
+            principal (str): 完整主体名称，指定时检查该主体的隔离缓存
+        
+        Returns:
+            tuple: (是否有效, 主体名称, 到期时间)
+        """
+        env = self._ticket_env(principal)
+        result = self._verify_ticket_file(env)
+        if result is None:
+            return self._verify_ticket_klist(env)
+        return result
+    
+    def logout(self, principal=None):
+        """销毁Kerberos票据
+        
+        Args:
+            principal (str): 完整主体名称，指定时只销毁该主体的隔离缓存
+        """
+        try:
+            if principal:
+                return self._remove_ccache(principal)
+            
+            # 执行kdestroy命令销毁票据
+            subprocess.run(['kdestroy'], env=self.env, check=True)
+            self.logger.info("已销毁Kerberos票据")
+            return True
+        except Exception as e:
+            self.logger.error(f"销毁票据出错: {str(e)}")
+            return False
+    
+    def get_principal_info(self, principal):
+        """获取主体信息
+        
+        Args:
+            principal (str): 主体名称
+        
+        Returns:
+            dict: 主体信息
+        """
+        try:
+            return self.principal_cache.get(principal) or {}
+        
+        except Exception as e:
+            self.logger.error(f"获取主体信息出错: {str(e)}")
+            return {}
+    
+    def simulate_auth(self, principal, password, realm='HADOOP.COM'):
+        """Kerberos认证（开发环境）
+        
+        Args:
+            principal (str): 主体名称
+            password (str): 密码
+            realm (str): 领域
+        
+        Returns:
+            bool: 认证是否成功
+        """
+        self.logger.info(f"进行Kerberos认证: {principal}@{realm}")
+        
+        # 从principal@REALM格式中提取主体名称
+        principal, realm, full_principal = self._parse_principal(principal, realm)
+        
+        # 首先尝试使用KDC验证（如果KDC服务正在运行）
+        try:
+            # 只查主体缓存，登录路径不启动kadmin；缓存中没有该主体的信息时直接用kinit认证
+            known = self.principal_cache.exists(full_principal)
+            if known is not False:
+                self.logger.info(f"尝试KDC认证: {full_principal}")
+                
+                # 使用kinit尝试认证，密码通过标准输入传递
+                env = self._kinit_env(full_principal)
+                kinit_process = subprocess.Popen(
+                    ['kinit', full_principal],
+                    stdin=subprocess.PIPE,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                    env=env
+                )
+                
+                stdout, stderr = kinit_process.communicate(f"{password}\n".encode())
+                
+                # 判断认证是否成功
+                if kinit_process.returncode == 0:
+                    self.logger.info(f"KDC认证成功: {full_principal}")
+                    
+                    # 清理该主体的票据缓存，不影响其他用户
+                    subprocess.run(['kdestroy'], env=env)
+                    self.ccache_manager.remove(full_principal)
+                    
+                    return True
+                else:
+                    self.logger.warning(f"KDC认证失败: {full_principal}, {stderr.decode()}")
+            else:
+                self.logger.warning(f"KDC中未找到主体: {full_principal}")
+        
+        except Exception as e:
+            self.logger.warning(f"KDC认证过程出错，使用系统内置凭据: {str(e)}")
+        
+        # 如果KDC认证失败或出错，回退到内置的凭据验证
+        return self._builtin_auth(principal, password, realm)
+    
     def create_principal(self, principal, password, realm='HADOOP.COM'):
         """创建Kerberos主体
         
@@ -399,79 +678,312 @@ class KerberosAuth:
         """
         try:
             # 构建完整的主体名称
-            if '@' not in principal:
-                full_principal = f"{principal}@{realm}"
-            else:
-                full_principal = principal
+            _, _, full_principal = self._parse_principal(principal, realm)
 
-            # 首先检查主体是否已存在
-            check_cmd = ['kadmin.local', '-q', f'getprinc {full_principal}']
-            check_process = subprocess.Popen(
-                check_cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                env=self.env
-            )
-            check_out, check_err = check_process.communicate()
-            
-            # 如果主体已存在，返回成功
-            if "Principal:" in check_out.decode():
+            # 首先检查主体是否已存在（使用主体缓存）
+            if self.principal_cache.get(full_principal) is not None:
                 self.logger.info(f"主体已存在: {full_principal}")
                 return True
 
-            # 准备环境变量
-            env = self.env.copy()
-            env.update({
-                'KRB5_CONFIG': self.conf_file,
-                'KRB5_KDC_PROFILE': self.kdc_conf,
-                'KRB5_TRACE': '/dev/stdout'  # 启用详细调试输出
-            })
-
-            # 构建kadmin.local命令
-            cmd = [
-                'kadmin.local',
-                '-q', f'addprinc -pw {password} {full_principal}'
-            ]
-            
             # 执行命令
             process = subprocess.Popen(
-                cmd,
+                self._addprinc_command(full_principal, password),
                 stdout=subprocess.PIPE,
                 stderr=subprocess.PIPE,
-                env=env
+                env=self._addprinc_env()
             )
             
             # 获取输出
             stdout, stderr = process.communicate()
-            output = stdout.decode()
-            error = stderr.decode()
             
-            # 检查是否创建成功
-            if process.returncode == 0 and ("Principal" in output and "created" in output):
-                self.logger.info(f"成功创建主体: {full_principal}")
-                return True
-            else:
-                # 详细记录错误信息
-                self.logger.error(f"创建主体失败: {full_principal}")
-                self.logger.error(f"命令输出: {output}")
-                self.logger.error(f"错误信息: {error}")
+            created = self._addprinc_outcome(full_principal, process.returncode,
+                                             stdout.decode(), stderr.decode())
+            if created:
+                self._refresh_principal(full_principal)
+            return created
                 
-                # 检查常见错误
-                if "Permission denied" in error or "权限被拒绝" in error:
-                    self.logger.error("执行kadmin.local需要root权限")
-                elif "Cannot fetch master key" in error:
-                    self.logger.error("无法获取KDC主密钥，请检查KDC数据库权限")
-                elif "Database not initialized" in error:
-                    self.logger.error("KDC数据库未初始化")
-                elif "Already exists" in error:
-                    self.logger.info(f"主体已存在: {full_principal}")
-                    return True
+        except Exception as e:
+            self.logger.error(f"创建主体时出错: {str(e)}")
+            return False
+
+    def create_principals(self, items, realm='HADOOP.COM', progress=None):
+        """批量创建Kerberos主体
+        
+        所有addprinc命令通过同一个kadmin.local会话执行，不再为每个主体启动两次进程
+        
+        Args:
+            items (iterable): (主体名称, 密码) 序列
+            realm (str): 默认领域
+            progress (callable): 进度回调 progress(已完成数量, 总数量)
+        
+        Returns:
+            list: 每个主体的ProvisionResult，与输入顺序一致
+        """
+        return self._create_principals(items, realm, progress)
+
+class AsyncKerberosAuth(KerberosAuthBase):
+    """Kerberos认证管理类（asyncio版本）
+    
+    与KerberosAuth的操作和返回值相同，kinit、klist、kdestroy和kadmin.local通过
+    asyncio.create_subprocess_exec执行，不阻塞事件循环。每次调用有超时，
+    并发执行的子进程数量由信号量限制。不是KerberosAuth的子类，公开方法都是协程，
+    不能传给需要同步接口的调用方。
+    """
+    
+    def __init__(self, timeout=None, concurrency=None):
+        """初始化Kerberos环境
+        
+        Args:
+            timeout (float): 单个子进程的超时时间（秒）
+            concurrency (int): 同时执行的子进程数量上限
+        """
+        super().__init__()
+        self.timeout = timeout if timeout is not None else float(os.getenv('KERBEROS_ASYNC_TIMEOUT', 30))
+        self.concurrency = concurrency or int(os.getenv('KERBEROS_ASYNC_CONCURRENCY', 32))
+        self._semaphore = None
+        self._semaphore_loop = None
+    
+    @property
+    def semaphore(self):
+        """子进程并发信号量，每个事件循环一个（Python 3.8/3.9的信号量绑定创建时的事件循环）"""
+        loop = asyncio.get_running_loop()
+        if self._semaphore_loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+            self._semaphore_loop = loop
+        return self._semaphore
+    
+    async def _in_thread(self, func, *args):
+        """在默认线程池中执行同步函数（asyncio.to_thread需要Python 3.9）"""
+        return await asyncio.get_running_loop().run_in_executor(None, functools.partial(func, *args))
+    
+    async def _run(self, args, env, input=None):
+        """执行子进程
+        
+        Args:
+            args (list): 命令及参数
+            env (dict): 环境变量
+            input (bytes): 标准输入内容
+        
+        Returns:
+            tuple: (退出码, 标准输出, 标准错误)
+        
+        Raises:
+            asyncio.TimeoutError: 超时，子进程已被终止
+        """
+        async with self.semaphore:
+            process = await asyncio.create_subprocess_exec(
+                *args,
+                stdin=asyncio.subprocess.PIPE if input is not None else asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+                env=env
+            )
+            try:
+                stdout, stderr = await asyncio.wait_for(process.communicate(input), self.timeout)
+            except asyncio.TimeoutError:
+                process.kill()
+                await process.wait()
+                raise
+            return process.returncode, stdout, stderr
+    
+    async def authenticate(self, principal, password, realm='HADOOP.COM'):
+        """使用Kerberos认证用户
+        
+        Args:
+            principal (str): 主体名称
+            password (str): 密码
+            realm (str): 领域
+        
+        Returns:
+            bool: 认证是否成功
+        """
+        # 在开发模式下使用系统内置认证
+        if self.dev_mode:
+            return await self.simulate_auth(principal, password, realm)
+        
+        principal_name, realm, full_principal = self._parse_principal(principal, realm)
+        
+        self.logger.info(f"尝试Kerberos认证: {full_principal}")
+        ccache = self.ccache_manager.ccname(full_principal)
+        
+        result = None
+        if self.login_backend != 'kinit' and gssapi is not None:
+            # GSSAPI在进程内执行，放到线程中避免阻塞事件循环
+            result = await self._in_thread(self._authenticate_gssapi, full_principal, password, ccache)
+        elif self.login_backend == 'gssapi':
+            self.logger.warning("未安装gssapi模块，使用kinit认证")
+        if result is None:
+            result = await self._kinit_async(full_principal, password)
+        
+        if result:
+            self._register_ccache(full_principal)
+        return result
+    
+    async def _kinit_async(self, full_principal, password):
+        """通过kinit子进程获取初始凭据"""
+        try:
+            env = self._kinit_env(full_principal)
+            returncode, stdout, stderr = await self._run(
+                ['kinit', full_principal], env, f"{password}\n".encode())
+            return self._kinit_outcome(full_principal, returncode, stderr)
+        except Exception as e:
+            self.logger.error(f"认证过程出错: {str(e) or type(e).__name__}")
+            return False
+    
+    async def verify_ticket(self, principal=None):
+        """验证当前票据是否有效
+        
+        Args:
+            principal (str): 完整主体名称，指定时检查该主体的隔离缓存
+        
+        Returns:
+            tuple: (是否有效, 主体名称, 到期时间)
+        """
+        env = self._ticket_env(principal)
+        result = self._verify_ticket_file(env)
+        if result is None:
+            return await self._klist_async(env)
+        return result
+    
+    async def _klist_async(self, env):
+        """通过klist输出验证当前票据"""
+        try:
+            returncode, stdout, stderr = await self._run(['klist'], env)
+            return self._parse_klist_output(stdout.decode())
+        except Exception as e:
+            self.logger.error(f"验证票据出错: {str(e) or type(e).__name__}")
+            return (False, None, None)
+    
+    async def logout(self, principal=None):
+        """销毁Kerberos票据
+        
+        Args:
+            principal (str): 完整主体名称，指定时只销毁该主体的隔离缓存
+        """
+        try:
+            if principal:
+                return self._remove_ccache(principal)
+            
+            returncode, stdout, stderr = await self._run(['kdestroy'], self.env)
+            if returncode != 0:
+                raise subprocess.CalledProcessError(returncode, 'kdestroy')
+            self.logger.info("已销毁Kerberos票据")
+            return True
+        except Exception as e:
+            self.logger.error(f"销毁票据出错: {str(e) or type(e).__name__}")
+            return False
+    
+    async def _principal_info_async(self, principal):
+        """通过主体缓存获取主体元数据，未命中时异步执行getprinc"""
+        hit, info = self.principal_cache.peek(principal)
+        if hit:
+            return info
+        env = self.env.copy()
+        if self.conf_file:
+            env['KRB5_CONFIG'] = self.conf_file
+        returncode, stdout, stderr = await self._run(['kadmin.local', '-q', f'getprinc {principal}'], env)
+        info = parse_getprinc(stdout.decode())
+        self.principal_cache.put(principal, info)
+        return info
+    
+    async def get_principal_info(self, principal):
+        """获取主体信息
+        
+        Args:
+            principal (str): 主体名称
+        
+        Returns:
+            dict: 主体信息
+        """
+        try:
+            return await self._principal_info_async(principal) or {}
+        except Exception as e:
+            self.logger.error(f"获取主体信息出错: {str(e) or type(e).__name__}")
+            return {}
+    
+    async def simulate_auth(self, principal, password, realm='HADOOP.COM'):
+        """Kerberos认证（开发环境）
+        
+        Args:
+            principal (str): 主体名称
+            password (str): 密码
+            realm (str): 领域
+        
+        Returns:
+            bool: 认证是否成功
+        """
+        self.logger.info(f"进行Kerberos认证: {principal}@{realm}")
+        principal, realm, full_principal = self._parse_principal(principal, realm)
+        
+        try:
+            # 只查主体缓存（预热列表过期时在后台重新预热），登录路径不启动kadmin
+            known = self.principal_cache.exists(full_principal)
+            if known is not False:
+                self.logger.info(f"尝试KDC认证: {full_principal}")
                 
-                return False
+                env = self._kinit_env(full_principal)
+                returncode, stdout, stderr = await self._run(
+                    ['kinit', full_principal], env, f"{password}\n".encode())
                 
+                if returncode == 0:
+                    self.logger.info(f"KDC认证成功: {full_principal}")
+                    
+                    # 清理该主体的票据缓存，不影响其他用户
+                    await self._run(['kdestroy'], env)
+                    self.ccache_manager.remove(full_principal)
+                    
+                    return True
+                else:
+                    self.logger.warning(f"KDC认证失败: {full_principal}, {stderr.decode()}")
+            else:
+                self.logger.warning(f"KDC中未找到主体: {full_principal}")
+        
         except Exception as e:
-            self.logger.error(f"创建主体时出错: {str(e)}")
+            self.logger.warning(f"KDC认证过程出错，使用系统内置凭据: {str(e) or type(e).__name__}")
+        
+        return self._builtin_auth(principal, password, realm)
+    
+    async def create_principal(self, principal, password, realm='HADOOP.COM'):
+        """创建Kerberos主体
+        
+        Args:
+            principal (str): 主体名称
+            password (str): 密码
+            realm (str): 领域
+        
+        Returns:
+            bool: 是否创建成功
+        """
+        try:
+            _, _, full_principal = self._parse_principal(principal, realm)
+            
+            if await self._principal_info_async(full_principal) is not None:
+                self.logger.info(f"主体已存在: {full_principal}")
+                return True
+            
+            returncode, stdout, stderr = await self._run(
+                self._addprinc_command(full_principal, password), self._addprinc_env())
+            created = self._addprinc_outcome(full_principal, returncode, stdout.decode(), stderr.decode())
+            if created:
+                try:
+                    await self._principal_info_async(full_principal)
+                except Exception as e:
+                    self.logger.warning(f"刷新主体缓存失败: {str(e) or type(e).__name__}")
+            return created
+        
+        except Exception as e:
+            self.logger.error(f"创建主体时出错: {str(e) or type(e).__name__}")
             return False
+    
+    async def create_principals(self, items, realm='HADOOP.COM', progress=None):
+        """批量创建Kerberos主体
+        
+        批量任务本身只启动少量kadmin.local会话，在线程中执行
+        
+        Returns:
+            list: 每个主体的ProvisionResult，与输入顺序一致
+        """
+        return await self._in_thread(self._create_principals, list(items), realm, progress)
 
 # 创建一个模拟的krb5.conf配置文件
 def create_sample_krb5_conf(conf_path='/etc/krb5/krb5.conf'):
@@ -2,7 +2,8 @@ from extensions import db
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
-import pyotp
+from totp.engine import totp_engine
+from totp.provisioning import provisioning_uri
 
 # 用户-角色关联表
 user_roles = db.Table('user_roles',
@@ -71,17 +72,13 @@ class User(UserMixin, db.Model):
     
     def get_totp_uri(self):
         """获取TOTP URI，用于生成二维码"""
-        return pyotp.totp.TOTP(self.totp_secret).provisioning_uri(
-            name=self.username,
-            issuer_name="Hadoop集群管理系统"
-        )
+        return provisioning_uri(self.totp_secret, self.username)
         
     def verify_totp(self, token):
         """验证TOTP令牌"""
         if not self.totp_secret:
             return False
-        totp = pyotp.TOTP(self.totp_secret)
-        return totp.verify(token)
+        return totp_engine.verify(self.totp_secret, token)
     
     def __repr__(self):
         return f'<User {self.username}>' 
\ No newline at end of file
@@ -1,5 +1,7 @@
 from datetime import datetime
 import pyotp
+from totp.engine import totp_engine
+from totp.provisioning import provisioning_uri
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
 from extensions import db
@@ -31,13 +33,11 @@ class User(UserMixin, db.Model):
     
     def get_totp_uri(self):
         """获取TOTP二维码URI"""
-        totp = pyotp.TOTP(self.totp_secret)
-        return totp.provisioning_uri(self.username, issuer_name="Kerberos管理系统")
+        return provisioning_uri(self.totp_secret, self.username)
     
     def verify_totp(self, token):
         """验证TOTP令牌"""
-        totp = pyotp.TOTP(self.totp_secret)
-        return totp.verify(token)
+        return totp_engine.verify(self.totp_secret, token)
     
     @property
     def is_admin(self):
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""Kerberos登录后端基准测试脚本
+
+对比进程内GSSAPI登录与kinit子进程登录每秒可完成的登录次数，需要可访问的KDC。
+
+用法:
+    python scripts/benchmark_kerberos_login.py <主体> <密码> [次数]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from kerberos_auth import KerberosAuth, gssapi
+
+
+def benchmark_backend(auth, backend, principal, password, rounds):
+    """使用指定后端执行多次登录
+
+    Returns:
+        tuple: (成功次数, 每秒登录次数)
+    """
+    auth.login_backend = backend
+    success = 0
+    start = time.perf_counter()
+    for _ in range(rounds):
+        if auth.authenticate(principal, password):
+            success += 1
+    elapsed = time.perf_counter() - start
+    return success, rounds / elapsed
+
+
+def main():
+    if len(sys.argv) < 3:
+        print(__doc__)
+        return 1
+
+    principal, password = sys.argv[1], sys.argv[2]
+    rounds = int(sys.argv[3]) if len(sys.argv) > 3 else 50
+
+    auth = KerberosAuth()
+    auth.dev_mode = False
+
+    backends = ['kinit']
+    if gssapi is not None:
+        backends.insert(0, 'gssapi')
+    else:
+        print("未安装gssapi模块，只测试kinit")
+
+    for backend in backends:
+        success, rate = benchmark_backend(auth, backend, principal, password, rounds)
+        print(f"{backend:8s} 成功 {success}/{rounds}, {rate:.1f} 次登录/秒")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
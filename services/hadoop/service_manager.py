@@ -4,13 +4,18 @@ import subprocess
 import os
 from typing import Dict, Optional
 from services.hadoop.auth_service import HadoopAuthService
+from kerberos.renewal import TicketRenewalScheduler
 
 class HadoopServiceManager:
-    def __init__(self, config_path: Optional[str] = None):
+    def __init__(self, config_path: Optional[str] = None,
+                 renewal: Optional[TicketRenewalScheduler] = None):
         self.config_path = config_path
         self.auth_service = HadoopAuthService()
         self.logger = logging.getLogger(__name__)
         
+        # 服务主体票据由后台调度器续期，启动服务时不再执行kinit
+        self.renewal = renewal if renewal is not None else TicketRenewalScheduler()
+        
         # 服务配置
         self.services = {
             'namenode': {
@@ -42,6 +47,20 @@ class HadoopServiceManager:
                 'stop_cmd': 'yarn-daemon.sh stop nodemanager'
             }
         }
+    
+    def keytab_path(self, service_name: str) -> str:
+        """服务keytab文件路径"""
+        return os.path.join(self.config_path or '', 'keytabs', self.services[service_name]['keytab'])
+    
+    def start_renewal(self):
+        """登记所有服务主体并启动后台续期线程"""
+        for service_name, service_config in self.services.items():
+            self.renewal.register(service_config['principal'], self.keytab_path(service_name))
+        self.renewal.start()
+    
+    def stop_renewal(self):
+        """停止后台续期线程"""
+        self.renewal.stop()
         
     def start_service(self, service_name: str, principal: str) -> bool:
         """启动Hadoop服务"""
@@ -58,16 +77,18 @@ class HadoopServiceManager:
                 return False
             
             # 使用对应的keytab和主体启动服务
-            keytab_path = os.path.join(self.config_path, 'keytabs', service_config['keytab'])
             service_principal = service_config['principal']
+            self.renewal.register(service_principal, self.keytab_path(service_name))
+            self.renewal.start()
             
-            # 进行Kerberos认证
-            cmd = f"kinit -kt {keytab_path} {service_principal}"
-            subprocess.run(cmd, shell=True, check=True)
+            # 票据由续期调度器维护，只有尚未获取或已过期时才同步kinit
+            if not self.renewal.ensure(service_principal):
+                self.logger.error(f"无法获取服务主体票据: {service_principal}")
+                return False
             
-            # 启动服务
+            # 启动服务，使用该服务主体的凭据缓存
             cmd = service_config['start_cmd']
-            subprocess.run(cmd, shell=True, check=True)
+            subprocess.run(cmd, shell=True, check=True, env=self.renewal.env_for(service_principal))
             
             self.logger.info(f"服务 {service_name} 启动成功")
             return True
@@ -0,0 +1,126 @@
+"""app.py中TOTP相关路由测试"""
+
+import importlib
+import os
+import sys
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+import pyotp
+
+from tests.test_totp import ROOT
+
+# app.py导入时检查的环境变量
+APP_ENV = {
+    'HADOOP_HOME': '/tmp',
+    'JAVA_HOME': '/tmp',
+    'KRB5_CONFIG': '/tmp/krb5.conf',
+    'KRB5_KDC_PROFILE': '/tmp/kdc.conf',
+    'KDC_DB_PATH': '/tmp/principal',
+}
+
+
+def load_app():
+    """导入app.py（在临时目录中导入，避免在仓库中留下日志文件）"""
+    if 'app' in sys.modules and hasattr(sys.modules['app'], 'totp_qrcode'):
+        return sys.modules['app']
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as temp_dir, patch.dict(os.environ, APP_ENV):
+        os.chdir(temp_dir)
+        try:
+            if ROOT not in sys.path:
+                sys.path.insert(0, ROOT)
+            return importlib.import_module('app')
+        finally:
+            os.chdir(cwd)
+
+
+class TestTOTPQRCode(unittest.TestCase):
+    """TOTP配置二维码路由测试类"""
+
+    def setUp(self):
+        """测试前准备"""
+        self.module = load_app()
+        self.user = MagicMock(id=7, username='alice', totp_secret=pyotp.random_base32())
+        context = self.module.app.app_context()
+        context.push()
+        self.addCleanup(context.pop)
+        query = MagicMock()
+        query.get.return_value = self.user
+        patcher = patch.object(self.module.User, 'query', query)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = self.module.app.test_client()
+
+    def test_password_only_session_rejected(self):
+        """测试只通过密码验证的会话不能获取二维码"""
+        with self.client.session_transaction() as session:
+            session['user_id_for_totp'] = self.user.id
+        for fmt in ('png', 'svg'):
+            response = self.client.get(f'/totp/qrcode.{fmt}')
+            self.assertEqual(response.status_code, 403)
+            self.assertNotIn(self.user.totp_secret.encode(), response.data)
+
+    def test_logged_in_without_totp_rejected(self):
+        """测试已登录但未完成二次验证的会话不能获取二维码"""
+        with self.client.session_transaction() as session:
+            session['_user_id'] = str(self.user.id)
+        self.assertEqual(self.client.get('/totp/qrcode.png').status_code, 403)
+
+    def test_verified_user(self):
+        """测试完成二次验证的用户获取二维码"""
+        with self.client.session_transaction() as session:
+            session['_user_id'] = str(self.user.id)
+            session['totp_verified'] = True
+        response = self.client.get('/totp/qrcode.png')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'image/png')
+        self.assertEqual(response.headers['Cache-Control'], 'no-store')
+        self.assertEqual(self.client.get('/totp/qrcode.gif').status_code, 404)
+
+
+class TestGenerateTOTP(unittest.TestCase):
+    """/generate_totp缓存头测试类"""
+
+    def setUp(self):
+        """测试前准备"""
+        self.module = load_app()
+        self.user = MagicMock(id=7, username='alice', totp_secret=pyotp.random_base32())
+        context = self.module.app.app_context()
+        context.push()
+        self.addCleanup(context.pop)
+        self.query = MagicMock()
+        self.query.get.return_value = self.user
+        patcher = patch.object(self.module.User, 'query', self.query)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = self.module.app.test_client()
+        with self.client.session_transaction() as session:
+            session['user_id_for_totp'] = self.user.id
+
+    def test_cached_until_step_boundary(self):
+        """测试响应在时间步内可缓存，ETag匹配时返回304且不查询数据库"""
+        # 只替换app.py中的time模块，会话cookie的签名时间不受影响
+        now = 1700000020.0
+        with patch.object(self.module, 'time', MagicMock(time=lambda: now)):
+            response = self.client.get('/generate_totp')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json['code'], pyotp.TOTP(self.user.totp_secret).at(now))
+            self.assertEqual(response.headers['Cache-Control'], 'private, max-age=20')
+            self.assertIn('Cookie', response.headers['Vary'])
+            etag = response.headers['ETag']
+            self.assertNotIn(response.json['code'], etag)
+
+            cached = self.client.get('/generate_totp', headers={'If-None-Match': etag})
+            self.assertEqual(cached.status_code, 304)
+        self.assertEqual(self.query.get.call_count, 1)
+
+        with patch.object(self.module, 'time', MagicMock(time=lambda: now + 30)):
+            response = self.client.get('/generate_totp', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers['ETag'], etag)
+
+
+if __name__ == '__main__':
+    unittest.main()
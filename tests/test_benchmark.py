@@ -0,0 +1,217 @@
+"""AS -> TGS -> AP完整交换基准测试
+
+每个阶段在不同的票据大小（主体名称长度）和线程数下测量平均延迟和吞吐量，结果写入JSON文件。
+耗时与机器相关，默认不运行，设置BENCHMARK=1时才执行，并与提交在仓库中的基线
+tests/benchmark_baseline.json比较：任一阶段的平均延迟超过基线中该阶段允许倍数
+（tolerances）时测试失败。基线在参考机器上生成，微秒级的阶段抖动较大，允许倍数也更宽；
+换到明显更慢的机器时应先用BENCHMARK_UPDATE_BASELINE=1重新生成基线。
+
+环境变量:
+    BENCHMARK: 设置为1时运行基准测试
+    BENCHMARK_OUTPUT: 结果文件路径，默认系统临时目录下的kerberos_benchmark_results.json
+    BENCHMARK_BASELINE: 基线文件路径，默认tests/benchmark_baseline.json
+    BENCHMARK_TOLERANCE: 设置时覆盖基线中所有阶段的允许倍数
+    BENCHMARK_ROUNDS: 每个线程的交换次数，默认50
+    BENCHMARK_UPDATE_BASELINE: 设置为1时用本次结果覆盖基线中的results（保留tolerances）
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from datetime import datetime, timedelta
+
+from kerberos.crypto import KerberosCrypto
+from kerberos.principals import PrincipalStore
+from kerberos.servers import KerberosAS, KerberosTGS, KerberosService
+
+
+STAGES = ('as_issue', 'authenticator', 'tgs_grant', 'service_verify', 'ticket_verify')
+PRINCIPAL_SIZES = (16, 256, 1024)
+THREAD_COUNTS = (1, 4)
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmark_baseline.json')
+
+
+def _run_exchanges(crypto, as_server, tgs_server, service, username, rounds, timings):
+    for _ in range(rounds):
+        start = time.perf_counter()
+        success, tgt, tgs_key = as_server.authenticate(username, 'benchmark_password')
+        timings['as_issue'].append(time.perf_counter() - start)
+        assert success, tgt
+
+        start = time.perf_counter()
+        authenticator = crypto.create_authenticator(username, datetime.utcnow(), tgs_key)
+        timings['authenticator'].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        success, service_ticket, service_key = tgs_server.grant_service_ticket(
+            tgt, authenticator, service.service_id)
+        timings['tgs_grant'].append(time.perf_counter() - start)
+        assert success, service_ticket
+
+        authenticator = crypto.create_authenticator(username, datetime.utcnow(), service_key)
+        start = time.perf_counter()
+        success, error = service.verify_client(service_ticket, authenticator)
+        timings['service_verify'].append(time.perf_counter() - start)
+        assert success, error
+
+        # 用新签发的票据测量解密路径，service_ticket已在上一步验证并进入票据缓存
+        fresh_ticket = crypto.create_ticket(
+            username, service.service_id, crypto.create_session_key(),
+            datetime.utcnow(), timedelta(hours=10), crypto.service_crypto)
+        start = time.perf_counter()
+        valid, ticket_data = crypto.verify_ticket(fresh_ticket, crypto.service_crypto)
+        timings['ticket_verify'].append(time.perf_counter() - start)
+        assert valid, ticket_data
+
+
+def run_benchmark(sizes=PRINCIPAL_SIZES, thread_counts=THREAD_COUNTS, rounds=50):
+    """
+    运行基准测试
+
+    Args:
+        sizes: 主体名称长度列表，决定票据大小
+        thread_counts: 并发线程数列表
+        rounds: 每个线程的交换次数
+
+    Returns:
+        dict: {配置名: {阶段: {'mean_us', 'ops_per_sec'}, 'ticket_bytes'}}
+    """
+    results = {}
+    for size in sizes:
+        for thread_count in thread_counts:
+            crypto = KerberosCrypto()
+            principals = PrincipalStore()
+            usernames = [f"{i}".rjust(size, 'u') for i in range(thread_count)]
+            for username in usernames:
+                principals.add_principal(username, 'benchmark_password')
+            as_server = KerberosAS(crypto, principals)
+            tgs_server = KerberosTGS(crypto)
+            service = KerberosService('hdfs', crypto)
+
+            per_thread = [{stage: [] for stage in STAGES} for _ in usernames]
+            threads = [
+                threading.Thread(target=_run_exchanges, args=(
+                    crypto, as_server, tgs_server, service, username, rounds, timings))
+                for username, timings in zip(usernames, per_thread)
+            ]
+            start = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - start
+
+            sample_ticket = crypto.create_ticket(
+                usernames[0], 'hdfs', crypto.create_session_key(),
+                datetime.utcnow(), timedelta(hours=10), crypto.service_crypto)
+            result = {'ticket_bytes': len(sample_ticket), 'elapsed': elapsed}
+            for stage in STAGES:
+                samples = [value for timings in per_thread for value in timings[stage]]
+                if len(samples) != rounds * thread_count:
+                    raise RuntimeError(f"阶段{stage}未完成全部交换")
+                total = sum(samples)
+                result[stage] = {
+                    'mean_us': total / len(samples) * 1e6,
+                    # 按该阶段自身的耗时计算：各线程并行执行该阶段时每秒完成的次数
+                    'ops_per_sec': len(samples) * thread_count / total,
+                }
+            results[f"size={size},threads={thread_count}"] = result
+    return results
+
+
+def find_regressions(results, baseline, tolerances):
+    """
+    找出超过基线允许倍数的阶段
+
+    Args:
+        results: run_benchmark的结果
+        baseline: 基线结果，格式同results
+        tolerances: {阶段: 允许倍数}
+
+    Returns:
+        list: 退化描述列表
+    """
+    regressions = []
+    for config, stages in results.items():
+        base_stages = baseline.get(config)
+        if not base_stages:
+            continue
+        for stage in STAGES:
+            base = base_stages.get(stage, {}).get('mean_us')
+            mean = stages[stage]['mean_us']
+            tolerance = tolerances[stage]
+            if base and mean > base * tolerance:
+                regressions.append(
+                    f"{config} {stage}: {stages[stage]['mean_us']:.1f}us > "
+                    f"基线{base:.1f}us x {tolerance}"
+                )
+    return regressions
+
+
+class TestExchangeBenchmark(unittest.TestCase):
+    """完整交换基准测试类"""
+
+    @unittest.skipUnless(os.getenv('BENCHMARK') == '1', '设置BENCHMARK=1时运行基准测试')
+    def test_exchange_benchmark(self):
+        """测量各阶段耗时并与基线比较"""
+        rounds = int(os.getenv('BENCHMARK_ROUNDS', 50))
+        output = os.getenv('BENCHMARK_OUTPUT',
+                           os.path.join(tempfile.gettempdir(), 'kerberos_benchmark_results.json'))
+        baseline_path = os.getenv('BENCHMARK_BASELINE', DEFAULT_BASELINE)
+
+        results = run_benchmark(rounds=rounds)
+        with open(output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+        for config, stages in results.items():
+            print(f"\n[{config}] 票据: {stages['ticket_bytes']}B " + ', '.join(
+                f"{stage}: {stages[stage]['mean_us']:.1f}us" for stage in STAGES))
+
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+        if os.getenv('BENCHMARK_UPDATE_BASELINE') == '1':
+            baseline['results'] = results
+            with open(baseline_path, 'w') as f:
+                json.dump(baseline, f, indent=2)
+            return
+
+        tolerances = baseline['tolerances']
+        if os.getenv('BENCHMARK_TOLERANCE'):
+            tolerances = dict.fromkeys(STAGES, float(os.getenv('BENCHMARK_TOLERANCE')))
+        regressions = find_regressions(results, baseline['results'], tolerances)
+        self.assertEqual(regressions, [], '\n'.join(regressions))
+
+    def test_find_regressions(self):
+        """测试退化检测"""
+        baseline = {'size=16,threads=1': {stage: {'mean_us': 10.0} for stage in STAGES}}
+        results = {'size=16,threads=1': {stage: {'mean_us': 10.0} for stage in STAGES}}
+        tolerances = dict.fromkeys(STAGES, 2.0)
+        self.assertEqual(find_regressions(results, baseline, tolerances), [])
+
+        results['size=16,threads=1']['tgs_grant']['mean_us'] = 25.0
+        regressions = find_regressions(results, baseline, tolerances)
+        self.assertEqual(len(regressions), 1)
+        self.assertIn('tgs_grant', regressions[0])
+
+        tolerances['tgs_grant'] = 3.0
+        self.assertEqual(find_regressions(results, baseline, tolerances), [])
+
+    def test_stored_baseline(self):
+        """测试仓库中的基线覆盖所有配置和阶段，并为每个阶段给出允许倍数"""
+        with open(DEFAULT_BASELINE) as f:
+            baseline = json.load(f)
+        self.assertEqual(set(baseline['tolerances']), set(STAGES))
+        self.assertTrue(all(value >= 1.0 for value in baseline['tolerances'].values()))
+        configs = {f"size={size},threads={count}"
+                   for size in PRINCIPAL_SIZES for count in THREAD_COUNTS}
+        self.assertEqual(set(baseline['results']), configs)
+        for stages in baseline['results'].values():
+            for stage in STAGES:
+                self.assertGreater(stages[stage]['mean_us'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,261 @@
+"""凭据缓存读取测试"""
+
+import os
+import shutil
+import struct
+import tempfile
+import time
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+from kerberos.ccache import (
+    CCACHE_V3,
+    CCACHE_V4,
+    CCacheFormatError,
+    CCacheManager,
+    CredentialCacheReader,
+    ccache_path,
+    parse_ccache,
+)
+from kerberos_auth import KerberosAuth
+
+
+def _counted(data):
+    if isinstance(data, str):
+        data = data.encode()
+    return struct.pack('>I', len(data)) + data
+
+
+def _principal(name, realm):
+    components = name.split('/')
+    return struct.pack('>II', 1, len(components)) + _counted(realm) + b''.join(
+        _counted(component) for component in components)
+
+
+def build_ccache(version, principal, realm, credentials):
+    """按MIT FILE格式构造凭据缓存
+
+    Args:
+        credentials: [(服务主体, 服务领域, authtime, endtime)]
+    """
+    data = struct.pack('>H', version)
+    if version == CCACHE_V4:
+        # KDC时间偏移标签
+        tag = struct.pack('>HHii', 1, 8, 0, 0)
+        data += struct.pack('>H', len(tag)) + tag
+    data += _principal(principal, realm)
+    for server, server_realm, authtime, endtime in credentials:
+        data += _principal(principal, realm) + _principal(server, server_realm)
+        data += struct.pack('>H', 18)
+        if version == CCACHE_V3:
+            data += struct.pack('>H', 18)
+        data += _counted(os.urandom(32))
+        data += struct.pack('>IIII', authtime, authtime, endtime, endtime + 3600)
+        data += b'\x00' + struct.pack('>I', 0x40e10000)
+        data += struct.pack('>I', 1) + struct.pack('>H', 2) + _counted(b'\x7f\x00\x00\x01')
+        data += struct.pack('>I', 0)
+        data += _counted(os.urandom(200)) + _counted(b'')
+    return data
+
+
+class TestCCacheParser(unittest.TestCase):
+    """凭据缓存解析测试类"""
+
+    def test_parse_v3_and_v4(self):
+        """测试解析版本3和版本4"""
+        now = int(time.time())
+        for version in (CCACHE_V3, CCACHE_V4):
+            with self.subTest(version=version):
+                data = build_ccache(version, 'alice', 'HADOOP.COM', [
+                    ('X-CACHECONF:/krb5_ccache_conf_data/fast_avail/krbtgt', 'X-CACHECONF:', 0, 0),
+                    ('krbtgt/HADOOP.COM', 'HADOOP.COM', now, now + 36000),
+                    ('hdfs/node1', 'HADOOP.COM', now, now + 600),
+                ])
+                ccache = parse_ccache(data)
+
+                self.assertEqual(str(ccache.principal), 'alice@HADOOP.COM')
+                self.assertEqual(len(ccache.tickets()), 2)
+                self.assertEqual(ccache.tgt().endtime, now + 36000)
+                self.assertEqual(ccache.expiry(), now + 36000)
+
+    def test_service_ticket_only(self):
+        """测试只有服务票据时使用第一张票据的到期时间"""
+        data = build_ccache(CCACHE_V4, 'hdfs/node1', 'HADOOP.COM', [
+            ('HTTP/web', 'HADOOP.COM', 100, 200),
+        ])
+        ccache = parse_ccache(data)
+        self.assertEqual(str(ccache.principal), 'hdfs/node1@HADOOP.COM')
+        self.assertIsNone(ccache.tgt())
+        self.assertEqual(ccache.expiry(), 200)
+
+    def test_empty_cache(self):
+        """测试只有默认主体的缓存"""
+        ccache = parse_ccache(build_ccache(CCACHE_V4, 'alice', 'HADOOP.COM', []))
+        self.assertIsNone(ccache.expiry())
+
+    def test_invalid_data(self):
+        """测试无效或截断的缓存"""
+        with self.assertRaises(CCacheFormatError):
+            parse_ccache(b'\x05\x02' + b'\x00' * 10)
+        data = build_ccache(CCACHE_V4, 'alice', 'HADOOP.COM', [('krbtgt/HADOOP.COM', 'HADOOP.COM', 1, 2)])
+        with self.assertRaises(CCacheFormatError):
+            parse_ccache(data[:-5])
+
+    def test_ccache_path(self):
+        """测试KRB5CCNAME解析"""
+        self.assertEqual(ccache_path('FILE:/tmp/krb5cc_1'), '/tmp/krb5cc_1')
+        self.assertEqual(ccache_path('/tmp/krb5cc_1'), '/tmp/krb5cc_1')
+        with patch('os.path.exists', return_value=True):
+            self.assertEqual(ccache_path(None), f"/tmp/krb5cc_{os.getuid()}")
+        with patch('os.path.exists', return_value=False):
+            self.assertIsNone(ccache_path(None))
+        self.assertIsNone(ccache_path('KEYRING:persistent:1000'))
+        self.assertIsNone(ccache_path('KCM:'))
+
+
+class TestCredentialCacheReader(unittest.TestCase):
+    """凭据缓存读取器测试类"""
+
+    def setUp(self):
+        """测试前准备"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, 'krb5cc_test')
+        self.now = int(time.time())
+        self._write(self.now + 3600)
+
+    def tearDown(self):
+        """测试后清理"""
+        shutil.rmtree(self.temp_dir)
+
+    def _write(self, endtime):
+        with open(self.path, 'wb') as f:
+            f.write(build_ccache(CCACHE_V4, 'alice', 'HADOOP.COM', [
+                ('krbtgt/HADOOP.COM', 'HADOOP.COM', self.now, endtime),
+            ]))
+
+    def test_unchanged_file_not_reread(self):
+        """测试文件未变化时不重新读取"""
+        reader = CredentialCacheReader()
+        first = reader.read(self.path)
+        with patch('builtins.open') as mock_open:
+            self.assertIs(reader.read(self.path), first)
+        mock_open.assert_not_called()
+
+    def test_changed_file_reread(self):
+        """测试文件变化后重新读取"""
+        reader = CredentialCacheReader()
+        reader.read(self.path)
+        self._write(self.now + 7200)
+        os.utime(self.path, ns=(time.time_ns(), time.time_ns() + 1_000_000))
+        self.assertEqual(reader.read(self.path).expiry(), self.now + 7200)
+
+    def test_verify_ticket_without_klist(self):
+        """测试verify_ticket直接读取缓存文件，不启动klist"""
+        auth = KerberosAuth()
+        auth.env['KRB5CCNAME'] = f"FILE:{self.path}"
+        with patch('subprocess.Popen') as popen:
+            valid, principal, expiry = auth.verify_ticket()
+        popen.assert_not_called()
+        self.assertTrue(valid)
+        self.assertEqual(principal, 'alice@HADOOP.COM')
+        self.assertEqual(int(expiry.timestamp()), self.now + 3600)
+
+    def test_verify_expired_and_missing(self):
+        """测试过期票据和缓存不存在"""
+        self._write(self.now - 10)
+        auth = KerberosAuth()
+        auth.env['KRB5CCNAME'] = f"FILE:{self.path}"
+        self.assertFalse(auth.verify_ticket()[0])
+
+        os.remove(self.path)
+        self.assertEqual(auth.verify_ticket(), (False, None, None))
+
+    def test_non_file_cache_uses_klist(self):
+        """测试非FILE类型缓存回退到klist"""
+        auth = KerberosAuth()
+        auth.env['KRB5CCNAME'] = 'KEYRING:persistent:1000'
+        with patch.object(auth, '_verify_ticket_klist', return_value=(False, None, None)) as klist:
+            auth.verify_ticket()
+        klist.assert_called_once()
+
+    def test_default_cache_without_file_uses_klist(self):
+        """测试未设置KRB5CCNAME且默认文件不存在时回退到klist（默认缓存可能是KEYRING或KCM）"""
+        auth = KerberosAuth()
+        auth.env.pop('KRB5CCNAME', None)
+        expiry = datetime.now() + timedelta(hours=1)
+        with patch('kerberos.ccache.os.path.exists', return_value=False), \
+                patch.object(auth, '_verify_ticket_klist',
+                             return_value=(True, 'alice@HADOOP.COM', expiry)) as klist:
+            self.assertEqual(auth.verify_ticket(), (True, 'alice@HADOOP.COM', expiry))
+        klist.assert_called_once()
+
+        # 默认文件在检查后被删除时同样回退
+        with patch('kerberos.ccache.os.path.exists', return_value=True), \
+                patch.object(auth.ccache_reader, 'read', side_effect=FileNotFoundError), \
+                patch.object(auth, '_verify_ticket_klist', return_value=(False, None, None)) as klist:
+            auth.verify_ticket()
+        klist.assert_called_once()
+
+
+class TestCCacheManager(unittest.TestCase):
+    """隔离凭据缓存管理测试类"""
+
+    def setUp(self):
+        """测试前准备"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.manager = CCacheManager(self.temp_dir, ttl=3600, cleanup_interval=3600)
+
+    def tearDown(self):
+        """测试后清理"""
+        shutil.rmtree(self.temp_dir)
+
+    def _touch(self, owner):
+        path = self.manager.path_for(owner)
+        with open(path, 'wb') as f:
+            f.write(b'\x05\x04')
+        return path
+
+    def test_principals_isolated(self):
+        """测试不同主体使用不同的缓存"""
+        alice = self.manager.ccname('alice@HADOOP.COM')
+        bob = self.manager.ccname('bob@HADOOP.COM')
+        self.assertNotEqual(alice, bob)
+        self.assertTrue(alice.startswith(f"FILE:{self.temp_dir}/krb5cc_"))
+        self.assertEqual(self.manager.ccname('alice@HADOOP.COM'), alice)
+        # 清洗后相同的名称不会冲突
+        self.assertNotEqual(self.manager.path_for('a/b'), self.manager.path_for('a_b'))
+
+        env = self.manager.env_for({'KRB5_CONFIG': '/etc/krb5.conf'}, 'bob@HADOOP.COM')
+        self.assertEqual(env['KRB5CCNAME'], bob)
+        self.assertEqual(env['KRB5_CONFIG'], '/etc/krb5.conf')
+
+    def test_register_and_remove(self):
+        """测试登记和删除缓存"""
+        path = self._touch('alice@HADOOP.COM')
+        self.manager.register('alice@HADOOP.COM', time.time() + 600)
+        self.assertEqual(self.manager.lookup('alice@HADOOP.COM'), path)
+
+        self.assertTrue(self.manager.remove('alice@HADOOP.COM'))
+        self.assertFalse(os.path.exists(path))
+        self.assertIsNone(self.manager.lookup('alice@HADOOP.COM'))
+
+    def test_cleanup_expired(self):
+        """测试清理过期缓存"""
+        now = time.time()
+        expired = self._touch('alice@HADOOP.COM')
+        active = self._touch('bob@HADOOP.COM')
+        stale = self._touch('carol@HADOOP.COM')
+        self.manager.register('alice@HADOOP.COM', now + 10)
+        self.manager.register('bob@HADOOP.COM', now + 600)
+        os.utime(stale, (now - 7200, now - 7200))
+
+        self.assertEqual(self.manager.cleanup(now + 60), 2)
+        self.assertFalse(os.path.exists(expired))
+        self.assertFalse(os.path.exists(stale))
+        self.assertTrue(os.path.exists(active))
+        self.assertEqual(len(self.manager), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
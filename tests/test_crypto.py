@@ -0,0 +1,438 @@
+"""Kerberos加密组件测试"""
+
+import base64
+import json
+import threading
+import time
+import unittest
+from datetime import datetime, timedelta
+
+from cryptography.fernet import Fernet
+
+from kerberos.cache import CipherCache, TicketCache, ticket_digest
+from kerberos.codec import TicketFormatError, decode_ticket, encode_ticket
+from kerberos.crypto import KerberosCrypto
+from kerberos.keyring import KeyRing
+from kerberos.suites import SUITE_IDS, TicketCipher
+from kerberos.servers import KerberosAS, KerberosTGS, KerberosService
+
+
+def create_legacy_ticket(client_id, server_id, session_key, timestamp, lifetime, crypto):
+    """按旧版格式（JSON + Fernet + base64）创建票据"""
+    ticket_data = {
+        'client_id': client_id,
+        'server_id': server_id,
+        'session_key': session_key.decode(),
+        'timestamp': timestamp.isoformat(),
+        'lifetime': lifetime.total_seconds()
+    }
+    encrypted_data = crypto.encrypt(json.dumps(ticket_data).encode())
+    return base64.b64encode(encrypted_data).decode()
+
+
+class TestTicketCodec(unittest.TestCase):
+    """二进制票据格式测试类"""
+
+    def setUp(self):
+        """测试前准备"""
+        self.crypto = KerberosCrypto()
+        self.session_key = self.crypto.create_session_key()
+
+    def test_encode_decode_roundtrip(self):
+        """测试二进制编码往返"""
+        issued_at = time.time()
+        data = encode_ticket('用户1', 'hdfs', self.session_key, issued_at, 36000)
+        ticket_data = decode_ticket(data)
+
+        self.assertEqual(ticket_data['client_id'], '用户1')
+        self.assertEqual(ticket_data['server_id'], 'hdfs')
+        self.assertEqual(ticket_data['session_key'], self.session_key.decode())
+        self.assertAlmostEqual(ticket_data['timestamp'], issued_at, places=2)
+        self.assertAlmostEqual(ticket_data['expires_at'], issued_at + 36000, places=2)
+
+    def test_decode_rejects_truncated(self):
+        """测试截断的票据被拒绝"""
+        data = encode_ticket('test_user', 'hdfs', self.session_key, time.time(), 60)
+        with self.assertRaises(TicketFormatError):
+            decode_ticket(data[:-1])
+        with self.assertRaises(TicketFormatError):
+            decode_ticket(b'\x00' + data[1:])
+
+    def test_create_and_verify_ticket(self):
+        """测试票据创建与验证"""
+        ticket = self.crypto.create_ticket(
+            'test_user', 'hdfs', self.session_key,
+            datetime.utcnow(), timedelta(hours=10), self.crypto.service_crypto
+        )
+        valid, ticket_data = self.crypto.verify_ticket(ticket, self.crypto.service_crypto)
+
+        self.assertTrue(valid)
+        self.assertEqual(ticket_data['client_id'], 'test_user')
+        self.assertEqual(ticket_data['session_key'].encode(), self.session_key)
+
+    def test_expired_ticket(self):
+        """测试过期票据"""
+        ticket = self.crypto.create_ticket(
+            'test_user', 'hdfs', self.session_key,
+            datetime.utcnow() - timedelta(hours=2), timedelta(hours=1),
+            self.crypto.service_crypto
+        )
+        valid, ticket_data = self.crypto.verify_ticket(ticket, self.crypto.service_crypto)
+
+        self.assertFalse(valid)
+        self.assertIn('过期', ticket_data['error'])
+
+    def test_wrong_key_rejected(self):
+        """测试使用错误密钥验证票据"""
+        ticket = self.crypto.create_ticket(
+            'test_user', 'hdfs', self.session_key,
+            datetime.utcnow(), timedelta(hours=1), self.crypto.service_crypto
+        )
+        valid, _ = self.crypto.verify_ticket(ticket, self.crypto.tgs_crypto)
+        self.assertFalse(valid)
+
+    def test_non_canonical_ticket_rejected(self):
+        """测试改写编码的票据（附加字符、空白）被拒绝"""
+        for suite in ('fernet', 'aes-gcm'):
+            crypto = KerberosCrypto(cipher_suite=suite)
+            ticket = crypto.create_ticket(
+                'test_user', 'hdfs', self.session_key,
+                datetime.utcnow(), timedelta(hours=1), crypto.service_crypto
+            )
+            for altered in (ticket + '!', '\n' + ticket, ticket + '=', ticket + '\n'):
+                valid, _ = crypto.verify_ticket(altered, crypto.service_crypto)
+                self.assertFalse(valid, repr(altered))
+            legacy = create_legacy_ticket(
+                'test_user', 'hdfs', self.session_key,
+                datetime.utcnow(), timedelta(hours=1), crypto.service_crypto
+            )
+            self.assertFalse(crypto.verify_ticket(legacy + '!', crypto.service_crypto)[0])
+
+    def test_legacy_ticket_still_verifies(self):
+        """测试旧版JSON票据在迁移期间仍可验证"""
+        ticket = create_legacy_ticket(
+            'test_user', 'hdfs', self.session_key,
+            datetime.utcnow(), timedelta(hours=1), self.crypto.service_crypto
+        )
+        valid, ticket_data = self.crypto.verify_ticket(ticket, self.crypto.service_crypto)
+
+        self.assertTrue(valid)
+        self.assertEqual(ticket_data['server_id'], 'hdfs')
+        self.assertEqual(ticket_data['session_key'].encode(), self.session_key)
+
+    def test_full_exchange(self):
+        """测试AS -> TGS -> 服务的完整交换"""
+        as_server = KerberosAS(self.crypto)
+        tgs_server = KerberosTGS(self.crypto)
+        service = KerberosService('hdfs', self.crypto)
+
+        success, tgt, tgs_key = as_server.authenticate('test_user', 'test_password')
+        self.assertTrue(success)
+
+        authenticator = self.crypto.create_authenticator('test_user', datetime.utcnow(), tgs_key)
+        success, service_ticket, service_key = tgs_server.grant_service_ticket(
+            tgt, authenticator, 'hdfs')
+        self.assertTrue(success)
+
+        authenticator = self.crypto.create_authenticator('test_user', datetime.utcnow(), service_key)
+        success, error = service.verify_client(service_ticket, authenticator)
+        self.assertTrue(success, error)
+
+    def test_codec_benchmark(self):
+        """对比新旧票据格式的大小与编解码耗时"""
+        rounds = 2000
+        crypto = self.crypto.service_crypto
+        now = datetime.utcnow()
+        lifetime = timedelta(hours=10)
+
+        def measure(create):
+            start = time.perf_counter()
+            tickets = [create() for _ in range(rounds)]
+            issue = time.perf_counter() - start
+            start = time.perf_counter()
+            for ticket in tickets:
+                self.crypto.verify_ticket(ticket, crypto)
+            verify = time.perf_counter() - start
+            return len(tickets[0]), issue, verify
+
+        legacy = measure(lambda: create_legacy_ticket(
+            'test_user', 'hdfs', self.session_key, now, lifetime, crypto))
+        binary = measure(lambda: self.crypto.create_ticket(
+            'test_user', 'hdfs', self.session_key, now, lifetime, crypto))
+
+        for name, (size, issue, verify) in (('json', legacy), ('binary', binary)):
+            print(f"\n[票据格式 {name}] 大小: {size}B, "
+                  f"签发: {issue / rounds * 1e6:.1f}us, 验证: {verify / rounds * 1e6:.1f}us")
+
+        self.assertLess(binary[0], legacy[0] * 0.6)
+
+
+class TestTicketCache(unittest.TestCase):
+    """已验证票据缓存测试类"""
+
+    def setUp(self):
+        """测试前准备"""
+        self.crypto = KerberosCrypto()
+        self.session_key = self.crypto.create_session_key()
+
+    def _ticket(self, client_id='test_user', lifetime=timedelta(hours=1)):
+        return self.crypto.create_ticket(
+            client_id, 'hdfs', self.session_key,
+            datetime.utcnow(), lifetime, self.crypto.service_crypto
+        )
+
+    def test_repeat_verify_hits_cache(self):
+        """测试重复验证命中缓存"""
+        ticket = self._ticket()
+        for _ in range(3):
+            valid, ticket_data = self.crypto.verify_ticket(ticket, self.crypto.service_crypto)
+            self.assertTrue(valid)
+            self.assertEqual(ticket_data['client_id'], 'test_user')
+
+        stats = self.crypto.ticket_cache.stats()
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['hits'], 2)
+
+    def test_cached_entry_is_copy(self):
+        """测试缓存返回的数据不受调用方修改影响"""
+        ticket = self._ticket()
+        _, ticket_data = self.crypto.verify_ticket(ticket, self.crypto.service_crypto)
+        ticket_data['client_id'] = 'attacker'
+        _, ticket_data = self.crypto.verify_ticket(ticket, self.crypto.service_crypto)
+        self.assertEqual(ticket_data['client_id'], 'test_user')
+
+    def test_other_key_does_not_hit(self):
+        """测试使用其他密钥验证时不会命中缓存"""
+        ticket = self._ticket()
+        self.assertTrue(self.crypto.verify_ticket(ticket, self.crypto.service_crypto)[0])
+        self.assertFalse(self.crypto.verify_ticket(ticket, self.crypto.tgs_crypto)[0])
+
+    def test_entry_expires_with_ticket(self):
+        """测试缓存条目随票据过期"""
+        cache = TicketCache(max_entries=10, max_bytes=1 << 20)
+        owner = object()
+        cache.put(b'k', owner, {'client_id': 'u', 'expires_at': time.time() + 0.05})
+        self.assertIsNotNone(cache.get(b'k', owner))
+        time.sleep(0.06)
+        self.assertIsNone(cache.get(b'k', owner))
+        self.assertEqual(len(cache), 0)
+
+    def test_lru_eviction(self):
+        """测试按最近使用淘汰"""
+        cache = TicketCache(max_entries=2, max_bytes=1 << 20)
+        owner = object()
+        expires_at = time.time() + 60
+        cache.put(b'a', owner, {'expires_at': expires_at})
+        cache.put(b'b', owner, {'expires_at': expires_at})
+        cache.get(b'a', owner)
+        cache.put(b'c', owner, {'expires_at': expires_at})
+
+        self.assertIsNotNone(cache.get(b'a', owner))
+        self.assertIsNone(cache.get(b'b', owner))
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+    def test_memory_cap(self):
+        """测试内存上限"""
+        cache = TicketCache(max_entries=100000, max_bytes=64 * 1024)
+        owner = object()
+        expires_at = time.time() + 60
+        for i in range(1000):
+            cache.put(ticket_digest(str(i)), owner,
+                      {'client_id': 'x' * 100, 'expires_at': expires_at})
+
+        self.assertLessEqual(cache.stats()['bytes'], 64 * 1024)
+        self.assertLess(len(cache), 1000)
+
+    def test_concurrent_access(self):
+        """测试多线程并发验证"""
+        tickets = [self._ticket(f'user{i}') for i in range(20)]
+        errors = []
+
+        def worker():
+            for ticket in tickets * 10:
+                valid, _ = self.crypto.verify_ticket(ticket, self.crypto.service_crypto)
+                if not valid:
+                    errors.append(ticket)
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        stats = self.crypto.ticket_cache.stats()
+        self.assertEqual(stats['hits'] + stats['misses'], 8 * 200)
+        self.assertEqual(stats['entries'], 20)
+
+    def test_reset_after_fork(self):
+        """测试fork后子进程缓存被清空"""
+        cache = TicketCache(max_entries=10, max_bytes=1 << 20)
+        cache.put(b'k', None, {'expires_at': time.time() + 60})
+        cache._reset_after_fork()
+        self.assertEqual(cache.stats(), {
+            'entries': 0, 'bytes': 0, 'hits': 0, 'misses': 0, 'evictions': 0
+        })
+
+
+class TestCipherCache(unittest.TestCase):
+    """会话密钥加密对象缓存测试类"""
+
+    def setUp(self):
+        """测试前准备"""
+        self.crypto = KerberosCrypto()
+        self.session_key = self.crypto.create_session_key()
+
+    def test_cipher_reused(self):
+        """测试同一会话密钥复用加密对象"""
+        cache = CipherCache(Fernet, max_entries=10, idle_seconds=60)
+        self.assertIs(cache.get(self.session_key), cache.get(self.session_key))
+        self.assertEqual(cache.stats()['hits'], 1)
+        self.assertEqual(cache.stats()['misses'], 1)
+
+    def test_bounded_size(self):
+        """测试缓存大小上限"""
+        cache = CipherCache(Fernet, max_entries=3, idle_seconds=60)
+        keys = [Fernet.generate_key() for _ in range(5)]
+        for key in keys:
+            cache.get(key)
+        self.assertEqual(len(cache), 3)
+
+    def test_idle_eviction(self):
+        """测试空闲条目被清理"""
+        cache = CipherCache(Fernet, max_entries=10, idle_seconds=0.05)
+        cache.get(self.session_key)
+        time.sleep(0.06)
+        cache.get(Fernet.generate_key())
+        self.assertEqual(len(cache), 1)
+
+    def test_invalid_key_not_cached(self):
+        """测试无效密钥不会进入缓存"""
+        cache = CipherCache(Fernet, max_entries=10, idle_seconds=60)
+        with self.assertRaises(ValueError):
+            cache.get(b'invalid')
+        self.assertEqual(len(cache), 0)
+
+    def test_authenticator_roundtrip(self):
+        """测试认证器创建与验证使用缓存"""
+        authenticator = self.crypto.create_authenticator(
+            'test_user', datetime.utcnow(), self.session_key)
+        valid, auth_data = self.crypto.verify_authenticator(authenticator, self.session_key)
+
+        self.assertTrue(valid)
+        self.assertEqual(auth_data['client_id'], 'test_user')
+        self.assertEqual(self.crypto.cipher_cache.stats()['hits'], 1)
+
+    def test_authenticator_benchmark(self):
+        """对比缓存前后的认证器吞吐量"""
+        rounds = 2000
+        now = datetime.utcnow()
+
+        def measure():
+            start = time.perf_counter()
+            for _ in range(rounds):
+                authenticator = self.crypto.create_authenticator('test_user', now, self.session_key)
+                self.crypto.verify_authenticator(authenticator, self.session_key)
+            return rounds / (time.perf_counter() - start)
+
+        cached = measure()
+        self.crypto.cipher_cache.max_entries = 0
+        self.crypto.cipher_cache.clear()
+        uncached = measure()
+
+        print(f"\n[认证器吞吐] 无缓存: {uncached:.0f}/s, 有缓存: {cached:.0f}/s")
+        self.assertEqual(len(self.crypto.cipher_cache), 0)
+
+
+class TestCipherSuites(unittest.TestCase):
+    """可插拔加密套件测试类"""
+
+    def setUp(self):
+        """测试前准备"""
+        self.keyring = KeyRing()
+        self.session_key = Fernet.generate_key()
+
+    def _ticket(self, crypto):
+        return crypto.create_ticket(
+            'test_user', 'hdfs', self.session_key,
+            datetime.utcnow(), timedelta(hours=10), crypto.service_crypto
+        )
+
+    def test_each_suite_roundtrip(self):
+        """测试每种套件的票据签发与验证"""
+        for suite in SUITE_IDS:
+            with self.subTest(suite=suite):
+                crypto = KerberosCrypto(self.keyring, cipher_suite=suite)
+                ticket = self._ticket(crypto)
+                valid, ticket_data = crypto.verify_ticket(ticket, crypto.service_crypto)
+                self.assertTrue(valid, ticket_data)
+                self.assertEqual(ticket_data['client_id'], 'test_user')
+
+                authenticator = crypto.create_authenticator('test_user', datetime.utcnow(), self.session_key)
+                self.assertTrue(crypto.verify_authenticator(authenticator, self.session_key)[0])
+
+    def test_mixed_suites_verify(self):
+        """测试不同套件签发的票据可以互相验证"""
+        issuers = {suite: KerberosCrypto(self.keyring, cipher_suite=suite) for suite in SUITE_IDS}
+        verifier = KerberosCrypto(self.keyring, cipher_suite='fernet')
+        for suite, issuer in issuers.items():
+            with self.subTest(suite=suite):
+                ticket = self._ticket(issuer)
+                valid, ticket_data = verifier.verify_ticket(ticket, verifier.service_crypto)
+                self.assertTrue(valid, ticket_data)
+
+    def test_suite_recorded_in_header(self):
+        """测试套件标识记录在密文头部"""
+        for suite, suite_id in SUITE_IDS.items():
+            token = TicketCipher([self.session_key], suite).encrypt(b'data')
+            self.assertEqual(base64.urlsafe_b64decode(token)[0], suite_id)
+
+    def test_tampered_ticket_rejected(self):
+        """测试篡改的AEAD票据被拒绝"""
+        for suite in ('aes-gcm', 'chacha20-poly1305'):
+            with self.subTest(suite=suite):
+                cipher = TicketCipher([self.session_key], suite)
+                raw = bytearray(base64.urlsafe_b64decode(cipher.encrypt(b'data')))
+                raw[-1] ^= 1
+                with self.assertRaises(Exception):
+                    cipher.decrypt(base64.urlsafe_b64encode(bytes(raw)))
+
+                # 修改头部的套件标识同样无法通过认证
+                raw = bytearray(base64.urlsafe_b64decode(cipher.encrypt(b'data')))
+                raw[0] = SUITE_IDS['aes-gcm'] if raw[0] != SUITE_IDS['aes-gcm'] else SUITE_IDS['chacha20-poly1305']
+                with self.assertRaises(Exception):
+                    cipher.decrypt(base64.urlsafe_b64encode(bytes(raw)))
+
+    def test_rotated_keys_decrypt(self):
+        """测试轮换后旧密钥仍可解密AEAD票据"""
+        old_key, new_key = Fernet.generate_key(), Fernet.generate_key()
+        token = TicketCipher([old_key], 'aes-gcm').encrypt(b'data')
+        self.assertEqual(TicketCipher([new_key, old_key], 'aes-gcm').decrypt(token), b'data')
+
+    def test_unknown_suite(self):
+        """测试不支持的套件"""
+        with self.assertRaises(ValueError):
+            KerberosCrypto(self.keyring, cipher_suite='des')
+
+    def test_suite_benchmark(self):
+        """对比各套件的签发、验证吞吐量和票据大小"""
+        rounds = 2000
+        for suite in SUITE_IDS:
+            crypto = KerberosCrypto(self.keyring, cipher_suite=suite)
+            crypto.ticket_cache.max_entries = 0
+
+            start = time.perf_counter()
+            tickets = [self._ticket(crypto) for _ in range(rounds)]
+            issue = rounds / (time.perf_counter() - start)
+
+            start = time.perf_counter()
+            for ticket in tickets:
+                crypto.verify_ticket(ticket, crypto.service_crypto)
+            verify = rounds / (time.perf_counter() - start)
+
+            print(f"\n[套件 {suite}] 票据大小: {len(tickets[0])}B, "
+                  f"签发: {issue:.0f}/s, 验证: {verify:.0f}/s")
+
+
+if __name__ == '__main__':
+    unittest.main()
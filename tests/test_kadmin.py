@@ -0,0 +1,247 @@
+"""kadmin批量创建主体测试"""
+
+import os
+import shutil
+import stat
+import sys
+import tempfile
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+from kerberos.kadmin import (
+    KadminError,
+    KadminProvisioner,
+    PrincipalInfoCache,
+    parse_getprinc,
+    parse_listprincs,
+    parse_principal_records,
+    quote_arg,
+)
+
+GETPRINC_OUTPUT = '''Principal: alice@HADOOP.COM
+Expiration date: [never]
+Last password change: Mon Jan 01 00:00:00 UTC 2024
+Maximum ticket life: 1 day 00:00:00
+Number of keys: 2
+Key: vno 3, aes256-cts-hmac-sha1-96
+Key: vno 3, aes128-cts-hmac-sha1-96
+MKey: vno 1
+Attributes: REQUIRES_PRE_AUTH DISALLOW_SVR
+Policy: [none]
+'''
+
+# 模拟kadmin.local: 从标准输入读取addprinc命令，记录调用次数
+FAKE_KADMIN = r'''#!{python}
+import os, shlex, sys
+state = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'state')
+with open(os.path.join(state, 'calls'), 'a') as f:
+    f.write('x')
+for line in sys.stdin:
+    args = shlex.split(line.replace('""', '\\"'))
+    if not args or args[0] != 'addprinc':
+        continue
+    password, principal = args[2], args[3]
+    path = os.path.join(state, principal)
+    if principal.startswith('bad'):
+        print(f'add_principal: Malformed representation of principal while creating "{{principal}}".', file=sys.stderr)
+    elif os.path.exists(path):
+        print(f'add_principal: Principal or policy already exists while creating "{{principal}}".', file=sys.stderr)
+    else:
+        with open(path, 'w') as f:
+            f.write(password)
+        print(f'WARNING: no policy specified for {{principal}}; defaulting to no policy', file=sys.stderr)
+        print(f'Principal "{{principal}}" created.')
+'''
+
+
+class TestKadminProvisioner(unittest.TestCase):
+    """批量创建主体测试类"""
+
+    def setUp(self):
+        """测试前准备"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.state = os.path.join(self.temp_dir, 'state')
+        os.mkdir(self.state)
+        self.command = os.path.join(self.temp_dir, 'kadmin.local')
+        with open(self.command, 'w') as f:
+            f.write(FAKE_KADMIN.format(python=sys.executable))
+        os.chmod(self.command, os.stat(self.command).st_mode | stat.S_IEXEC)
+
+    def tearDown(self):
+        """测试后清理"""
+        shutil.rmtree(self.temp_dir)
+
+    def _calls(self):
+        with open(os.path.join(self.state, 'calls')) as f:
+            return len(f.read())
+
+    def test_single_session(self):
+        """测试所有主体在一个kadmin会话中创建"""
+        provisioner = KadminProvisioner(self.command, batch_size=1000)
+        items = [(f'user{i}', f'pw {i} "q"') for i in range(50)]
+        results = provisioner.provision(items, 'HADOOP.COM')
+
+        self.assertEqual(self._calls(), 1)
+        self.assertTrue(all(result.status == 'created' for result in results))
+        self.assertEqual(results[7].principal, 'user7@HADOOP.COM')
+        with open(os.path.join(self.state, 'user7@HADOOP.COM')) as f:
+            self.assertEqual(f.read(), 'pw 7 "q"')
+
+    def test_per_item_errors_and_progress(self):
+        """测试逐项错误和进度报告"""
+        provisioner = KadminProvisioner(self.command, batch_size=2, sessions=2)
+        provisioner.provision([('alice', 'pw')])
+        progress = []
+        results = provisioner.provision([
+            ('alice', 'pw'),
+            ('bob@TEST.COM', 'pw'),
+            ('bad/name', 'pw'),
+            ('bob@TEST.COM', 'pw'),
+            ('carol', ''),
+            ('dave', 'line\nbreak'),
+            ('erin', 'pw'),
+        ], progress=lambda done, total: progress.append((done, total)))
+
+        self.assertEqual([result.status for result in results],
+                         ['exists', 'created', 'error', 'error', 'error', 'error', 'created'])
+        self.assertIn('Malformed', results[2].error)
+        self.assertEqual(results[3].error, '重复的主体')
+        self.assertTrue(results[0].success)
+        self.assertFalse(results[4].success)
+        self.assertEqual(progress[-1], (7, 7))
+        self.assertEqual(len(progress), 2)
+
+    def test_missing_command(self):
+        """测试kadmin.local不存在"""
+        provisioner = KadminProvisioner(os.path.join(self.temp_dir, 'missing'))
+        results = provisioner.provision([('alice', 'pw')])
+        self.assertEqual(results[0].status, 'error')
+
+    def test_parse_records(self):
+        """测试解析CSV和JSONL"""
+        self.assertEqual(list(parse_principal_records('principal,password\nalice,a\n\nbob,"b,c"\n', 'csv')),
+                         [('alice', 'a'), ('bob', 'b,c')])
+        self.assertEqual(list(parse_principal_records('alice,a\nbob,b', 'csv')),
+                         [('alice', 'a'), ('bob', 'b')])
+        self.assertEqual(list(parse_principal_records(
+            '{"principal": "alice", "password": "a"}\n{"username": "bob", "password": "b"}\n', 'jsonl')),
+            [('alice', 'a'), ('bob', 'b')])
+        with self.assertRaises(ValueError):
+            list(parse_principal_records('{"principal": "alice"}', 'jsonl'))
+        with self.assertRaises(ValueError):
+            list(parse_principal_records('alice', 'csv'))
+
+    def test_quote_arg(self):
+        """测试参数转义"""
+        self.assertEqual(quote_arg('a "b"'), '"a ""b"""')
+        with self.assertRaises(ValueError):
+            quote_arg('a\nb')
+
+
+class TestPrincipalInfoCache(unittest.TestCase):
+    """主体元数据缓存测试类"""
+
+    def setUp(self):
+        """测试前准备"""
+        self.loader = MagicMock(side_effect=lambda principal: {'Principal': principal})
+        self.lister = MagicMock(return_value=['alice@HADOOP.COM', 'hdfs/node1@HADOOP.COM'])
+        self.cache = PrincipalInfoCache(self.loader, self.lister, ttl=60)
+
+    def test_parse_getprinc(self):
+        """测试解析getprinc输出"""
+        info = parse_getprinc(GETPRINC_OUTPUT)
+        self.assertEqual(info['Principal'], 'alice@HADOOP.COM')
+        self.assertEqual(info['kvno'], 3)
+        self.assertEqual(info['flags'], ['REQUIRES_PRE_AUTH', 'DISALLOW_SVR'])
+        self.assertIsNone(info['expiration'])
+        self.assertIsNone(parse_getprinc('get_principal: Principal does not exist while retrieving "x".'))
+        self.assertEqual(parse_listprincs('K/M@HADOOP.COM\nalice@HADOOP.COM\n\n'),
+                         ['K/M@HADOOP.COM', 'alice@HADOOP.COM'])
+
+    def test_cold_cache(self):
+        """测试未预热时exists不加载，get加载一次"""
+        self.assertIsNone(self.cache.exists('alice@HADOOP.COM'))
+        self.loader.assert_not_called()
+
+        self.assertEqual(self.cache.get('alice@HADOOP.COM'), {'Principal': 'alice@HADOOP.COM'})
+        self.cache.get('alice@HADOOP.COM')
+        self.assertEqual(self.loader.call_count, 1)
+        self.assertTrue(self.cache.exists('alice@HADOOP.COM'))
+
+    def test_warm(self):
+        """测试预热后不调用loader即可判断存在性"""
+        self.assertEqual(self.cache.warm(), 2)
+        self.assertTrue(self.cache.exists('alice@HADOOP.COM'))
+        self.assertFalse(self.cache.exists('bob@HADOOP.COM'))
+        self.assertIsNone(self.cache.get('bob@HADOOP.COM'))
+        self.loader.assert_not_called()
+
+    def test_invalidate(self):
+        """测试失效后重新加载"""
+        self.cache.warm()
+        self.cache.invalidate('bob@HADOOP.COM')
+        self.assertIsNone(self.cache.exists('bob@HADOOP.COM'))
+        self.assertIsNotNone(self.cache.get('bob@HADOOP.COM'))
+        self.assertTrue(self.cache.exists('bob@HADOOP.COM'))
+
+        self.cache.invalidate()
+        self.assertIsNone(self.cache.exists('alice@HADOOP.COM'))
+
+    def test_ttl(self):
+        """测试TTL过期"""
+        cache = PrincipalInfoCache(self.loader, None, ttl=0)
+        self.assertIsNone(cache.exists('alice@HADOOP.COM'))
+        cache.get('alice@HADOOP.COM')
+        cache.get('alice@HADOOP.COM')
+        self.assertEqual(self.loader.call_count, 2)
+
+    def wait_rewarm(self):
+        thread = self.cache._warm_thread
+        if thread is not None:
+            thread.join(10)
+
+    def test_rewarm_after_ttl(self):
+        """测试预热列表过期后exists()在后台重新执行listprincs，本次调用不等待"""
+        self.cache.warm()
+        self.assertTrue(self.cache.exists('alice@HADOOP.COM'))
+        later = time.monotonic() + 61
+        self.lister.return_value = ['alice@HADOOP.COM', 'bob@HADOOP.COM']
+        with patch('time.monotonic', return_value=later):
+            self.assertIsNone(self.cache.exists('bob@HADOOP.COM'))
+            self.wait_rewarm()
+            self.assertTrue(self.cache.exists('bob@HADOOP.COM'))
+            self.assertTrue(self.cache.exists('alice@HADOOP.COM'))
+            self.assertFalse(self.cache.exists('carol@HADOOP.COM'))
+        self.assertEqual(self.lister.call_count, 2)
+        self.loader.assert_not_called()
+
+    def test_rewarm_failure_backs_off(self):
+        """测试重新预热失败时返回None，一个TTL内不再重试"""
+        self.cache.warm()
+        self.lister.side_effect = RuntimeError('kadmin.local不可用')
+        later = time.monotonic() + 61
+        with patch('time.monotonic', return_value=later):
+            self.assertIsNone(self.cache.exists('alice@HADOOP.COM'))
+            self.wait_rewarm()
+            self.assertIsNone(self.cache.exists('alice@HADOOP.COM'))
+            self.assertIsNone(self.cache._warm_thread)
+        self.assertEqual(self.lister.call_count, 2)
+
+    def test_failed_lookup_cached(self):
+        """测试查询失败在一个TTL内不再调用loader"""
+        self.loader.side_effect = OSError('kadmin.local不可用')
+        for _ in range(3):
+            with self.assertRaises(KadminError):
+                self.cache.get('alice@HADOOP.COM')
+        self.assertEqual(self.loader.call_count, 1)
+
+        # 失效后重新查询
+        self.loader.side_effect = None
+        self.cache.invalidate('alice@HADOOP.COM')
+        self.assertIsNotNone(self.cache.get('alice@HADOOP.COM'))
+        self.assertEqual(self.loader.call_count, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,218 @@
+"""kerberos_auth.KerberosAuth测试"""
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+import kerberos_auth
+from kerberos_auth import KerberosAuth
+
+
+class FakeGSSError(Exception):
+    """模拟的GSSAPI错误"""
+
+
+def make_fake_gssapi():
+    """创建模拟的gssapi模块"""
+    fake = MagicMock()
+    fake.exceptions.GSSError = FakeGSSError
+    return fake
+
+
+class TestLoginBackends(unittest.TestCase):
+    """登录后端测试类"""
+
+    def setUp(self):
+        """测试前准备"""
+        self.temp_dir = tempfile.mkdtemp()
+        with patch.dict('os.environ', {'KERBEROS_CCACHE_DIR': self.temp_dir}):
+            self.auth = KerberosAuth()
+        self.auth.dev_mode = False
+
+    def tearDown(self):
+        """测试后清理"""
+        shutil.rmtree(self.temp_dir)
+
+    def _kinit_process(self, returncode=0):
+        process = MagicMock()
+        process.returncode = returncode
+        process.communicate.return_value = (b'', b'kinit: Password incorrect')
+        return process
+
+    def test_gssapi_backend_no_subprocess(self):
+        """测试GSSAPI后端不启动子进程"""
+        fake = make_fake_gssapi()
+        self.auth.login_backend = 'gssapi'
+        with patch.object(kerberos_auth, 'gssapi', fake), \
+                patch.object(kerberos_auth, 'acquire_cred_with_password', create=True) as acquire, \
+                patch('subprocess.Popen') as popen:
+            self.assertTrue(self.auth.authenticate('alice', 'secret', 'HADOOP.COM'))
+
+        popen.assert_not_called()
+        acquire.assert_called_once()
+        self.assertEqual(acquire.call_args[0][1], b'secret')
+        fake.Name.assert_called_once_with('alice@HADOOP.COM', fake.NameType.kerberos_principal)
+
+    def test_gssapi_wrong_password(self):
+        """测试GSSAPI后端密码错误"""
+        acquire = MagicMock(side_effect=FakeGSSError('Preauthentication failed'))
+        with patch.object(kerberos_auth, 'gssapi', make_fake_gssapi()), \
+                patch.object(kerberos_auth, 'acquire_cred_with_password', acquire, create=True), \
+                patch('subprocess.Popen') as popen:
+            self.assertFalse(self.auth.authenticate('alice@HADOOP.COM', 'wrong'))
+        popen.assert_not_called()
+
+    def test_gssapi_unavailable_falls_back(self):
+        """测试GSSAPI不可用时回退到kinit"""
+        acquire = MagicMock(side_effect=NotImplementedError('no password extension'))
+        with patch.object(kerberos_auth, 'gssapi', make_fake_gssapi()), \
+                patch.object(kerberos_auth, 'acquire_cred_with_password', acquire, create=True), \
+                patch('subprocess.Popen', return_value=self._kinit_process()) as popen:
+            self.assertTrue(self.auth.authenticate('alice', 'secret'))
+        self.assertEqual(popen.call_args[0][0], ['kinit', 'alice@HADOOP.COM'])
+
+    def test_gssapi_store_failure_falls_back(self):
+        """测试GSSAPI写入凭据缓存失败时回退到kinit，且不修改进程环境"""
+        fake = make_fake_gssapi()
+        fake.raw.store_cred_into.side_effect = OSError('ccache not writable')
+        environ = dict(os.environ)
+        with patch.object(kerberos_auth, 'gssapi', fake), \
+                patch.object(kerberos_auth, 'acquire_cred_with_password', create=True), \
+                patch('subprocess.Popen', return_value=self._kinit_process()) as popen:
+            self.assertTrue(self.auth.authenticate('alice', 'secret'))
+        self.assertEqual(popen.call_args[0][0], ['kinit', 'alice@HADOOP.COM'])
+        self.assertEqual(popen.call_args[1]['env']['KRB5CCNAME'],
+                         self.auth.ccache_manager.ccname('alice@HADOOP.COM'))
+        self.assertEqual(dict(os.environ), environ)
+
+    def test_kinit_backend_selected_by_config(self):
+        """测试通过配置选择kinit后端"""
+        self.auth.login_backend = 'kinit'
+        with patch.object(kerberos_auth, 'gssapi', make_fake_gssapi()), \
+                patch.object(kerberos_auth, 'acquire_cred_with_password', create=True) as acquire, \
+                patch('subprocess.Popen', return_value=self._kinit_process(1)) as popen:
+            self.assertFalse(self.auth.authenticate('alice', 'wrong'))
+        acquire.assert_not_called()
+        popen.return_value.communicate.assert_called_once_with(b'wrong\n')
+
+    def test_no_gssapi_module_uses_kinit(self):
+        """测试未安装gssapi模块时使用kinit"""
+        with patch.object(kerberos_auth, 'gssapi', None), \
+                patch('subprocess.Popen', return_value=self._kinit_process()) as popen:
+            self.assertTrue(self.auth.authenticate('alice', 'secret'))
+        popen.assert_called_once()
+
+    def test_concurrent_logins_use_isolated_caches(self):
+        """测试并发登录使用各自的凭据缓存"""
+        ccnames = {}
+        lock = threading.Lock()
+
+        def fake_popen(cmd, **kwargs):
+            with lock:
+                ccnames[cmd[1]] = kwargs['env']['KRB5CCNAME']
+            return self._kinit_process()
+
+        users = [f'user{i}' for i in range(8)]
+        with patch.object(kerberos_auth, 'gssapi', None), \
+                patch('subprocess.Popen', side_effect=fake_popen):
+            threads = [threading.Thread(target=self.auth.authenticate, args=(user, 'secret'))
+                       for user in users]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(len(set(ccnames.values())), len(users))
+        self.assertEqual(len(self.auth.ccache_manager), len(users))
+        for ccname in ccnames.values():
+            self.assertTrue(ccname.startswith(f"FILE:{self.temp_dir}/"))
+
+    def test_logout_only_removes_own_cache(self):
+        """测试注销只删除自己的缓存"""
+        manager = self.auth.ccache_manager
+        for principal in ('alice@HADOOP.COM', 'bob@HADOOP.COM'):
+            with open(manager.path_for(principal), 'wb') as f:
+                f.write(b'')
+            manager.register(principal)
+
+        with patch('subprocess.run') as run:
+            self.assertTrue(self.auth.logout('alice@HADOOP.COM'))
+        run.assert_not_called()
+        self.assertIsNone(manager.lookup('alice@HADOOP.COM'))
+        self.assertIsNotNone(manager.lookup('bob@HADOOP.COM'))
+
+
+class TestPrincipalCacheIntegration(unittest.TestCase):
+    """主体缓存集成测试类"""
+
+    def setUp(self):
+        """测试前准备"""
+        self.temp_dir = tempfile.mkdtemp()
+        with patch.dict('os.environ', {'KERBEROS_CCACHE_DIR': self.temp_dir}):
+            self.auth = KerberosAuth()
+
+    def tearDown(self):
+        """测试后清理"""
+        shutil.rmtree(self.temp_dir)
+
+    def test_unknown_principal_no_kadmin(self):
+        """测试缓存中没有信息的主体直接用kinit认证，登录路径不启动kadmin"""
+        failed = MagicMock(returncode=1)
+        failed.communicate.return_value = (b'', b'kinit: Client not found in Kerberos database\n')
+        with patch('subprocess.Popen', return_value=failed) as popen, patch('subprocess.run') as run:
+            self.assertTrue(self.auth.simulate_auth('admin', 'admin123'))
+            self.assertFalse(self.auth.simulate_auth('admin', 'wrong'))
+        commands = [call[0][0][0] for call in popen.call_args_list + run.call_args_list]
+        self.assertEqual(commands, ['kinit', 'kinit'])
+
+    def test_warmed_principal_uses_kinit(self):
+        """测试预热后KDC中的主体使用kinit认证"""
+        listing = MagicMock(returncode=0, stdout=b'alice@HADOOP.COM\n', stderr=b'')
+        with patch('subprocess.run', return_value=listing):
+            self.assertEqual(self.auth.warm_principal_cache(), 1)
+
+        kinit = MagicMock(returncode=0)
+        kinit.communicate.return_value = (b'', b'')
+        with patch('subprocess.Popen', return_value=kinit) as popen, patch('subprocess.run'):
+            self.assertTrue(self.auth.simulate_auth('alice', 'secret'))
+        self.assertEqual(popen.call_count, 1)
+        self.assertIn('kinit', popen.call_args[0][0])
+
+    def test_expired_listing_rewarmed(self):
+        """测试预热列表过期后在后台重新执行listprincs，KDC中的主体仍使用kinit认证"""
+        listing = MagicMock(returncode=0, stdout=b'alice@HADOOP.COM\n', stderr=b'')
+        with patch('subprocess.run', return_value=listing):
+            self.auth.warm_principal_cache()
+
+        kinit = MagicMock(returncode=0)
+        kinit.communicate.return_value = (b'', b'')
+        expired = time.monotonic() + self.auth.principal_cache.ttl + 1
+        with patch('time.monotonic', return_value=expired), \
+                patch('subprocess.run', return_value=listing) as run, \
+                patch('subprocess.Popen', return_value=kinit) as popen:
+            self.assertTrue(self.auth.simulate_auth('alice', 'secret'))
+            # listprincs在后台线程中执行
+            thread = self.auth.principal_cache._warm_thread
+            if thread is not None:
+                thread.join(10)
+        self.assertIn('listprincs', run.call_args_list[0][0][0])
+        self.assertEqual(popen.call_count, 1)
+        self.assertIn('kinit', popen.call_args[0][0])
+
+    def test_get_principal_info_cached(self):
+        """测试主体信息只查询一次"""
+        process = MagicMock(returncode=0)
+        process.communicate.return_value = (b'Principal: alice@HADOOP.COM\nKey: vno 2, aes256\n', b'')
+        with patch('subprocess.Popen', return_value=process) as popen:
+            info = self.auth.get_principal_info('alice@HADOOP.COM')
+            self.auth.get_principal_info('alice@HADOOP.COM')
+        self.assertEqual(info['kvno'], 2)
+        self.assertEqual(popen.call_count, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
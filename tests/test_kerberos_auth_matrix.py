@@ -0,0 +1,306 @@
+"""KerberosAuth与AsyncKerberosAuth的共享测试矩阵
+
+同一组场景分别在同步和异步实现上执行，两者使用相同的模拟kinit、klist、kdestroy和
+kadmin.local可执行文件，返回值必须完全一致。
+"""
+
+import asyncio
+import os
+import shutil
+import stat
+import sys
+import tempfile
+import time
+import unittest
+from datetime import datetime
+from unittest.mock import patch
+
+import kerberos_auth
+from kerberos.ccache import CCACHE_V4
+from kerberos_auth import AsyncKerberosAuth, KerberosAuth, KerberosAuthBase
+from tests.test_ccache import build_ccache
+
+# 模拟的Kerberos命令，主体数据库为state/db目录下的文件（文件名为主体，内容为密码）
+FAKE_COMMANDS = {
+    'kinit': r'''
+principal = sys.argv[1]
+password = sys.stdin.readline().rstrip('\n')
+if os.path.exists(os.path.join(STATE, 'slow')):
+    time.sleep(float(open(os.path.join(STATE, 'slow')).read()))
+path = os.path.join(DB, principal)
+if not os.path.exists(path):
+    print(f'kinit: Client \'{principal}\' not found in Kerberos database while getting initial credentials', file=sys.stderr)
+    sys.exit(1)
+if open(path).read() != password:
+    print('kinit: Password incorrect while getting initial credentials', file=sys.stderr)
+    sys.exit(1)
+ccname = os.environ['KRB5CCNAME']
+open(ccname[5:] if ccname.startswith('FILE:') else ccname, 'wb').close()
+''',
+    'klist': r'''
+path = os.path.join(STATE, 'klist_output')
+print(open(path).read() if os.path.exists(path) else 'klist: No credentials cache found (filename: /tmp/krb5cc_0)')
+''',
+    'kdestroy': r'''
+ccname = os.environ.get('KRB5CCNAME', '')
+path = ccname[5:] if ccname.startswith('FILE:') else ccname
+if path and os.path.exists(path):
+    os.remove(path)
+''',
+    'kadmin.local': r'''
+query = shlex.split(sys.argv[2].replace('""', '\\"')) if len(sys.argv) > 2 else ['']
+if query[0] == 'listprincs':
+    for name in sorted(os.listdir(DB)):
+        print(name)
+elif query[0] == 'getprinc':
+    if os.path.exists(os.path.join(DB, query[1])):
+        print(f'Principal: {query[1]}\nExpiration date: [never]\nKey: vno 1, aes256-cts-hmac-sha1-96\nAttributes: REQUIRES_PRE_AUTH')
+    else:
+        print(f'get_principal: Principal does not exist while retrieving "{query[1]}".', file=sys.stderr)
+elif query[0] == 'addprinc':
+    password, principal = query[2], query[3]
+    path = os.path.join(DB, principal)
+    if principal.startswith('bad'):
+        print(f'add_principal: Malformed representation of principal while creating "{principal}".', file=sys.stderr)
+        sys.exit(1)
+    elif os.path.exists(path):
+        print(f'add_principal: Principal or policy already exists while creating "{principal}".', file=sys.stderr)
+    else:
+        open(path, 'w').write(password)
+        print(f'Principal "{principal}" created.')
+else:
+    for line in sys.stdin:
+        args = shlex.split(line.replace('""', '\\"'))
+        if args and args[0] == 'addprinc':
+            password, principal = args[2], args[3]
+            path = os.path.join(DB, principal)
+            if os.path.exists(path):
+                print(f'add_principal: Principal or policy already exists while creating "{principal}".', file=sys.stderr)
+            else:
+                open(path, 'w').write(password)
+                print(f'Principal "{principal}" created.')
+''',
+}
+
+HEADER = '''#!{python}
+import os, shlex, sys, time
+STATE = {state!r}
+DB = os.path.join(STATE, 'db')
+'''
+
+KLIST_OUTPUT = '''Ticket cache: KEYRING:persistent:0:0
+Default principal: alice@HADOOP.COM
+
+Valid starting       Expires              Service principal
+12/31/2098 00:00:00  valid until 12/31/2099 00:00:00
+'''
+
+
+class FakeRealm:
+    """模拟的Kerberos命令和主体数据库"""
+
+    def __init__(self):
+        self.root = tempfile.mkdtemp()
+        self.state = os.path.join(self.root, 'state')
+        self.bin = os.path.join(self.root, 'bin')
+        self.ccache_dir = os.path.join(self.root, 'ccache')
+        for path in (self.state, self.bin, self.ccache_dir, os.path.join(self.state, 'db')):
+            os.makedirs(path, exist_ok=True)
+        for name, body in FAKE_COMMANDS.items():
+            path = os.path.join(self.bin, name)
+            with open(path, 'w') as f:
+                f.write(HEADER.format(python=sys.executable, state=self.state) + body)
+            os.chmod(path, os.stat(path).st_mode | stat.S_IEXEC)
+        self.add('alice@HADOOP.COM', 'alice-pw')
+        self.add('admin@HADOOP.COM', 'kdc-admin-pw')
+
+    def add(self, principal, password):
+        with open(os.path.join(self.state, 'db', principal), 'w') as f:
+            f.write(password)
+
+    def exists(self, principal):
+        return os.path.exists(os.path.join(self.state, 'db', principal))
+
+    def write_state(self, name, content):
+        with open(os.path.join(self.state, name), 'w') as f:
+            f.write(content)
+
+    def make_auth(self, cls, **kwargs):
+        with patch.dict('os.environ', {'KERBEROS_CCACHE_DIR': self.ccache_dir}):
+            auth = cls(**kwargs)
+        auth.env['PATH'] = self.bin + os.pathsep + auth.env.get('PATH', '')
+        auth.dev_mode = False
+        auth.login_backend = 'kinit'
+        return auth
+
+    def cleanup(self):
+        shutil.rmtree(self.root)
+
+
+def _file_ccache(realm, auth):
+    path = os.path.join(realm.root, 'krb5cc_file')
+    with open(path, 'wb') as f:
+        f.write(build_ccache(CCACHE_V4, 'bob', 'HADOOP.COM', [
+            ('krbtgt/HADOOP.COM', 'HADOOP.COM', 4000000000, 4000036000),
+        ]))
+    auth.env['KRB5CCNAME'] = f"FILE:{path}"
+
+
+def _keyring(realm, auth, output=KLIST_OUTPUT):
+    auth.env['KRB5CCNAME'] = 'KEYRING:persistent:0'
+    if output is not None:
+        realm.write_state('klist_output', output)
+
+
+def _dev(realm, auth):
+    auth.dev_mode = True
+    auth.warm_principal_cache()
+
+
+# 场景: (名称, 准备函数, 方法名, 参数, 预期结果)
+SCENARIOS = [
+    ('kinit_success', None, 'authenticate', ('alice', 'alice-pw'), True),
+    ('kinit_wrong_password', None, 'authenticate', ('alice@HADOOP.COM', 'wrong'), False),
+    ('kinit_unknown_principal', None, 'authenticate', ('nobody', 'pw'), False),
+    ('dev_kdc_principal', _dev, 'authenticate', ('alice', 'alice-pw'), True),
+    ('dev_kdc_fails_builtin_ok', _dev, 'simulate_auth', ('admin', 'admin123'), True),
+    ('dev_builtin_other_realm', _dev, 'simulate_auth', ('dev@DEV.LOCAL', 'dev123'), True),
+    ('dev_rejected', _dev, 'simulate_auth', ('nobody', 'pw'), False),
+    ('verify_file_ccache', _file_ccache, 'verify_ticket', (),
+     (True, 'bob@HADOOP.COM', datetime.fromtimestamp(4000036000))),
+    ('verify_klist', _keyring, 'verify_ticket', (),
+     (True, 'alice@HADOOP.COM', datetime(2099, 12, 31))),
+    ('verify_klist_no_ticket', lambda realm, auth: _keyring(realm, auth, None), 'verify_ticket', (),
+     (False, None, None)),
+    ('verify_missing_principal_cache', None, 'verify_ticket', ('carol@HADOOP.COM',), (False, None, None)),
+    ('logout_principal', None, 'logout', ('alice@HADOOP.COM',), True),
+    ('logout_default', _keyring, 'logout', (), True),
+    ('principal_info', None, 'get_principal_info', ('alice@HADOOP.COM',),
+     {'Principal': 'alice@HADOOP.COM', 'Expiration date': '[never]',
+      'Key': 'vno 1, aes256-cts-hmac-sha1-96', 'Attributes': 'REQUIRES_PRE_AUTH',
+      'kvno': 1, 'flags': ['REQUIRES_PRE_AUTH'], 'expiration': None}),
+    ('principal_info_missing', None, 'get_principal_info', ('nobody@HADOOP.COM',), {}),
+    ('create_new', None, 'create_principal', ('carol', 'pw "1"'), True),
+    ('create_existing', None, 'create_principal', ('alice', 'x'), True),
+    ('create_rejected', None, 'create_principal', ('bad/name', 'x'), False),
+]
+
+
+class TestSyncAsyncMatrix(unittest.TestCase):
+    """同步与异步实现的共享测试矩阵"""
+
+    def _run_sync(self, setup, method, args):
+        realm = FakeRealm()
+        try:
+            auth = realm.make_auth(KerberosAuth)
+            if setup:
+                setup(realm, auth)
+            return getattr(auth, method)(*args), realm.exists('carol@HADOOP.COM')
+        finally:
+            realm.cleanup()
+
+    def _run_async(self, setup, method, args):
+        realm = FakeRealm()
+        try:
+            auth = realm.make_auth(AsyncKerberosAuth)
+            if setup:
+                setup(realm, auth)
+            return asyncio.run(getattr(auth, method)(*args)), realm.exists('carol@HADOOP.COM')
+        finally:
+            realm.cleanup()
+
+    def test_matrix(self):
+        """测试每个场景同步和异步结果一致"""
+        for name, setup, method, args, expected in SCENARIOS:
+            with self.subTest(scenario=name):
+                sync_result = self._run_sync(setup, method, args)
+                async_result = self._run_async(setup, method, args)
+                self.assertEqual(sync_result, async_result)
+                self.assertEqual(sync_result[0], expected)
+
+    def test_bulk_create(self):
+        """测试批量创建结果一致"""
+        items = [('carol', 'pw'), ('alice', 'pw'), ('dave', '')]
+        sync_result = self._run_sync(None, 'create_principals', (items,))
+        async_result = self._run_async(None, 'create_principals', (items,))
+        self.assertEqual(sync_result, async_result)
+        self.assertEqual([result.status for result in sync_result[0]], ['created', 'exists', 'error'])
+
+
+class TestAsyncKerberosAuth(unittest.IsolatedAsyncioTestCase):
+    """异步实现特有行为测试类"""
+
+    def setUp(self):
+        """测试前准备"""
+        self.realm = FakeRealm()
+
+    def tearDown(self):
+        """测试后清理"""
+        self.realm.cleanup()
+
+    async def test_timeout(self):
+        """测试子进程超时后终止并返回失败"""
+        self.realm.write_state('slow', '10')
+        auth = self.realm.make_auth(AsyncKerberosAuth, timeout=0.5)
+        start = time.monotonic()
+        self.assertFalse(await auth.authenticate('alice', 'alice-pw'))
+        self.assertLess(time.monotonic() - start, 5)
+
+    async def test_concurrent_logins(self):
+        """测试并发登录受信号量限制且互不影响"""
+        self.realm.write_state('slow', '0.3')
+        auth = self.realm.make_auth(AsyncKerberosAuth, concurrency=4)
+        for i in range(8):
+            self.realm.add(f'user{i}@HADOOP.COM', f'pw{i}')
+
+        start = time.monotonic()
+        results = await asyncio.gather(*(auth.authenticate(f'user{i}', f'pw{i}') for i in range(8)))
+        elapsed = time.monotonic() - start
+
+        self.assertEqual(results, [True] * 8)
+        self.assertEqual(len(auth.ccache_manager), 8)
+        # 8个登录、并发上限4、每个至少0.3秒，至少需要两轮
+        self.assertGreaterEqual(elapsed, 0.6)
+
+    async def test_event_loop_not_blocked(self):
+        """测试kinit执行期间事件循环可以处理其他任务"""
+        self.realm.write_state('slow', '0.5')
+        auth = self.realm.make_auth(AsyncKerberosAuth)
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.05)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        self.assertTrue(await auth.authenticate('alice', 'alice-pw'))
+        task.cancel()
+        self.assertGreater(ticks, 5)
+
+    async def test_not_a_sync_auth(self):
+        """测试异步实现不是KerberosAuth的子类，不会被当作同步接口使用"""
+        auth = self.realm.make_auth(AsyncKerberosAuth)
+        self.assertNotIsInstance(auth, KerberosAuth)
+        self.assertIsInstance(auth, KerberosAuthBase)
+        for name in ('authenticate', 'verify_ticket', 'logout', 'get_principal_info',
+                     'simulate_auth', 'create_principal', 'create_principals'):
+            self.assertTrue(asyncio.iscoroutinefunction(getattr(auth, name)), name)
+            self.assertFalse(asyncio.iscoroutinefunction(getattr(KerberosAuth, name)), name)
+
+
+class TestAsyncKerberosAuthLoops(unittest.TestCase):
+    """异步实现跨事件循环测试类"""
+
+    def test_reused_across_event_loops(self):
+        """测试同一实例可以在多个asyncio.run中使用（每个事件循环各自的信号量）"""
+        realm = FakeRealm()
+        self.addCleanup(realm.cleanup)
+        auth = realm.make_auth(AsyncKerberosAuth, concurrency=1)
+        self.assertTrue(asyncio.run(auth.authenticate('alice', 'alice-pw')))
+        self.assertTrue(asyncio.run(auth.authenticate('alice', 'alice-pw')))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,159 @@
+"""Kerberos密钥环测试"""
+
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+from kerberos.crypto import KerberosCrypto
+from kerberos.keyring import KEY_PURPOSES, KeyRing
+from kerberos.suites import TicketCipher
+
+
+def _load_primary_keys(path, queue):
+    keyring = KeyRing(path)
+    queue.put({purpose: keyring.primary(purpose).decode() for purpose in KEY_PURPOSES})
+
+
+class TestKeyRing(unittest.TestCase):
+    """密钥环测试类"""
+
+    def setUp(self):
+        """测试前准备"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.temp_dir, 'keyring.json')
+
+    def tearDown(self):
+        """测试后清理"""
+        shutil.rmtree(self.temp_dir)
+
+    def _ticket(self, crypto, session_key):
+        return crypto.create_ticket(
+            'test_user', 'hdfs', session_key,
+            datetime.utcnow(), timedelta(hours=1), crypto.service_crypto
+        )
+
+    def test_ephemeral_without_path(self):
+        """测试未配置路径时使用进程内密钥"""
+        with patch.dict(os.environ, {'KERBEROS_KEYRING_PATH': ''}):
+            keyring = KeyRing.from_env()
+        self.assertIsNone(keyring.path)
+        self.assertEqual(set(keyring.keys), set(KEY_PURPOSES))
+
+    def test_file_created_with_private_permissions(self):
+        """测试密钥环文件创建及权限"""
+        KeyRing(self.path)
+        self.assertEqual(os.stat(self.path).st_mode & 0o777, 0o600)
+        with open(self.path) as f:
+            data = json.load(f)
+        self.assertEqual(set(data['keys']), set(KEY_PURPOSES))
+
+    def test_ticket_verifies_across_instances(self):
+        """测试不同实例（worker）共享密钥后票据互通"""
+        worker_a = KerberosCrypto(KeyRing(self.path))
+        worker_b = KerberosCrypto(KeyRing(self.path))
+        session_key = worker_a.create_session_key()
+
+        ticket = self._ticket(worker_a, session_key)
+        valid, ticket_data = worker_b.verify_ticket(ticket, worker_b.service_crypto)
+        self.assertTrue(valid, ticket_data)
+
+    def test_concurrent_processes_share_keys(self):
+        """测试多个进程同时启动时得到相同的密钥"""
+        ctx = multiprocessing.get_context('fork')
+        queue = ctx.Queue()
+        processes = [ctx.Process(target=_load_primary_keys, args=(self.path, queue)) for _ in range(4)]
+        for process in processes:
+            process.start()
+        results = [queue.get(timeout=10) for _ in processes]
+        for process in processes:
+            process.join()
+
+        for result in results[1:]:
+            self.assertEqual(result, results[0])
+
+    def test_rotation_keeps_old_tickets_valid(self):
+        """测试密钥轮换期间新旧票据都能验证"""
+        worker_a = KerberosCrypto(KeyRing(self.path, check_interval=0))
+        worker_b = KerberosCrypto(KeyRing(self.path, check_interval=0))
+        session_key = worker_a.create_session_key()
+        old_ticket = self._ticket(worker_a, session_key)
+        old_primary = worker_a.service_key
+
+        # 检查间隔为0时暂存期为0，新密钥立即成为主密钥
+        KeyRing(self.path, check_interval=0).rotate()
+
+        # 两个worker在下次检查时都加载新密钥
+        new_ticket = self._ticket(worker_a, session_key)
+        self.assertNotEqual(worker_a.service_key, old_primary)
+        self.assertTrue(worker_b.verify_ticket(old_ticket, worker_b.service_crypto)[0])
+        self.assertTrue(worker_b.verify_ticket(new_ticket, worker_b.service_crypto)[0])
+
+    def test_rotated_key_staged_before_primary(self):
+        """测试新密钥先暂存一个检查间隔：期间只用于验证，到期后成为主密钥"""
+        worker_a = KerberosCrypto(KeyRing(self.path, check_interval=0))
+        worker_b = KerberosCrypto(KeyRing(self.path, check_interval=3600))
+        old_primary = worker_a.service_key
+        stale = worker_a.service_crypto
+
+        rotated = KeyRing(self.path, check_interval=30)
+        rotated.rotate()
+        new_key = rotated.keys['service'][1]
+        self.assertEqual(rotated.primary('service'), old_primary)
+
+        # worker_a加载到暂存的密钥，但仍用旧密钥签发，尚未检查的worker_b可以验证
+        session_key = worker_a.create_session_key()
+        ticket = self._ticket(worker_a, session_key)
+        self.assertEqual(worker_a.keyring.keys['service'], [old_primary, new_key])
+        self.assertTrue(worker_b.verify_ticket(ticket, worker_b.service_crypto)[0])
+
+        # 暂存期结束后下次检查时提升为主密钥
+        with patch('kerberos.keyring.time.time', return_value=time.time() + 31):
+            # 调用方持有的旧加密对象被换成当前对象
+            ticket = worker_a.create_ticket('test_user', 'hdfs', session_key, datetime.utcnow(),
+                                            timedelta(hours=1), stale)
+        self.assertEqual(worker_a.service_key, new_key)
+        TicketCipher([new_key]).decrypt(ticket.encode())
+        self.assertTrue(worker_a.verify_ticket(ticket, stale)[0])
+
+    def test_rotation_drops_oldest_key(self):
+        """测试超出保留数量的旧密钥被移除"""
+        keyring = KeyRing(self.path, max_keys=2)
+        first = keyring.primary('tgs')
+        keyring.rotate()
+        keyring.rotate()
+
+        self.assertEqual(len(keyring.keys['tgs']), 2)
+        self.assertNotIn(first, keyring.keys['tgs'])
+        self.assertEqual(KeyRing(self.path).keys, keyring.keys)
+
+    def test_no_disk_reads_per_request(self):
+        """测试请求路径上不读取密钥环文件"""
+        crypto = KerberosCrypto(KeyRing(self.path, check_interval=3600))
+        session_key = crypto.create_session_key()
+
+        with patch('builtins.open') as mock_open, patch('os.stat') as mock_stat:
+            for _ in range(100):
+                ticket = self._ticket(crypto, session_key)
+                crypto.verify_ticket(ticket, crypto.service_crypto)
+        mock_open.assert_not_called()
+        mock_stat.assert_not_called()
+
+    def test_corrupt_file_keeps_current_keys(self):
+        """测试密钥环文件损坏时继续使用已加载的密钥"""
+        keyring = KeyRing(self.path, check_interval=0)
+        keys = dict(keyring.keys)
+        with open(self.path, 'w') as f:
+            f.write('{broken')
+
+        self.assertFalse(keyring.refresh())
+        self.assertEqual(keyring.keys, keys)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,154 @@
+"""模拟KDC测试"""
+
+import os
+import unittest
+from unittest.mock import patch
+
+from kerberos.loadgen import run_mock_load
+from kerberos.mock_auth import (ERR_KDC_UNREACHABLE, ERR_PASSWORD_INCORRECT, ERR_TICKET_EXPIRED,
+                                ERR_TICKET_UNKNOWN, ERR_WRONG_SERVER, MockKDC, MockKerberosAuth)
+
+
+class FakeClock:
+    """可手动推进的时钟"""
+
+    def __init__(self):
+        self.now = 1700000000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestMockKDC(unittest.TestCase):
+    """模拟KDC测试类"""
+
+    def setUp(self):
+        """测试前准备"""
+        self.clock = FakeClock()
+        self.sleeps = []
+        self.kdc = MockKDC('TEST.COM', ticket_lifetime=100, renew_lifetime=1000,
+                           latency=0, jitter=0, error_rate=0, seed=1,
+                           clock=self.clock, sleep=self.sleeps.append)
+        self.kdc.add_principal('alice', 'alice-pw')
+
+    def test_as_and_tgs_exchange(self):
+        """测试签发TGT和服务票据"""
+        success, tgt, error = self.kdc.as_req('alice', 'alice-pw')
+        self.assertTrue(success)
+        self.assertIsNone(error)
+        self.assertEqual(tgt.client, 'alice@TEST.COM')
+        self.assertEqual(tgt.server, 'krbtgt/TEST.COM@TEST.COM')
+        self.assertEqual(tgt.endtime, self.clock.now + 100)
+        self.assertEqual(tgt.renew_till, self.clock.now + 1000)
+
+        success, ticket, _ = self.kdc.tgs_req(tgt.ticket, 'HTTP/localhost')
+        self.assertTrue(success)
+        self.assertEqual(ticket.server, 'HTTP/localhost@TEST.COM')
+        self.assertEqual(self.kdc.verify(ticket.ticket, 'HTTP/localhost'), (True, None))
+        self.assertEqual(self.kdc.verify(ticket.ticket, 'hdfs/localhost'), (False, ERR_WRONG_SERVER))
+        self.assertEqual(self.kdc.lookup(ticket.ticket), ticket)
+
+    def test_bad_credentials(self):
+        """测试未知主体和错误密码"""
+        success, tgt, error = self.kdc.as_req('alice', 'wrong')
+        self.assertFalse(success)
+        self.assertIsNone(tgt)
+        self.assertEqual(error, ERR_PASSWORD_INCORRECT)
+        self.assertIn('not found in Kerberos database', self.kdc.as_req('bob', 'pw')[2])
+        self.assertEqual(self.kdc.tgs_req('no-such-ticket', 'HTTP/localhost')[2], ERR_TICKET_UNKNOWN)
+
+    def test_expiry(self):
+        """测试票据到期后被拒绝，服务票据不晚于TGT到期"""
+        _, tgt, _ = self.kdc.as_req('alice', 'alice-pw')
+        self.clock.now += 60
+        _, ticket, _ = self.kdc.tgs_req(tgt.ticket, 'HTTP/localhost')
+        self.assertEqual(ticket.endtime, tgt.endtime)
+
+        self.clock.now += 40
+        self.assertEqual(self.kdc.verify(ticket.ticket), (False, ERR_TICKET_EXPIRED))
+        self.assertEqual(self.kdc.tgs_req(tgt.ticket, 'HTTP/localhost')[2], ERR_TICKET_EXPIRED)
+        self.assertEqual(self.kdc.purge_expired(), 2)
+        self.assertEqual(len(self.kdc), 0)
+
+    def test_expired_purged_on_issue(self):
+        """测试签发票据时定期清理过期票据，票据数量不会无限增长"""
+        kdc = MockKDC('TEST.COM', ticket_lifetime=10, renew_lifetime=100, latency=0, jitter=0,
+                      error_rate=0, purge_interval=4, clock=self.clock, sleep=self.sleeps.append)
+        kdc.add_principal('alice', 'alice-pw')
+        for _ in range(20):
+            self.assertTrue(kdc.as_req('alice', 'alice-pw')[0])
+            self.clock.now += 20
+        self.assertLessEqual(len(kdc), 4)
+
+        _, tgt, _ = kdc.as_req('alice', 'alice-pw')
+        self.assertEqual(kdc.verify(tgt.ticket), (True, None))
+
+    def test_destroy(self):
+        """测试销毁主体的全部票据"""
+        _, tgt, _ = self.kdc.as_req('alice', 'alice-pw')
+        _, ticket, _ = self.kdc.tgs_req(tgt.ticket, 'HTTP/localhost')
+        self.assertEqual(self.kdc.destroy('alice'), 2)
+        self.assertEqual(self.kdc.verify(ticket.ticket), (False, ERR_TICKET_UNKNOWN))
+        self.assertEqual(self.kdc.destroy('alice'), 0)
+
+    def test_synthetic_principals(self):
+        """测试批量生成合成主体"""
+        users = self.kdc.add_synthetic_principals(5000)
+        self.assertEqual(len(users), 5000)
+        name, password = users[4321]
+        self.assertEqual(name, 'user04321@TEST.COM')
+        self.assertTrue(self.kdc.as_req(name, password)[0])
+
+    def test_latency_and_error_injection(self):
+        """测试注入延迟和错误"""
+        self.kdc.latency = 0.01
+        self.kdc.jitter = 0.005
+        self.kdc.error_rate = 0.25
+        results = [self.kdc.as_req('alice', 'alice-pw') for _ in range(2000)]
+        failures = [error for success, _, error in results if not success]
+
+        self.assertEqual(len(self.sleeps), 2000)
+        self.assertTrue(all(0.01 <= delay <= 0.015 for delay in self.sleeps))
+        self.assertEqual(set(failures), {ERR_KDC_UNREACHABLE.format('TEST.COM')})
+        self.assertAlmostEqual(len(failures) / 2000, 0.25, delta=0.05)
+        self.assertEqual(self.kdc.stats['injected_errors'], len(failures))
+        self.assertEqual(self.kdc.stats['as_req'], 2000)
+
+    def test_run_mock_load(self):
+        """测试模拟KDC负载生成"""
+        result = run_mock_load(self.kdc, concurrency=4, requests=50, principals=200,
+                               services=['hdfs/localhost', 'yarn/localhost'])
+        self.assertEqual(result['errors'], 0)
+        self.assertEqual(result['requests'], 150)
+        self.assertEqual(self.kdc.stats['verify'], 100)
+        self.assertIn('verify_p99_ms', result)
+
+
+class TestMockKerberosAuth(unittest.TestCase):
+    """模拟认证测试类"""
+
+    def test_test_users(self):
+        """测试内置测试用户的登录和票据验证"""
+        with patch.dict(os.environ, {'FLASK_ENV': 'production'}):
+            auth = MockKerberosAuth('HTTP', 'TEST.COM')
+            self.assertEqual(auth.authenticate('admin', 'admin123'), (True, None))
+            self.assertEqual(auth.authenticate('admin', 'wrong'), (False, "用户名或密码错误"))
+            self.assertTrue(auth.verify_ticket(auth.session_keys['admin']))
+            self.assertFalse(auth.verify_ticket('mock_ticket_admin'))
+
+            success, ticket = auth.get_service_ticket('admin')
+            self.assertTrue(success)
+            self.assertEqual(auth.kdc.lookup(ticket).server, 'HTTP/localhost@TEST.COM')
+            self.assertEqual(auth.get_service_ticket('user1'), (False, "用户未登录"))
+
+    def test_development_accepts_any_user(self):
+        """测试开发环境接受任意用户名和密码"""
+        with patch.dict(os.environ, {'FLASK_ENV': 'development'}):
+            auth = MockKerberosAuth('HTTP', 'TEST.COM')
+            self.assertEqual(auth.authenticate('carol', 'anything'), (True, None))
+            self.assertIn('carol', auth.session_keys)
+            self.assertTrue(auth.verify_ticket('any'))
+
+
+if __name__ == '__main__':
+    unittest.main()
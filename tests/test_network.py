@@ -0,0 +1,153 @@
+"""Kerberos网络前端测试"""
+
+import asyncio
+import unittest
+from datetime import datetime
+
+from kerberos.crypto import KerberosCrypto
+from kerberos.loadgen import percentile, run_load
+from kerberos.network import (
+    AsyncKerberosClient,
+    KerberosNetworkServer,
+    ProtocolError,
+    decode_frame,
+    encode_frame,
+)
+from kerberos.servers import KerberosAS, KerberosTGS, KerberosService
+
+
+class TestFraming(unittest.TestCase):
+    """帧编码测试类"""
+
+    def test_roundtrip(self):
+        """测试帧编码往返"""
+        message = {'type': 'as', 'username': '用户'}
+        self.assertEqual(decode_frame(encode_frame(message)), message)
+
+    def test_length_mismatch(self):
+        """测试长度不匹配的帧"""
+        with self.assertRaises(ProtocolError):
+            decode_frame(encode_frame({'a': 1})[:-1])
+
+    def test_percentile(self):
+        """测试百分位数计算"""
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([], 99), 0.0)
+
+
+class TestKerberosNetworkServer(unittest.IsolatedAsyncioTestCase):
+    """网络前端测试类"""
+
+    async def asyncSetUp(self):
+        """测试前准备"""
+        self.crypto = KerberosCrypto()
+        self.server = KerberosNetworkServer(KerberosAS(self.crypto), KerberosTGS(self.crypto))
+        await self.server.start()
+
+    async def asyncTearDown(self):
+        """测试后清理"""
+        await self.server.close()
+
+    async def _exchange(self, transport):
+        port = self.server.udp_port if transport == 'udp' else self.server.tcp_port
+        async with AsyncKerberosClient('127.0.0.1', port, transport) as client:
+            success, tgt, session_key = await client.get_tgt('test_user', 'test_password')
+            self.assertTrue(success, tgt)
+            success, error, tickets = await client.get_service_tickets(
+                'test_user', tgt, session_key, ['hdfs', 'yarn'])
+            self.assertTrue(success, error)
+            return tickets
+
+    async def test_tcp_exchange(self):
+        """测试TCP上的AS和TGS交换"""
+        tickets = await self._exchange('tcp')
+        ticket, session_key = tickets['hdfs']
+        authenticator = self.crypto.create_authenticator('test_user', datetime.utcnow(), session_key)
+        success, error = KerberosService('hdfs', self.crypto).verify_client(ticket, authenticator)
+        self.assertTrue(success, error)
+
+    async def test_udp_exchange(self):
+        """测试UDP上的AS和TGS交换"""
+        tickets = await self._exchange('udp')
+        self.assertEqual(set(tickets), {'hdfs', 'yarn'})
+        # 请求处理完成后不再保留任务引用
+        await asyncio.sleep(0)
+        self.assertEqual(self.server._udp_protocol.tasks, set())
+
+    async def test_wrong_password(self):
+        """测试密码错误"""
+        async with AsyncKerberosClient('127.0.0.1', self.server.tcp_port) as client:
+            success, error, _ = await client.get_tgt('test_user', 'wrong')
+        self.assertFalse(success)
+        self.assertEqual(error, "用户名或密码错误")
+
+    async def test_password_not_on_wire(self):
+        """测试AS交换中密码和TGS会话密钥都不以明文出现在网络上"""
+        frames = []
+        dispatch = self.server.dispatch
+
+        async def record(request):
+            response = await dispatch(request)
+            frames.append((encode_frame(request), encode_frame(response)))
+            return response
+
+        self.server.dispatch = record
+        async with AsyncKerberosClient('127.0.0.1', self.server.tcp_port) as client:
+            success, tgt, session_key = await client.get_tgt('test_user', 'test_password')
+            self.assertTrue(success, tgt)
+            # 第二次使用缓存的预认证参数，只需一次往返
+            self.assertEqual(len(frames), 2)
+            await client.get_tgt('test_user', 'test_password')
+            self.assertEqual(len(frames), 3)
+        for request, response in frames:
+            self.assertNotIn(b'test_password', request)
+            self.assertNotIn(session_key, response)
+            self.assertNotIn(b'session_key', response)
+
+    async def test_plaintext_password_rejected(self):
+        """测试携带明文密码的AS请求被拒绝"""
+        async with AsyncKerberosClient('127.0.0.1', self.server.tcp_port) as client:
+            response = await client.request({'type': 'as', 'username': 'test_user',
+                                             'password': 'test_password'})
+            self.assertFalse(response['ok'])
+            self.assertNotIn('tgt', response)
+
+            # 未知主体同样返回稳定的预认证参数
+            first = await client.request({'type': 'as', 'username': 'nobody'})
+            second = await client.request({'type': 'as', 'username': 'nobody'})
+            self.assertEqual(first['preauth'], second['preauth'])
+            success, error, _ = await client.get_tgt('nobody', 'test_password')
+        self.assertFalse(success)
+        self.assertEqual(error, "用户名或密码错误")
+
+    async def test_bad_request(self):
+        """测试格式错误和未知类型的请求"""
+        async with AsyncKerberosClient('127.0.0.1', self.server.tcp_port) as client:
+            response = await client.request({'type': 'as'})
+            self.assertFalse(response['ok'])
+            response = await client.request({'type': 'unknown'})
+            self.assertFalse(response['ok'])
+
+    async def test_oversized_frame_closes_connection(self):
+        """测试超长帧导致连接关闭"""
+        reader, writer = await asyncio.open_connection('127.0.0.1', self.server.tcp_port)
+        writer.write((1 << 30).to_bytes(4, 'big'))
+        await writer.drain()
+        self.assertEqual(await reader.read(), b'')
+        writer.close()
+
+    async def test_concurrent_clients(self):
+        """测试多客户端并发并输出吞吐量与p99延迟"""
+        for transport in ('tcp', 'udp'):
+            port = self.server.udp_port if transport == 'udp' else self.server.tcp_port
+            result = await run_load('127.0.0.1', port, transport, concurrency=8, requests=80)
+            print(f"\n[网络前端 {transport}] {result['rps']:.0f} 请求/秒, "
+                  f"AS p99: {result['as_p99_ms']:.2f}ms, TGS p99: {result['tgs_p99_ms']:.2f}ms")
+            self.assertEqual(result['errors'], 0)
+            self.assertEqual(result['requests'], 160)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+"""AS主体存储测试"""
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+
+from kerberos.crypto import KerberosCrypto
+from kerberos.principals import PrincipalStore, string_to_key
+from kerberos.servers import KerberosAS
+
+
+class TestPrincipalStore(unittest.TestCase):
+    """主体存储测试类"""
+
+    def setUp(self):
+        """测试前准备"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.store = PrincipalStore(iterations=1000)
+
+    def tearDown(self):
+        """测试后清理"""
+        shutil.rmtree(self.temp_dir)
+
+    def test_salted_keys(self):
+        """测试相同密码派生出不同的长期密钥"""
+        self.store.add_principal('alice', 'secret')
+        self.store.add_principal('bob', 'secret')
+        alice_salt, _, alice_key = self.store._index['alice']
+        bob_salt, _, bob_key = self.store._index['bob']
+
+        self.assertNotEqual(alice_salt, bob_salt)
+        self.assertNotEqual(alice_key, bob_key)
+        self.assertEqual(string_to_key('secret', alice_salt, 1000), alice_key)
+
+    def test_verify(self):
+        """测试密码验证"""
+        self.store.add_principal('alice', 'secret')
+        self.assertTrue(self.store.verify('alice', 'secret'))
+        self.assertFalse(self.store.verify('alice', 'wrong'))
+        self.assertFalse(self.store.verify('nobody', 'secret'))
+
+    def test_file_roundtrip(self):
+        """测试文件保存与加载"""
+        self.store.add_principal('alice', 'secret')
+        self.store.add_principal('hdfs/node1@HADOOP.COM', 'hdfs123')
+        path = os.path.join(self.temp_dir, 'principals.tsv')
+        self.store.save_file(path)
+
+        loaded = PrincipalStore()
+        self.assertEqual(loaded.load_file(path), 2)
+        self.assertTrue(loaded.verify('hdfs/node1@HADOOP.COM', 'hdfs123'))
+        self.assertEqual(os.stat(path).st_mode & 0o777, 0o600)
+
+    def test_sqlite_roundtrip(self):
+        """测试SQLite保存与加载"""
+        self.store.add_principal('alice', 'secret')
+        path = os.path.join(self.temp_dir, 'app.db')
+        self.store.save_sqlite(path)
+
+        loaded = PrincipalStore()
+        self.assertEqual(loaded.load_sqlite(path), 1)
+        self.assertTrue(loaded.verify('alice', 'secret'))
+
+    def test_from_env(self):
+        """测试根据环境变量加载主体存储"""
+        self.store.add_principal('alice', 'secret')
+        path = os.path.join(self.temp_dir, 'principals.tsv')
+        self.store.save_file(path)
+
+        with patch.dict(os.environ, {'KERBEROS_PRINCIPAL_STORE': path}):
+            as_server = KerberosAS(KerberosCrypto())
+        self.assertTrue(as_server.authenticate('alice', 'secret')[0])
+        self.assertFalse(as_server.authenticate('test_user', 'test_password')[0])
+
+    def test_as_does_not_touch_disk(self):
+        """测试AS认证不访问磁盘"""
+        self.store.add_principal('alice', 'secret')
+        as_server = KerberosAS(KerberosCrypto(), self.store)
+        with patch('builtins.open') as mock_open:
+            success, _, _ = as_server.authenticate('alice', 'secret')
+        self.assertTrue(success)
+        mock_open.assert_not_called()
+
+    def test_bulk_load_100k(self):
+        """测试批量加载10万个主体"""
+        count = 100000
+        salt, key = os.urandom(16), os.urandom(32)
+        store = PrincipalStore(iterations=1000)
+        store.load_records((f"user{i}@HADOOP.COM", salt, 1000, key) for i in range(count))
+        store.add_principal('user0@HADOOP.COM', 'secret')
+        path = os.path.join(self.temp_dir, 'principals.tsv')
+        store.save_file(path)
+
+        loaded = PrincipalStore()
+        start = time.perf_counter()
+        self.assertEqual(loaded.load_file(path), count)
+        elapsed = time.perf_counter() - start
+
+        print(f"\n[主体存储] 加载{count}个主体耗时: {elapsed:.2f}s")
+        self.assertLess(elapsed, 5)
+        self.assertTrue(loaded.verify('user0@HADOOP.COM', 'secret'))
+
+
+if __name__ == '__main__':
+    unittest.main()
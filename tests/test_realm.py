@@ -0,0 +1,211 @@
+"""基于KDB快照的领域初始化测试"""
+
+import json
+import os
+import shutil
+import stat
+import sys
+import tempfile
+import unittest
+
+from kerberos.kadmin import KadminError
+from kerberos.realm import RealmBootstrapper, profile_value
+
+from tests.test_totp import ROOT
+
+# 模拟的kdb5_util和kadmin.local，KDB为JSON文件: {"realm", "master", "principals": {主体: 密码}}
+FAKE_KDB5_UTIL = r'''
+args = sys.argv[1:]
+options = dict(zip(args[0:6:2], args[1:6:2]))
+realm, db, stash = options['-r'], options['-d'], options['-sf']
+command, rest = args[6], args[7:]
+if command == 'create':
+    master = sys.stdin.readline().rstrip('\n')
+    if master != sys.stdin.readline().rstrip('\n'):
+        sys.exit('kdb5_util: Password mismatch')
+    json.dump({'realm': realm, 'master': master,
+               'principals': {f'K/M@{realm}': None, f'krbtgt/{realm}@{realm}': None}}, open(db, 'w'))
+    for suffix in ('.kadm5', '.kadm5.lock', '.ok'):
+        open(db + suffix, 'w').close()
+    open(stash, 'w').write(master)
+elif command == 'dump':
+    shutil.copyfile(db, rest[0])
+elif command == 'load':
+    dump = json.load(open(rest[-1]))
+    if open(stash).read() != dump['master']:
+        sys.exit('kdb5_util: Stored master key does not match dump')
+    if rest[0] == '-update':
+        data = json.load(open(db))
+        data['principals'].update(dump['principals'])
+    else:
+        data = dump
+        for suffix in ('.kadm5', '.kadm5.lock', '.ok'):
+            open(db + suffix, 'w').close()
+    json.dump(data, open(db, 'w'))
+'''
+
+FAKE_KADMIN_LOCAL = r'''
+profile = open(os.environ['KRB5_KDC_PROFILE'].split(':')[0]).read()
+db = re.search(r'database_name = (\S+)', profile).group(1)
+data = json.load(open(db))
+for line in sys.stdin:
+    args = shlex.split(line.replace('""', '\\"'))
+    if args[1] == '-randkey':
+        data['principals'][args[2]] = None
+    else:
+        data['principals'][args[3]] = args[2]
+    print(f'Principal "{args[-1]}" created.')
+json.dump(data, open(db, 'w'))
+'''
+
+
+class TestRealmBootstrapper(unittest.TestCase):
+    """领域初始化测试类"""
+
+    def setUp(self):
+        """测试前准备"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.calls = os.path.join(self.temp_dir, 'calls')
+        bin_dir = os.path.join(self.temp_dir, 'bin')
+        os.makedirs(bin_dir)
+        for name, body in (('kdb5_util', FAKE_KDB5_UTIL), ('kadmin.local', FAKE_KADMIN_LOCAL)):
+            path = os.path.join(bin_dir, name)
+            with open(path, 'w') as f:
+                f.write(f"#!{sys.executable}\nimport json, os, re, shlex, shutil, sys\n"
+                        f"open({self.calls!r}, 'a').write({name!r} + ' ' + ' '.join(sys.argv[7:8]) + '\\n')\n"
+                        + body)
+            os.chmod(path, os.stat(path).st_mode | stat.S_IEXEC)
+        self.bootstrapper = RealmBootstrapper(
+            snapshot_dir=os.path.join(self.temp_dir, 'snapshots'),
+            kdb5_util=os.path.join(bin_dir, 'kdb5_util'),
+            kadmin_local=os.path.join(bin_dir, 'kadmin.local'),
+            env=dict(os.environ))
+        self.principals = [('nn/localhost', None), ('hdfs_admin', 'hdfs123')]
+
+    def tearDown(self):
+        """测试后清理"""
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def read_calls(self):
+        if not os.path.exists(self.calls):
+            return []
+        with open(self.calls) as f:
+            return f.read().split()
+
+    def target(self, name):
+        return os.path.join(self.temp_dir, name, 'principal')
+
+    def read_kdb(self, database_name):
+        with open(database_name) as f:
+            return json.load(f)
+
+    def test_bootstrap_clones_snapshot(self):
+        """测试第一次创建快照，之后的领域直接复制快照"""
+        first = self.target('realm1')
+        self.bootstrapper.bootstrap(first, first + '.stash', 'TEST.COM', 'master', self.principals)
+        self.assertEqual(self.read_calls().count('create'), 1)
+
+        data = self.read_kdb(first)
+        self.assertEqual(data['principals']['hdfs_admin@TEST.COM'], 'hdfs123')
+        self.assertIsNone(data['principals']['nn/localhost@TEST.COM'])
+        self.assertTrue(os.path.exists(first + '.kadm5'))
+        self.assertEqual(stat.S_IMODE(os.stat(first).st_mode), 0o600)
+
+        calls = len(self.read_calls())
+        second = self.target('realm2')
+        elapsed = self.bootstrapper.bootstrap(second, second + '.stash', 'TEST.COM', 'master',
+                                              list(reversed(self.principals)))
+        self.assertEqual(len(self.read_calls()), calls)
+        self.assertLess(elapsed, 1.0)
+        self.assertEqual(self.read_kdb(second), data)
+        with open(second + '.stash') as f:
+            self.assertEqual(f.read(), 'master')
+
+    def test_snapshot_keyed_by_realm_and_master(self):
+        """测试不同的领域或主密码使用不同的快照"""
+        key = self.bootstrapper.snapshot_key('TEST.COM', 'master', self.principals)
+        self.assertNotEqual(key, self.bootstrapper.snapshot_key('TEST.COM', 'other', self.principals))
+        self.assertNotEqual(key, self.bootstrapper.snapshot_key('DEV.LOCAL', 'master', self.principals))
+        self.assertNotEqual(key, self.bootstrapper.snapshot_key('TEST.COM', 'master', []))
+
+        target = self.target('realm')
+        self.bootstrapper.bootstrap(target, target + '.stash', 'DEV.LOCAL', 'other')
+        self.assertEqual(self.read_kdb(target)['realm'], 'DEV.LOCAL')
+        self.assertNotIn('kadmin.local', self.read_calls())
+
+    def test_existing_database(self):
+        """测试目标KDB已存在时不覆盖"""
+        target = self.target('realm')
+        self.bootstrapper.bootstrap(target, target + '.stash', 'TEST.COM', 'master')
+        with self.assertRaises(FileExistsError):
+            self.bootstrapper.bootstrap(target, target + '.stash', 'TEST.COM', 'master')
+        self.bootstrapper.bootstrap(target, target + '.stash', 'TEST.COM', 'master',
+                                    self.principals, overwrite=True)
+        self.assertIn('hdfs_admin@TEST.COM', self.read_kdb(target)['principals'])
+
+    def test_dump_only_snapshot_and_update_dumps(self):
+        """测试快照只有dump时用kdb5_util load恢复，并导入额外的dump"""
+        snapshot = self.bootstrapper.build_snapshot('TEST.COM', 'master', self.principals)
+        for name in os.listdir(snapshot):
+            if name.startswith('principal') and name != 'principal.stash':
+                os.remove(os.path.join(snapshot, name))
+
+        extra = os.path.join(self.temp_dir, 'extra.dump')
+        with open(extra, 'w') as f:
+            json.dump({'realm': 'TEST.COM', 'master': 'master',
+                       'principals': {'alice@TEST.COM': 'alice-pw'}}, f)
+
+        target = self.target('realm')
+        self.bootstrapper.bootstrap(target, target + '.stash', 'TEST.COM', 'master',
+                                    self.principals, dumps=[extra])
+        principals = self.read_kdb(target)['principals']
+        self.assertIn('hdfs_admin@TEST.COM', principals)
+        self.assertEqual(principals['alice@TEST.COM'], 'alice-pw')
+        self.assertEqual(self.read_calls().count('load'), 2)
+
+    def test_import_template(self):
+        """测试把已有KDB登记为快照"""
+        template = self.target('template')
+        self.bootstrapper.bootstrap(template, template + '.stash', 'TEST.COM', 'master', self.principals)
+        other = RealmBootstrapper(snapshot_dir=os.path.join(self.temp_dir, 'imported'),
+                                  kdb5_util=self.bootstrapper.kdb5_util,
+                                  kadmin_local=self.bootstrapper.kadmin_local)
+        other.import_template(template, template + '.stash', 'TEST.COM', 'master', self.principals)
+
+        target = self.target('realm')
+        other.bootstrap(target, target + '.stash', 'TEST.COM', 'master', self.principals)
+        self.assertEqual(self.read_kdb(target), self.read_kdb(template))
+        self.assertEqual(self.read_calls().count('create'), 1)
+
+    def test_production_realm_not_cloned(self):
+        """测试不在KERBEROS_REALM_SNAPSHOT_REALMS中的领域不从快照克隆"""
+        target = self.target('realm')
+        with self.assertRaises(ValueError):
+            self.bootstrapper.bootstrap(target, target + '.stash', 'HADOOP.COM', 'master')
+        self.assertEqual(self.read_calls(), [])
+        self.assertFalse(os.path.exists(target))
+
+    def test_configs_layer_on_kdc_profile(self):
+        """测试生成的kdc.conf只覆盖KDB路径，其余配置取自正式kdc.conf"""
+        kdc_conf = os.path.join(ROOT, 'config', 'kdc.conf')
+        bootstrapper = RealmBootstrapper(snapshot_dir=self.bootstrapper.snapshot_dir,
+                                         env={'KRB5_KDC_PROFILE': kdc_conf})
+        env = bootstrapper._write_configs(self.temp_dir, 'TEST.COM', '/db/principal', '/db/stash')
+        generated, base = env['KRB5_KDC_PROFILE'].split(':')
+        self.assertEqual(base, kdc_conf)
+        self.assertEqual(profile_value(generated, 'TEST.COM', 'key_stash_file'), '/db/stash')
+        self.assertIsNone(profile_value(generated, 'TEST.COM', 'default_principal_flags'))
+        self.assertEqual(profile_value(base, 'TEST.COM', 'default_principal_flags'), '+renewable')
+        self.assertEqual(env['KRB5_CONFIG'], os.path.join(self.temp_dir, 'krb5.conf'))
+
+    def test_create_failure(self):
+        """测试kdb5_util失败时报告错误且不留下快照"""
+        os.remove(self.bootstrapper.kdb5_util)
+        target = self.target('realm')
+        with self.assertRaises(KadminError):
+            self.bootstrapper.bootstrap(target, target + '.stash', 'TEST.COM', 'master')
+        self.assertEqual([name for name in os.listdir(self.bootstrapper.snapshot_dir)], [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,150 @@
+"""服务票据续期调度器测试"""
+
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+import unittest
+
+from kerberos.ccache import CCACHE_V4, CCacheManager
+from kerberos.renewal import TicketRenewalScheduler
+from tests.test_ccache import build_ccache
+
+
+class FakeClock:
+    """可手动推进的时钟"""
+
+    def __init__(self):
+        self.now = float(int(time.time()))
+
+    def __call__(self):
+        return self.now
+
+
+class FakeKinit:
+    """模拟kinit，写入指定有效期的凭据缓存"""
+
+    def __init__(self, lifetime=100, renewable=1000, clock=time.time):
+        self.clock = clock
+        self.lifetime = lifetime
+        self.renewable = renewable
+        self.calls = []
+        self.fail = False
+        self.lock = threading.Lock()
+
+    def __call__(self, args, env=None, **kwargs):
+        with self.lock:
+            self.calls.append(args[1:])
+        if self.fail:
+            return subprocess.CompletedProcess(args, 1, b'', b'kinit: Cannot contact any KDC')
+        now = int(self.clock())
+        principal = args[-1]
+        name, realm = principal.split('@')
+        path = env['KRB5CCNAME'][len('FILE:'):]
+        data = bytearray(build_ccache(CCACHE_V4, name, realm, [
+            (f'krbtgt/{realm}', realm, now, now + self.lifetime),
+        ]))
+        # build_ccache的renew_till固定为endtime+3600，这里改为指定值
+        renew_offset = data.rfind((now + self.lifetime).to_bytes(4, 'big')) + 4
+        data[renew_offset:renew_offset + 4] = (now + self.renewable).to_bytes(4, 'big')
+        with open(path, 'wb') as f:
+            f.write(bytes(data))
+        return subprocess.CompletedProcess(args, 0, b'', b'')
+
+
+class TestTicketRenewalScheduler(unittest.TestCase):
+    """续期调度器测试类"""
+
+    def setUp(self):
+        """测试前准备"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.clock = FakeClock()
+        self.kinit = FakeKinit(clock=self.clock)
+        self.scheduler = TicketRenewalScheduler(
+            CCacheManager(self.temp_dir), fraction=0.8, retry_interval=10, env={},
+            run=self.kinit, clock=self.clock)
+
+    def tearDown(self):
+        """测试后清理"""
+        self.scheduler.stop()
+        shutil.rmtree(self.temp_dir)
+
+    def test_ensure_kinits_once(self):
+        """测试首次ensure从keytab获取票据，之后不再执行kinit"""
+        ccname = self.scheduler.register('nn/localhost@TEST.COM', '/etc/nn.keytab')
+        self.assertTrue(ccname.startswith(f"FILE:{self.temp_dir}/"))
+        self.assertTrue(self.scheduler.ensure('nn/localhost@TEST.COM'))
+        self.assertTrue(self.scheduler.ensure('nn/localhost@TEST.COM'))
+        self.assertEqual(self.kinit.calls, [['-kt', '/etc/nn.keytab', 'nn/localhost@TEST.COM']])
+        self.assertFalse(self.scheduler.ensure('unknown@TEST.COM'))
+
+    def test_schedule_at_fraction_of_lifetime(self):
+        """测试在有效期的固定比例处续期，可续期时使用kinit -R"""
+        self.scheduler.register('nn/localhost@TEST.COM', '/etc/nn.keytab')
+        now = self.clock.now
+        self.assertEqual(self.scheduler.run_pending(), 1)
+        self.assertEqual(self.scheduler.next_due(), now + 80)
+
+        self.clock.now = now + 10
+        self.assertEqual(self.scheduler.run_pending(), 0)
+        self.clock.now = now + 81
+        self.assertEqual(self.scheduler.run_pending(), 1)
+        self.assertEqual(self.kinit.calls[-1], ['-R', 'nn/localhost@TEST.COM'])
+
+    def test_not_renewable_uses_keytab(self):
+        """测试不可续期时从keytab重新获取"""
+        self.kinit.renewable = 0
+        self.scheduler.register('nn/localhost@TEST.COM', '/etc/nn.keytab')
+        self.scheduler.run_pending()
+        self.clock.now += 81
+        self.scheduler.run_pending()
+        self.assertEqual([call[0] for call in self.kinit.calls], ['-kt', '-kt'])
+
+    def test_failure_backoff(self):
+        """测试失败后指数退避重试"""
+        self.kinit.fail = True
+        self.scheduler.register('nn/localhost@TEST.COM', '/etc/nn.keytab')
+        now = self.clock.now
+        self.scheduler.run_pending()
+        self.assertEqual(self.scheduler.next_due(), now + 10)
+        self.clock.now = now + 11
+        self.scheduler.run_pending()
+        self.assertEqual(self.scheduler.next_due(), now + 31)
+        status = self.scheduler.status()['nn/localhost@TEST.COM']
+        self.assertEqual(status['failures'], 2)
+        self.assertIn('Cannot contact', status['last_error'])
+
+        self.kinit.fail = False
+        self.assertTrue(self.scheduler.ensure('nn/localhost@TEST.COM'))
+        self.assertEqual(self.scheduler.status()['nn/localhost@TEST.COM']['failures'], 0)
+
+    def test_unregister(self):
+        """测试移除主体后不再续期"""
+        self.scheduler.register('nn/localhost@TEST.COM', '/etc/nn.keytab')
+        self.scheduler.unregister('nn/localhost@TEST.COM')
+        self.assertIsNone(self.scheduler.next_due())
+        self.assertEqual(self.scheduler.run_pending(), 0)
+
+    def test_background_thread(self):
+        """测试单个后台线程续期多个主体"""
+        self.kinit = FakeKinit(lifetime=2)
+        self.scheduler = TicketRenewalScheduler(CCacheManager(self.temp_dir), env={}, run=self.kinit)
+        self.scheduler.fraction = 0.25
+        for i in range(3):
+            self.scheduler.register(f'svc{i}/localhost@TEST.COM', f'/etc/svc{i}.keytab')
+        threads_before = threading.active_count()
+        self.scheduler.start()
+        self.scheduler.start()
+        self.assertEqual(threading.active_count(), threads_before + 1)
+
+        time.sleep(1.5)
+        self.scheduler.stop(timeout=2)
+        for i in range(3):
+            calls = [call for call in self.kinit.calls if call[-1] == f'svc{i}/localhost@TEST.COM']
+            self.assertGreaterEqual(len(calls), 2)
+            self.assertEqual(calls[1][0], '-R')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,226 @@
+"""Kerberos服务器组件测试"""
+
+import base64
+import os
+import time
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+from hadoop.auth_manager import HadoopAuthManager, HADOOP_SERVICES
+from kerberos.crypto import KerberosCrypto
+from kerberos.replay import ReplayCache
+from kerberos.servers import KerberosAS, KerberosTGS, KerberosService
+
+
+class TestKerberosTGS(unittest.TestCase):
+    """票据授予服务器测试类"""
+
+    def setUp(self):
+        """测试前准备"""
+        self.crypto = KerberosCrypto()
+        self.as_server = KerberosAS(self.crypto)
+        self.tgs_server = KerberosTGS(self.crypto)
+        success, self.tgt, self.tgs_key = self.as_server.authenticate('test_user', 'test_password')
+        self.assertTrue(success)
+
+    def _authenticator(self, client_id='test_user', session_key=None):
+        return self.crypto.create_authenticator(
+            client_id, datetime.utcnow(), session_key or self.tgs_key)
+
+    def test_grant_multiple_services(self):
+        """测试一次TGS交换获取多个服务票据"""
+        with patch.object(self.crypto, 'verify_ticket', wraps=self.crypto.verify_ticket) as verify_ticket, \
+                patch.object(self.crypto, 'verify_authenticator',
+                             wraps=self.crypto.verify_authenticator) as verify_authenticator:
+            success, error, tickets = self.tgs_server.grant_service_tickets(
+                self.tgt, self._authenticator(), ['hdfs', 'yarn', 'hive', 'hdfs'])
+
+        self.assertTrue(success, error)
+        self.assertEqual(list(tickets), ['hdfs', 'yarn', 'hive'])
+        self.assertEqual(verify_ticket.call_count, 1)
+        self.assertEqual(verify_authenticator.call_count, 1)
+
+        session_keys = {key for _, key in tickets.values()}
+        self.assertEqual(len(session_keys), 3)
+
+        for service_id, (ticket, session_key) in tickets.items():
+            service = KerberosService(service_id, self.crypto)
+            success, error = service.verify_client(ticket, self._authenticator(session_key=session_key))
+            self.assertTrue(success, error)
+
+    def test_ticket_bound_to_service(self):
+        """测试服务票据不能用于其他服务"""
+        _, _, tickets = self.tgs_server.grant_service_tickets(
+            self.tgt, self._authenticator(), ['hdfs', 'yarn'])
+        ticket, session_key = tickets['hdfs']
+        service = KerberosService('yarn', self.crypto)
+        success, error = service.verify_client(ticket, self._authenticator(session_key=session_key))
+
+        self.assertFalse(success)
+        self.assertEqual(error, "服务ID不匹配")
+
+    def test_invalid_tgt_rejected(self):
+        """测试无效TGT"""
+        success, error, tickets = self.tgs_server.grant_service_tickets(
+            'invalid', self._authenticator(), ['hdfs'])
+        self.assertFalse(success)
+        self.assertEqual(error, "TGT无效")
+        self.assertEqual(tickets, {})
+
+    def test_client_mismatch_rejected(self):
+        """测试认证器客户端与TGT不一致"""
+        success, error, _ = self.tgs_server.grant_service_tickets(
+            self.tgt, self._authenticator('other_user'), ['hdfs'])
+        self.assertFalse(success)
+        self.assertEqual(error, "客户端身份不匹配")
+
+    def test_empty_service_list(self):
+        """测试未指定服务"""
+        success, error, _ = self.tgs_server.grant_service_tickets(
+            self.tgt, self._authenticator(), [])
+        self.assertFalse(success)
+
+
+class TestHadoopAuthManager(unittest.TestCase):
+    """Hadoop认证管理器测试类"""
+
+    def setUp(self):
+        """测试前准备"""
+        self.manager = HadoopAuthManager('/tmp')
+
+    def test_login_single_tgs_exchange(self):
+        """测试Hadoop登录只进行一次TGS交换"""
+        tgs_server = self.manager.kerberos_auth.tgs_server
+        with patch.object(tgs_server, 'grant_service_tickets',
+                          wraps=tgs_server.grant_service_tickets) as grant, \
+                patch.object(tgs_server, 'grant_service_ticket') as grant_single:
+            success, error = self.manager.authenticate_user('test_user', 'test_password')
+
+        self.assertTrue(success, error)
+        self.assertEqual(grant.call_count, 1)
+        grant_single.assert_not_called()
+
+        for service in HADOOP_SERVICES:
+            success, error = self.manager.verify_service_access('test_user', service)
+            self.assertTrue(success, error)
+
+    def test_login_wrong_password(self):
+        """测试密码错误"""
+        success, error = self.manager.authenticate_user('test_user', 'wrong')
+        self.assertFalse(success)
+        self.assertEqual(self.manager.service_tickets, {})
+
+
+class TestReplayCache(unittest.TestCase):
+    """认证器重放缓存测试类"""
+
+    def setUp(self):
+        """测试前准备"""
+        self.crypto = KerberosCrypto()
+        self.service = KerberosService('hdfs', self.crypto)
+        self.session_key = self.crypto.create_session_key()
+        self.ticket = self.crypto.create_ticket(
+            'test_user', 'hdfs', self.session_key,
+            datetime.utcnow(), timedelta(hours=1), self.crypto.service_crypto
+        )
+
+    def test_replayed_authenticator_rejected(self):
+        """测试重放的认证器被拒绝"""
+        authenticator = self.crypto.create_authenticator(
+            'test_user', datetime.utcnow(), self.session_key)
+
+        success, error = self.service.verify_client(self.ticket, authenticator)
+        self.assertTrue(success, error)
+        success, error = self.service.verify_client(self.ticket, authenticator)
+        self.assertFalse(success)
+        self.assertEqual(error, "认证器重放")
+
+        # 新的认证器仍然可以使用
+        authenticator = self.crypto.create_authenticator(
+            'test_user', datetime.utcnow(), self.session_key)
+        success, error = self.service.verify_client(self.ticket, authenticator)
+        self.assertTrue(success, error)
+
+    def test_re_encoded_authenticator_rejected(self):
+        """测试改写编码后重放的认证器被拒绝"""
+        authenticator = self.crypto.create_authenticator(
+            'test_user', datetime.utcnow(), self.session_key)
+        success, error = self.service.verify_client(self.ticket, authenticator)
+        self.assertTrue(success, error)
+
+        inner = base64.b64decode(authenticator)
+        for altered in (authenticator + '!', '\n' + authenticator, authenticator + '\n',
+                        base64.b64encode(inner + b'=').decode()):
+            success, error = self.service.verify_client(self.ticket, altered)
+            self.assertFalse(success, repr(altered))
+
+        # 即使编码层面绕过，解密后的内容相同也视为重放
+        lenient = lambda data, urlsafe=False: base64.b64decode(data, altchars=b'-_' if urlsafe else None)
+        with patch('kerberos.crypto.strict_b64decode', lenient):
+            success, error = self.service.verify_client(self.ticket, authenticator + '!')
+        self.assertFalse(success)
+        self.assertEqual(error, "认证器重放")
+
+    def test_skew_window_from_env(self):
+        """测试通过环境变量配置时钟偏差"""
+        with patch.dict(os.environ, {'KERBEROS_CLOCK_SKEW': '60'}):
+            crypto = KerberosCrypto()
+            service = KerberosService('hdfs', crypto)
+        self.assertEqual(service.replay_cache.skew_seconds, 60)
+
+        authenticator = crypto.create_authenticator(
+            'test_user', datetime.utcnow() - timedelta(seconds=90), self.session_key)
+        valid, auth_data = crypto.verify_authenticator(authenticator, self.session_key)
+        self.assertFalse(valid)
+
+        authenticator = crypto.create_authenticator(
+            'test_user', datetime.utcnow() + timedelta(seconds=90), self.session_key)
+        valid, auth_data = crypto.verify_authenticator(authenticator, self.session_key)
+        self.assertFalse(valid)
+
+    def test_buckets_dropped_when_aged_out(self):
+        """测试整桶过期丢弃"""
+        cache = ReplayCache(skew_seconds=300)
+        now = 1_000_000.0
+        self.assertTrue(cache.check_and_add(b'a', now, now))
+        self.assertFalse(cache.check_and_add(b'a', now, now + 10))
+
+        # 超过两个区间后桶被丢弃
+        self.assertTrue(cache.check_and_add(b'b', now + 600, now + 600))
+        self.assertEqual(cache.stats()['buckets'], 1)
+        self.assertEqual(len(cache), 1)
+
+    def test_invalid_skew(self):
+        """测试非法的时钟偏差配置"""
+        with self.assertRaises(ValueError):
+            ReplayCache(skew_seconds=0)
+
+    def test_memory_stays_flat(self):
+        """压力测试：持续高频认证下内存保持平稳"""
+        skew = 60
+        per_minute = 20000
+        cache = ReplayCache(skew_seconds=skew)
+        now = 1_000_000.0
+        sizes = []
+        counter = 0
+
+        start = time.perf_counter()
+        for minute in range(20):
+            for i in range(per_minute):
+                timestamp = now + minute * 60 + i * 60 / per_minute
+                counter += 1
+                self.assertTrue(cache.check_and_add(counter.to_bytes(16, 'big'), timestamp, timestamp))
+            sizes.append(cache.stats())
+        elapsed = time.perf_counter() - start
+
+        print(f"\n[重放缓存] {counter}次认证耗时{elapsed:.2f}s, "
+              f"最终条目数: {sizes[-1]['entries']}, 桶数: {sizes[-1]['buckets']}")
+        for stats in sizes:
+            self.assertLessEqual(stats['buckets'], 2)
+            self.assertLessEqual(stats['entries'], per_minute * 2 * skew // 60)
+        self.assertEqual(sizes[-1], sizes[5])
+
+
+if __name__ == '__main__':
+    unittest.main()
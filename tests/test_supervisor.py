@@ -0,0 +1,168 @@
+"""krb5kdc/kadmind进程监管测试"""
+
+import os
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+from kerberos.supervisor import ProcessSupervisor, probe_port
+
+# 模拟守护进程: 先写出远超管道缓冲区的输出，再监听TCP端口并回显UDP数据报；
+# 监听前检查标记文件，存在时立即崩溃一次
+FAKE_DAEMON = r'''
+import os, socket, sys, time
+port, crash_marker = int(sys.argv[1]), sys.argv[2]
+for i in range(20000):
+    print(f"kdc log line {i:05d} " + "x" * 40)
+sys.stdout.flush()
+if os.path.exists(crash_marker):
+    os.remove(crash_marker)
+    sys.exit(3)
+tcp = socket.socket()
+tcp.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+tcp.bind(("127.0.0.1", port))
+tcp.listen()
+udp = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+udp.bind(("127.0.0.1", port))
+print("ready", flush=True)
+while True:
+    data, addr = udp.recvfrom(64)
+    udp.sendto(data, addr)
+'''
+
+# 不监听任何端口的守护进程
+SILENT_DAEMON = 'import time\nwhile True:\n    time.sleep(1)\n'
+
+
+def free_port():
+    """获取一个TCP和UDP都空闲的端口"""
+    while True:
+        with socket.socket() as tcp:
+            tcp.bind(('127.0.0.1', 0))
+            port = tcp.getsockname()[1]
+            try:
+                with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as udp:
+                    udp.bind(('127.0.0.1', port))
+                return port
+            except OSError:
+                continue
+
+
+class TestProcessSupervisor(unittest.TestCase):
+    """进程监管测试类"""
+
+    def setUp(self):
+        """测试前准备"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.script = os.path.join(self.temp_dir, 'fake_kdc.py')
+        with open(self.script, 'w') as f:
+            f.write(FAKE_DAEMON)
+        self.crash_marker = os.path.join(self.temp_dir, 'crash')
+        self.port = free_port()
+        self.supervisor = ProcessSupervisor(log_dir=os.path.join(self.temp_dir, 'logs'),
+                                            ready_timeout=20, check_interval=0.1,
+                                            max_restart_delay=1.0)
+        self.supervisor.log_max_bytes = 256 * 1024
+        self.supervisor.add('krb5kdc', [sys.executable, self.script, str(self.port), self.crash_marker],
+                            [('127.0.0.1', self.port, 'udp'), ('127.0.0.1', self.port, 'tcp')])
+
+    def tearDown(self):
+        """测试后清理"""
+        self.supervisor.stop_all()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_probe_port(self):
+        """测试端口探测"""
+        self.assertFalse(probe_port('127.0.0.1', self.port, 'tcp'))
+        self.assertFalse(probe_port('127.0.0.1', self.port, 'udp'))
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as udp:
+            udp.bind(('127.0.0.1', self.port))
+            # 绑定但不回复的UDP端口不算就绪
+            self.assertFalse(probe_port('127.0.0.1', self.port, 'udp', timeout=0.1))
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as udp:
+            udp.bind(('127.0.0.1', self.port))
+            echo = threading.Thread(target=lambda: udp.sendto(*udp.recvfrom(64)))
+            echo.start()
+            self.assertTrue(probe_port('127.0.0.1', self.port, 'udp', timeout=1.0))
+            echo.join()
+
+    def test_start_drains_output_and_reports_latency(self):
+        """测试大量输出不会阻塞守护进程，并记录启动到就绪的耗时"""
+        self.assertTrue(self.supervisor.start('krb5kdc'))
+        metrics = self.supervisor.metrics()['krb5kdc']
+        self.assertTrue(metrics['running'])
+        self.assertTrue(metrics['ready'])
+        self.assertEqual(metrics['restarts'], 0)
+        self.assertGreater(metrics['start_to_ready_seconds'], 0)
+
+        # 输出写入按大小轮转的日志文件
+        log_path = metrics['log_path']
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline and not os.path.exists(log_path + '.1'):
+            time.sleep(0.05)
+        self.assertTrue(os.path.exists(log_path + '.1'))
+        self.assertLessEqual(os.path.getsize(log_path), 256 * 1024)
+
+    def test_restart_after_crash(self):
+        """测试守护进程崩溃后自动重启"""
+        open(self.crash_marker, 'w').close()
+        self.assertFalse(self.supervisor.start('krb5kdc'))
+
+        deadline = time.monotonic() + 20
+        while time.monotonic() < deadline and not self.supervisor.metrics()['krb5kdc']['ready']:
+            time.sleep(0.1)
+        metrics = self.supervisor.metrics()['krb5kdc']
+        self.assertTrue(metrics['ready'])
+        self.assertEqual(metrics['restarts'], 1)
+        self.assertTrue(probe_port('127.0.0.1', self.port, 'tcp'))
+
+    def test_stop_does_not_restart(self):
+        """测试主动停止后不再重启"""
+        self.assertTrue(self.supervisor.start('krb5kdc'))
+        self.supervisor.stop('krb5kdc')
+        time.sleep(0.5)
+        metrics = self.supervisor.metrics()['krb5kdc']
+        self.assertFalse(metrics['running'])
+        self.assertFalse(metrics['ready'])
+        self.assertEqual(metrics['restarts'], 0)
+
+    def test_adopt_external_daemon(self):
+        """测试端口已由外部进程提供时沿用，不启动也不重启"""
+        with socket.socket() as tcp, socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as udp:
+            tcp.bind(('127.0.0.1', self.port))
+            tcp.listen()
+            udp.bind(('127.0.0.1', self.port))
+            udp.settimeout(5)
+            echo = threading.Thread(target=lambda: udp.sendto(*udp.recvfrom(64)))
+            echo.start()
+            self.assertTrue(self.supervisor.start('krb5kdc'))
+            echo.join()
+            time.sleep(0.5)
+            metrics = self.supervisor.metrics()['krb5kdc']
+        self.assertTrue(metrics['external'])
+        self.assertTrue(metrics['ready'])
+        self.assertIsNone(metrics['pid'])
+        self.assertEqual(metrics['restarts'], 0)
+
+    def test_check_does_not_block_on_readiness(self):
+        """测试监控线程的就绪检查不会等待未就绪的进程"""
+        script = os.path.join(self.temp_dir, 'silent.py')
+        with open(script, 'w') as f:
+            f.write(SILENT_DAEMON)
+        daemon = self.supervisor.add('kadmind', [sys.executable, script],
+                                     [('127.0.0.1', self.port, 'tcp')])
+        self.assertTrue(self.supervisor.start('kadmind', wait=False))
+        for _ in range(5):
+            start = time.monotonic()
+            self.supervisor._check(daemon)
+            self.assertLess(time.monotonic() - start, 1.0)
+        self.assertFalse(daemon.ready)
+        self.assertTrue(daemon.running)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,146 @@
+"""TOTP引擎测试，以及各TOTP实现的交叉校验"""
+
+import base64
+import importlib.util
+import os
+import random
+import unittest
+from unittest.mock import patch
+
+import pyotp
+
+from totp import engine
+from totp.auth import TOTPAuth
+from totp.engine import TOTPEngine, totp_engine
+from totp.totp import TOTP as LegacyTOTP
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_app_totp():
+    """按文件路径加载app/utils/totp.py（app包被app.py遮蔽，无法直接import）"""
+    spec = importlib.util.spec_from_file_location(
+        'app_utils_totp', os.path.join(ROOT, 'app', 'utils', 'totp.py'))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class TestTOTPEngine(unittest.TestCase):
+    """TOTP引擎测试类"""
+
+    # RFC 6238附录B的SHA1测试向量（8位）
+    RFC_SECRET = base64.b32encode(b'12345678901234567890').decode()
+    RFC_VECTORS = [
+        (59, '94287082'),
+        (1111111109, '07081804'),
+        (1111111111, '14050471'),
+        (1234567890, '89005924'),
+        (2000000000, '69279037'),
+        (20000000000, '65353130'),
+    ]
+
+    def test_rfc6238_vectors(self):
+        """测试RFC 6238测试向量"""
+        for timestamp, expected in self.RFC_VECTORS:
+            self.assertEqual(totp_engine.generate(self.RFC_SECRET, timestamp, digits=8), expected)
+
+    def test_verify_window(self):
+        """测试验证窗口"""
+        secret = pyotp.random_base32()
+        now = 1700000000
+        previous = totp_engine.generate(secret, now - 30)
+        self.assertTrue(totp_engine.verify(secret, totp_engine.generate(secret, now), now))
+        self.assertFalse(totp_engine.verify(secret, previous, now))
+        self.assertTrue(totp_engine.verify(secret, previous, now, valid_window=1))
+        self.assertFalse(totp_engine.verify(secret, '', now))
+
+    def test_secret_decoded_once(self):
+        """测试每个密钥只解码一次"""
+        cache = TOTPEngine(max_keys=4)
+        secret = pyotp.random_base32()
+        with patch.object(engine, 'decode_secret', wraps=engine.decode_secret) as decode:
+            for step in range(100):
+                cache.generate(secret, step * 30)
+            cache.verify(secret, '000000', valid_window=2)
+        self.assertEqual(decode.call_count, 1)
+
+    def test_lru_eviction(self):
+        """测试缓存按最近使用淘汰"""
+        cache = TOTPEngine(max_keys=2)
+        a, b, c = (pyotp.random_base32() for _ in range(3))
+        cache.generate(a)
+        cache.generate(b)
+        cache.generate(a)
+        cache.generate(c)
+        self.assertEqual(len(cache), 2)
+        with patch.object(engine, 'decode_secret', wraps=engine.decode_secret) as decode:
+            cache.generate(a)
+            cache.generate(b)
+        self.assertEqual(decode.call_count, 1)
+
+    def test_window_codes_cached_per_step(self):
+        """测试同一时间步内的验证复用窗口代码，时间步变化后重新计算"""
+        cache = TOTPEngine()
+        secrets = [pyotp.random_base32() for _ in range(20)]
+        now = 1700000010
+        for _ in range(50):
+            for secret in secrets:
+                self.assertFalse(cache.verify(secret, '12345', now, valid_window=1))
+        self.assertEqual(cache.window_misses, 20)
+        self.assertEqual(cache.window_hits, 980)
+
+        secret = secrets[0]
+        codes = cache.window_codes(secret, now // 30, valid_window=1)
+        self.assertEqual(codes, tuple(pyotp.TOTP(secret).at(now + offset * 30).encode()
+                                      for offset in (-1, 0, 1)))
+        self.assertTrue(cache.verify(secret, codes[0].decode(), now + 10, valid_window=1))
+
+        cache.verify(secret, '000000', now + 30, valid_window=1)
+        self.assertEqual(cache.window_misses, 21)
+        # 不同的窗口大小不复用
+        cache.verify(secret, '000000', now + 30, valid_window=2)
+        self.assertEqual(cache.window_misses, 22)
+
+    def test_lowercase_unpadded_secret(self):
+        """测试与pyotp一致地接受小写和无填充的密钥"""
+        secret = 'jbswy3dpehpk3pxp'
+        self.assertEqual(totp_engine.generate(secret, 1700000000),
+                         pyotp.TOTP(secret).at(1700000000))
+
+
+class TestTOTPCrossCheck(unittest.TestCase):
+    """各TOTP实现的交叉校验"""
+
+    def test_all_implementations_agree(self):
+        """测试所有调用路径对同一密钥和时间给出相同代码"""
+        app_totp = load_app_totp()
+        auth = TOTPAuth()
+        rng = random.Random(6238)
+        for _ in range(300):
+            secret = pyotp.random_base32()
+            timestamp = rng.randrange(0, 4000000000)
+            expected = pyotp.TOTP(secret).at(timestamp)
+
+            self.assertEqual(totp_engine.generate(secret, timestamp), expected)
+            self.assertEqual(app_totp.TOTP(secret).generate_code(timestamp), expected)
+            with patch('time.time', return_value=timestamp + 0.5):
+                self.assertEqual(LegacyTOTP(secret).get_current_code(), expected)
+                self.assertEqual(auth.get_current_totp(secret), expected)
+                self.assertTrue(LegacyTOTP(secret).verify_code(expected))
+                with patch.dict(os.environ, {'FLASK_ENV': 'production'}):
+                    self.assertEqual(auth.verify_totp(secret, expected), (True, None))
+            self.assertTrue(app_totp.TOTP(secret).verify_code(expected, timestamp + 30))
+            self.assertTrue(pyotp.TOTP(secret).verify(totp_engine.generate(secret, timestamp), timestamp))
+
+    def test_app_totp_custom_digits_and_interval(self):
+        """测试app/utils/totp.py的位数和间隔参数"""
+        app_totp = load_app_totp()
+        secret = pyotp.random_base32()
+        totp = app_totp.TOTP(secret, digits=8, interval=60)
+        self.assertEqual(totp.generate_code(1700000000),
+                         pyotp.TOTP(secret, digits=8, interval=60).at(1700000000))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+"""TOTP配置二维码服务测试"""
+
+import subprocess
+import sys
+import threading
+import unittest
+from unittest.mock import patch
+
+import pyotp
+
+from totp import provisioning
+from totp.provisioning import ProvisioningService, provisioning_uri
+
+from tests.test_totp import ROOT, load_app_totp
+
+
+class TestProvisioningService(unittest.TestCase):
+    """二维码服务测试类"""
+
+    def setUp(self):
+        self.service = ProvisioningService(max_bytes=1024 * 1024, workers=2)
+        self.secret = pyotp.random_base32()
+
+    def test_render_formats(self):
+        """测试渲染PNG和SVG"""
+        png = self.service.render(self.secret, 'alice', fmt='png', timeout=10)
+        svg = self.service.render(self.secret, 'alice', fmt='svg', timeout=10)
+        self.assertTrue(png.startswith(b'\x89PNG'))
+        self.assertIn(b'<svg', svg)
+        self.assertTrue(self.service.data_uri(self.secret, 'alice').startswith('data:image/png;base64,'))
+        with self.assertRaises(ValueError):
+            self.service.submit(self.secret, 'alice', fmt='gif')
+
+    def test_rendered_once(self):
+        """测试缓存命中和并发请求只渲染一次"""
+        started = threading.Event()
+        release = threading.Event()
+        render = provisioning._render
+
+        def slow_render(uri, fmt):
+            started.set()
+            release.wait(10)
+            return render(uri, fmt)
+
+        with patch.object(provisioning, '_render', side_effect=slow_render) as mock_render:
+            first = self.service.submit(self.secret, 'alice')
+            started.wait(10)
+            second = self.service.submit(self.secret, 'alice')
+            self.assertIs(first, second)
+            release.set()
+            image = first.result(10)
+            self.assertEqual(self.service.render(self.secret, 'alice', timeout=10), image)
+            # 发行者不同时重新渲染
+            self.service.render(self.secret, 'alice', issuer='Other', timeout=10)
+        self.assertEqual(mock_render.call_count, 2)
+        self.assertEqual(self.service.stats()['hits'], 1)
+        self.assertEqual(self.service.stats()['pending'], 0)
+
+    def test_bounded_by_bytes(self):
+        """测试缓存总字节数不超过上限"""
+        size = len(self.service.render(self.secret, 'alice', fmt='svg', timeout=10))
+        service = ProvisioningService(max_bytes=size * 3, workers=2)
+        futures = service.prefetch([(pyotp.random_base32(), f'user{i}') for i in range(10)], fmt='svg')
+        for future in futures:
+            future.result(10)
+        stats = service.stats()
+        self.assertLessEqual(stats['bytes'], size * 3)
+        self.assertLessEqual(stats['entries'], 3)
+
+    def test_render_error_not_cached(self):
+        """测试渲染失败时不留下未完成的任务"""
+        with patch.object(provisioning, '_render', side_effect=RuntimeError('boom')):
+            with self.assertRaises(RuntimeError):
+                self.service.render(self.secret, 'alice', timeout=10)
+        self.assertEqual(self.service.stats()['pending'], 0)
+        self.assertTrue(self.service.render(self.secret, 'alice', timeout=10).startswith(b'\x89PNG'))
+
+    def test_provisioning_uri(self):
+        """测试配置URI与pyotp一致"""
+        self.assertEqual(provisioning_uri(self.secret, 'alice', 'Kerberos系统'),
+                         pyotp.TOTP(self.secret).provisioning_uri('alice', issuer_name='Kerberos系统'))
+
+    def test_user_model_uri(self):
+        """测试用户模型的TOTP URI与共享的配置URI一致"""
+        from models import User
+        user = User('alice')
+        user.totp_secret = self.secret
+        self.assertEqual(user.get_totp_uri(), provisioning_uri(user.totp_secret, 'alice'))
+        self.assertIn(provisioning.DEFAULT_ISSUER,
+                      pyotp.parse_uri(user.get_totp_uri()).issuer)
+
+    def test_app_totp_does_not_import_qrcode(self):
+        """测试导入app/utils/totp.py时不加载qrcode"""
+        code = ('import sys; from tests.test_totp import load_app_totp; load_app_totp(); '
+                'print("qrcode" in sys.modules)')
+        result = subprocess.run([sys.executable, '-c', code], cwd=ROOT,
+                                capture_output=True, text=True, check=True)
+        self.assertEqual(result.stdout.strip(), 'False')
+
+    def test_app_totp_qr_code(self):
+        """测试app/utils/totp.py的二维码接口"""
+        totp = load_app_totp().TOTP(self.secret, interval=60)
+        self.assertIn('period=60', totp.get_provisioning_uri('alice'))
+        self.assertTrue(totp.get_qr_code('alice').startswith('data:image/png;base64,'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,124 @@
+"""TOTP重放防护测试"""
+
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+
+import pyotp
+
+from totp.engine import totp_engine
+from totp.replay import MemoryReplayBackend, SQLiteReplayBackend, TOTPReplayGuard
+
+
+class ReplayGuardTests:
+    """两种存储共用的测试"""
+
+    def make_backend(self):
+        raise NotImplementedError
+
+    def setUp(self):
+        self.guard = TOTPReplayGuard(self.make_backend(), interval=30, valid_window=1)
+        self.now = 1700000010
+        self.step = self.now // 30
+
+    def test_code_accepted_once(self):
+        """测试同一用户同一时间步只接受一次"""
+        self.assertTrue(self.guard.check_and_add('alice', self.step, self.now))
+        self.assertFalse(self.guard.check_and_add('alice', self.step, self.now))
+        self.assertFalse(self.guard.check_and_add('alice', self.step, self.now + 20))
+
+    def test_users_and_steps_independent(self):
+        """测试不同用户、不同时间步互不影响"""
+        self.assertTrue(self.guard.check_and_add('alice', self.step, self.now))
+        self.assertTrue(self.guard.check_and_add('bob', self.step, self.now))
+        self.assertTrue(self.guard.check_and_add('alice', self.step - 1, self.now))
+        self.assertTrue(self.guard.check_and_add(42, self.step, self.now))
+        self.assertFalse(self.guard.check_and_add('42', self.step, self.now))
+
+    def test_buckets_expire_with_window(self):
+        """测试时间步离开窗口后整桶删除"""
+        for user in range(100):
+            self.guard.check_and_add(user, self.step, self.now)
+        self.assertEqual(len(self.guard), 100)
+        # 下一个时间步仍在窗口内
+        self.guard.check_and_add('alice', self.step + 1, self.now + 30)
+        self.assertEqual(len(self.guard), 101)
+        # 再下一个时间步时，self.step已离开窗口
+        self.guard.check_and_add('alice', self.step + 2, self.now + 60)
+        self.assertEqual(len(self.guard), 2)
+
+    def test_clear(self):
+        """测试清空"""
+        self.guard.check_and_add('alice', self.step, self.now)
+        self.guard.clear()
+        self.assertEqual(len(self.guard), 0)
+        self.assertTrue(self.guard.check_and_add('alice', self.step, self.now))
+
+    def test_concurrent_replay_accepted_once(self):
+        """测试并发提交同一代码时只有一次成功"""
+        results = []
+        barrier = threading.Barrier(8)
+
+        def submit():
+            barrier.wait()
+            results.append(self.guard.check_and_add('alice', self.step, self.now))
+
+        threads = [threading.Thread(target=submit) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results.count(True), 1)
+
+
+class TestMemoryReplayGuard(ReplayGuardTests, unittest.TestCase):
+    """进程内存储测试"""
+
+    def make_backend(self):
+        return MemoryReplayBackend()
+
+
+class TestSQLiteReplayGuard(ReplayGuardTests, unittest.TestCase):
+    """SQLite存储测试"""
+
+    def make_backend(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp_dir)
+        self.path = os.path.join(self.temp_dir, 'replay.db')
+        return SQLiteReplayBackend(self.path)
+
+    def test_shared_between_processes(self):
+        """测试打开同一文件的两个存储（模拟两个worker）共享记录"""
+        other = TOTPReplayGuard(SQLiteReplayBackend(self.path))
+        self.assertTrue(self.guard.check_and_add('alice', self.step, self.now))
+        self.assertFalse(other.check_and_add('alice', self.step, self.now))
+
+    def test_from_env(self):
+        """测试TOTP_REPLAY_STORE选择存储"""
+        with patch.dict(os.environ, {'TOTP_REPLAY_STORE': self.path}):
+            self.assertIsInstance(TOTPReplayGuard.from_env().backend, SQLiteReplayBackend)
+        with patch.dict(os.environ, {'TOTP_REPLAY_STORE': ''}):
+            self.assertIsInstance(TOTPReplayGuard.from_env().backend, MemoryReplayBackend)
+
+
+class TestMatchStep(unittest.TestCase):
+    """TOTPEngine.match_step测试"""
+
+    def test_returns_matched_step(self):
+        """测试返回代码所属的时间步"""
+        secret = pyotp.random_base32()
+        now = 1700000010
+        step = now // 30
+        for offset in (-1, 0, 1):
+            code = totp_engine.code_at_step(secret, step + offset)
+            self.assertEqual(totp_engine.match_step(secret, code, now, valid_window=1), step + offset)
+        previous = totp_engine.code_at_step(secret, step - 1)
+        self.assertIsNone(totp_engine.match_step(secret, previous, now))
+        self.assertIsNone(totp_engine.match_step(secret, 'abcdef', now, valid_window=1))
+
+
+if __name__ == '__main__':
+    unittest.main()
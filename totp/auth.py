@@ -1,10 +1,10 @@
 import pyotp
-import base64
 import logging
 from typing import Optional, Tuple
-import time
 import os
 
+from .engine import totp_engine
+
 class TOTPAuth:
     def __init__(self):
         self.logger = logging.getLogger(__name__)
@@ -36,8 +36,7 @@ class TOTPAuth:
             return True, None
             
         try:
-            totp = pyotp.TOTP(secret, interval=self.validity_seconds)
-            if totp.verify(token):
+            if totp_engine.verify(secret, token, interval=self.validity_seconds):
                 return True, None
             return False, "TOTP验证失败"
         except Exception as e:
@@ -53,8 +52,7 @@ class TOTPAuth:
         Returns:
             str: 当前的动态密码
         """
-        totp = pyotp.TOTP(secret)
-        return totp.now()
+        return totp_engine.generate(secret)
 
     def get_remaining_seconds(self, secret: str) -> int:
         """
@@ -66,5 +64,4 @@ class TOTPAuth:
         Returns:
             int: 剩余秒数
         """
-        totp = pyotp.TOTP(secret)
-        return totp.interval - (int(time.time()) % totp.interval) 
\ No newline at end of file
+        return totp_engine.remaining_seconds() 
\ No newline at end of file
@@ -0,0 +1,195 @@
+import base64
+import hashlib
+import hmac
+import os
+import struct
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple, Union
+
+_COUNTER = struct.Struct('>Q')
+_TRUNCATE = struct.Struct('>I')
+
+
+def decode_secret(secret: str) -> bytes:
+    """
+    解码base32密钥（与pyotp一致：忽略大小写，允许省略填充）
+
+    Args:
+        secret: base32编码的TOTP密钥
+
+    Returns:
+        bytes: 密钥字节
+    """
+    missing_padding = len(secret) % 8
+    if missing_padding:
+        secret += '=' * (8 - missing_padding)
+    return base64.b32decode(secret, casefold=True)
+
+
+class _KeyEntry:
+    """一个密钥的缓存: 已载入密钥的HMAC对象和当前验证窗口的代码"""
+
+    __slots__ = ('mac', 'window')
+
+    def __init__(self, mac: 'hmac.HMAC'):
+        self.mac = mac
+        # ((时间步, 窗口, 位数, 间隔), 代码)，整体替换，读取时不会与其他线程的更新交错
+        self.window: Optional[Tuple[Tuple[int, int, int, int], Tuple[bytes, ...]]] = None
+
+
+class TOTPEngine:
+    """
+    共享的TOTP计算引擎（RFC 6238，HMAC-SHA1）
+
+    每个密钥只做一次base32解码，并缓存已经载入密钥的HMAC对象；计算某个时间步的代码时
+    copy()该对象再写入计数器，不再重复解码和初始化HMAC。验证时一次算出整个窗口的代码，
+    缓存到时间步变化为止，同一时间步内的重复验证直接比较缓存的代码。
+    缓存按最近使用淘汰，容量由TOTP_KEY_CACHE_SIZE决定。
+    """
+
+    def __init__(self, max_keys: Optional[int] = None):
+        self.max_keys = max_keys or int(os.getenv('TOTP_KEY_CACHE_SIZE', 1024))
+        self._lock = threading.Lock()
+        # 密钥 -> 缓存条目
+        self._keys: 'OrderedDict[str, _KeyEntry]' = OrderedDict()
+        self.window_hits = 0
+        self.window_misses = 0
+
+    def _entry(self, secret: str) -> _KeyEntry:
+        with self._lock:
+            entry = self._keys.get(secret)
+            if entry is not None:
+                self._keys.move_to_end(secret)
+                return entry
+        entry = _KeyEntry(hmac.new(decode_secret(secret), digestmod=hashlib.sha1))
+        with self._lock:
+            self._keys[secret] = entry
+            while len(self._keys) > self.max_keys:
+                self._keys.popitem(last=False)
+        return entry
+
+    @staticmethod
+    def _code(mac: 'hmac.HMAC', step: int, digits: int) -> str:
+        mac = mac.copy()
+        mac.update(_COUNTER.pack(step))
+        digest = mac.digest()
+        offset = digest[-1] & 0xf
+        code = _TRUNCATE.unpack_from(digest, offset)[0] & 0x7fffffff
+        return str(code % (10 ** digits)).zfill(digits)
+
+    def code_at_step(self, secret: str, step: int, digits: int = 6) -> str:
+        """
+        计算指定时间步的代码
+
+        Args:
+            secret: base32编码的TOTP密钥
+            step: 时间步（时间戳 // 间隔）
+            digits: 代码位数
+
+        Returns:
+            str: 补齐前导零的代码
+        """
+        return self._code(self._entry(secret).mac, step, digits)
+
+    def window_codes(self, secret: str, step: int, valid_window: int = 0, digits: int = 6,
+                     interval: int = 30) -> Tuple[bytes, ...]:
+        """
+        获取验证窗口内全部时间步的代码，同一时间步内只计算一次
+
+        Args:
+            secret: base32编码的TOTP密钥
+            step: 当前时间步
+            valid_window: 前后各允许的时间步数
+            digits: 代码位数
+            interval: 时间步长（秒），只用于区分缓存
+
+        Returns:
+            Tuple[bytes, ...]: 从step-valid_window到step+valid_window的代码
+        """
+        entry = self._entry(secret)
+        window = (step, valid_window, digits, interval)
+        cached = entry.window
+        if cached is not None and cached[0] == window:
+            self.window_hits += 1
+            return cached[1]
+        self.window_misses += 1
+        codes = tuple(self._code(entry.mac, step + offset, digits).encode('ascii')
+                      for offset in range(-valid_window, valid_window + 1))
+        entry.window = (window, codes)
+        return codes
+
+    def generate(self, secret: str, timestamp: Optional[float] = None,
+                 digits: int = 6, interval: int = 30) -> str:
+        """
+        生成TOTP代码
+
+        Args:
+            secret: base32编码的TOTP密钥
+            timestamp: 时间戳，默认当前时间
+            digits: 代码位数
+            interval: 时间步长（秒）
+
+        Returns:
+            str: TOTP代码
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        return self.code_at_step(secret, int(timestamp / interval), digits)
+
+    def verify(self, secret: str, code: Union[str, int], timestamp: Optional[float] = None,
+               valid_window: int = 0, digits: int = 6, interval: int = 30) -> bool:
+        """
+        验证TOTP代码
+
+        Args:
+            secret: base32编码的TOTP密钥
+            code: 待验证的代码
+            timestamp: 时间戳，默认当前时间
+            valid_window: 前后各允许的时间步数
+            digits: 代码位数
+            interval: 时间步长（秒）
+
+        Returns:
+            bool: 是否有效
+        """
+        return self.match_step(secret, code, timestamp, valid_window, digits, interval) is not None
+
+    def match_step(self, secret: str, code: Union[str, int], timestamp: Optional[float] = None,
+                   valid_window: int = 0, digits: int = 6, interval: int = 30) -> Optional[int]:
+        """
+        验证TOTP代码并返回匹配的时间步，参数与verify()相同
+
+        Returns:
+            Optional[int]: 代码所属的时间步，无效时返回None
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        code = str(code).encode('utf-8')
+        step = int(timestamp / interval)
+        # 与窗口内每个代码都比较一次，耗时与匹配位置无关
+        matched = None
+        for offset, expected in enumerate(self.window_codes(secret, step, valid_window, digits, interval)):
+            if hmac.compare_digest(expected, code):
+                matched = step - valid_window + offset
+        return matched
+
+    @staticmethod
+    def remaining_seconds(interval: int = 30, timestamp: Optional[float] = None) -> int:
+        """当前代码的剩余有效秒数"""
+        if timestamp is None:
+            timestamp = time.time()
+        return interval - (int(timestamp) % interval)
+
+    def clear(self):
+        """清空密钥缓存"""
+        with self._lock:
+            self._keys.clear()
+
+    def __len__(self):
+        return len(self._keys)
+
+
+# 所有登录路径共用的引擎
+totp_engine = TOTPEngine()
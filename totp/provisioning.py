@@ -0,0 +1,189 @@
+import base64
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import pyotp
+
+# 支持的图片格式及其MIME类型
+FORMATS = {
+    'png': 'image/png',
+    'svg': 'image/svg+xml',
+}
+
+DEFAULT_ISSUER = 'Kerberos系统'
+
+
+def provisioning_uri(secret: str, account: str, issuer: str = DEFAULT_ISSUER,
+                     digits: int = 6, interval: int = 30) -> str:
+    """
+    生成otpauth://配置URI
+
+    Args:
+        secret: base32编码的TOTP密钥
+        account: 账户名（通常为用户名）
+        issuer: 发行者名称
+        digits: 代码位数
+        interval: 时间步长（秒）
+
+    Returns:
+        str: otpauth URI
+    """
+    return pyotp.TOTP(secret, digits=digits, interval=interval).provisioning_uri(
+        account, issuer_name=issuer)
+
+
+def _render(uri: str, fmt: str) -> bytes:
+    # qrcode只在真正渲染二维码时导入，普通请求不加载
+    import qrcode
+    if fmt == 'svg':
+        from qrcode.image.svg import SvgPathImage as factory
+    else:
+        from qrcode.image.pure import PyPNGImage as factory
+    buffer = io.BytesIO()
+    qrcode.make(uri, image_factory=factory).save(buffer)
+    return buffer.getvalue()
+
+
+class ProvisioningService:
+    """
+    TOTP二维码生成服务
+
+    渲染好的PNG/SVG按(密钥, 发行者, 账户, 格式)缓存，总字节数超过上限时按最近使用淘汰。
+    渲染在一个小线程池中进行，批量注册用户时可以先用prefetch()提交，请求线程只等待
+    自己需要的那张图；同一张图同时只渲染一次。
+    """
+
+    def __init__(self, max_bytes: Optional[int] = None, workers: Optional[int] = None):
+        self.max_bytes = max_bytes if max_bytes is not None else \
+            int(os.getenv('TOTP_QR_CACHE_MAX_BYTES', 4 * 1024 * 1024))
+        self.workers = workers or int(os.getenv('TOTP_QR_WORKERS', 2))
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[bytes, bytes]' = OrderedDict()
+        self._pending: Dict[bytes, Future] = {}
+        self._bytes = 0
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pid = None
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(secret: str, issuer: str, account: str, fmt: str, digits: int, interval: int) -> bytes:
+        fields = (secret, issuer, account, fmt, str(digits), str(interval))
+        return hashlib.blake2b('\0'.join(fields).encode(), digest_size=16).digest()
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        # 线程池在首次渲染时创建；fork出的worker进程中重新创建
+        if self._executor is None or self._pid != os.getpid():
+            self._executor = ThreadPoolExecutor(max_workers=self.workers,
+                                                thread_name_prefix='totp-qr')
+            self._pending = {}
+            self._pid = os.getpid()
+        return self._executor
+
+    def _store(self, key: bytes, image: bytes):
+        with self._lock:
+            self._pending.pop(key, None)
+            if len(image) > self.max_bytes or key in self._entries:
+                return
+            self._entries[key] = image
+            self._bytes += len(image)
+            while self._bytes > self.max_bytes:
+                _, oldest = self._entries.popitem(last=False)
+                self._bytes -= len(oldest)
+
+    def _job(self, key: bytes, uri: str, fmt: str) -> bytes:
+        try:
+            image = _render(uri, fmt)
+        except BaseException:
+            with self._lock:
+                self._pending.pop(key, None)
+            raise
+        self._store(key, image)
+        return image
+
+    def submit(self, secret: str, account: str, issuer: str = DEFAULT_ISSUER,
+               fmt: str = 'png', digits: int = 6, interval: int = 30) -> Future:
+        """
+        提交二维码渲染，已缓存时返回已完成的Future
+
+        Args:
+            secret: base32编码的TOTP密钥
+            account: 账户名
+            issuer: 发行者名称
+            fmt: 图片格式，png或svg
+            digits: 代码位数
+            interval: 时间步长（秒）
+
+        Returns:
+            Future: 结果为图片字节
+        """
+        if fmt not in FORMATS:
+            raise ValueError(f'不支持的二维码格式: {fmt}')
+        key = self._key(secret, issuer, account, fmt, digits, interval)
+        with self._lock:
+            image = self._entries.get(key)
+            if image is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                future = Future()
+                future.set_result(image)
+                return future
+            self.misses += 1
+            executor = self._get_executor()
+            future = self._pending.get(key)
+            if future is None:
+                uri = provisioning_uri(secret, account, issuer, digits, interval)
+                future = self._pending[key] = executor.submit(self._job, key, uri, fmt)
+            return future
+
+    def render(self, secret: str, account: str, issuer: str = DEFAULT_ISSUER,
+               fmt: str = 'png', timeout: Optional[float] = None, **options) -> bytes:
+        """渲染二维码并等待结果，参数与submit()相同"""
+        return self.submit(secret, account, issuer, fmt, **options).result(timeout)
+
+    def data_uri(self, secret: str, account: str, issuer: str = DEFAULT_ISSUER,
+                 fmt: str = 'png', timeout: Optional[float] = None, **options) -> str:
+        """渲染二维码并返回可直接用于<img src>的data URI，参数与render()相同"""
+        image = self.render(secret, account, issuer, fmt, timeout, **options)
+        return f'data:{FORMATS[fmt]};base64,{base64.b64encode(image).decode("ascii")}'
+
+    def prefetch(self, accounts: Iterable[Tuple[str, str]], issuer: str = DEFAULT_ISSUER,
+                 fmt: str = 'png') -> List[Future]:
+        """
+        批量提交渲染（批量注册用户时使用），不等待结果
+
+        Args:
+            accounts: (密钥, 账户名)序列
+            issuer: 发行者名称
+            fmt: 图片格式
+
+        Returns:
+            List[Future]: 每个账户的渲染结果
+        """
+        return [self.submit(secret, account, issuer, fmt) for secret, account in accounts]
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        """获取缓存统计信息"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'pending': len(self._pending),
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+
+# 进程内共享的二维码服务
+provisioning_service = ProvisioningService()
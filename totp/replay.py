@@ -0,0 +1,155 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional, Set, Union
+
+UserKey = Union[str, int]
+
+
+class MemoryReplayBackend:
+    """
+    进程内的已用代码存储
+
+    每个时间步一个桶（用户集合），桶离开验证窗口后整桶删除。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets: Dict[int, Set[str]] = {}
+        self._oldest: Optional[int] = None
+
+    def add(self, user: str, step: int) -> bool:
+        """记录(用户, 时间步)，已存在时返回False"""
+        with self._lock:
+            bucket = self._buckets.get(step)
+            if bucket is None:
+                bucket = self._buckets[step] = set()
+                if self._oldest is None or step < self._oldest:
+                    self._oldest = step
+            elif user in bucket:
+                return False
+            bucket.add(user)
+            return True
+
+    def expire(self, oldest_step: int):
+        """删除早于oldest_step的桶"""
+        with self._lock:
+            if self._oldest is None or self._oldest >= oldest_step:
+                return
+            for step in [step for step in self._buckets if step < oldest_step]:
+                del self._buckets[step]
+            self._oldest = min(self._buckets) if self._buckets else None
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+            self._oldest = None
+
+    def __len__(self):
+        return sum(len(bucket) for bucket in self._buckets.values())
+
+
+class SQLiteReplayBackend:
+    """
+    基于SQLite文件的已用代码存储，供多个gunicorn worker共享
+
+    (时间步, 用户)为主键，INSERT OR IGNORE一次完成检查和记录。
+    文件放在/dev/shm等内存文件系统上时不产生磁盘IO。
+    """
+
+    def __init__(self, path: str, timeout: float = 5.0):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS totp_replay ('
+                         'step INTEGER NOT NULL, user TEXT NOT NULL, '
+                         'PRIMARY KEY (step, user)) WITHOUT ROWID')
+
+    def _connect(self) -> sqlite3.Connection:
+        # 每个线程一个连接
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.timeout)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=OFF')
+            self._local.conn = conn
+        return conn
+
+    def add(self, user: str, step: int) -> bool:
+        """记录(用户, 时间步)，已存在时返回False"""
+        conn = self._connect()
+        with conn:
+            cursor = conn.execute('INSERT OR IGNORE INTO totp_replay (step, user) VALUES (?, ?)',
+                                  (step, user))
+        return cursor.rowcount == 1
+
+    def expire(self, oldest_step: int):
+        """删除早于oldest_step的记录"""
+        conn = self._connect()
+        with conn:
+            conn.execute('DELETE FROM totp_replay WHERE step < ?', (oldest_step,))
+
+    def clear(self):
+        conn = self._connect()
+        with conn:
+            conn.execute('DELETE FROM totp_replay')
+
+    def __len__(self):
+        return self._connect().execute('SELECT COUNT(*) FROM totp_replay').fetchone()[0]
+
+
+class TOTPReplayGuard:
+    """
+    TOTP代码重放防护
+
+    验证通过的代码按(用户, 时间步)记录，同一用户在同一时间步的代码只能使用一次。
+    记录按时间步分桶，时间步离开验证窗口后整桶丢弃，内存只与活跃用户数和窗口大小有关。
+    时间步前进时才执行一次过期清理，验证热路径上只有一次集合（或主键）查询。
+    """
+
+    def __init__(self, backend=None, interval: int = 30, valid_window: int = 1):
+        self.backend = backend if backend is not None else MemoryReplayBackend()
+        self.interval = interval
+        self.valid_window = valid_window
+        self._expired_before: Optional[int] = None
+
+    @classmethod
+    def from_env(cls, interval: int = 30, valid_window: int = 1) -> 'TOTPReplayGuard':
+        """
+        根据TOTP_REPLAY_STORE环境变量创建重放防护
+
+        未配置时使用进程内存储，配置为文件路径时使用SQLite存储（多worker共享）
+        """
+        path = os.getenv('TOTP_REPLAY_STORE')
+        backend = SQLiteReplayBackend(path) if path else MemoryReplayBackend()
+        return cls(backend, interval, valid_window)
+
+    def check_and_add(self, user: UserKey, step: int, now: Optional[float] = None) -> bool:
+        """
+        检查代码是否已使用过，未使用则记录
+
+        Args:
+            user: 用户ID或用户名
+            step: 代码所属的时间步
+            now: 当前时间，默认为time.time()
+
+        Returns:
+            bool: 首次使用返回True，重放返回False
+        """
+        if now is None:
+            now = time.time()
+        oldest = int(now / self.interval) - self.valid_window
+        if self._expired_before is None or oldest > self._expired_before:
+            self._expired_before = oldest
+            self.backend.expire(oldest)
+        return self.backend.add(str(user), step)
+
+    def clear(self):
+        """清空记录"""
+        self.backend.clear()
+        self._expired_before = None
+
+    def __len__(self):
+        return len(self.backend)
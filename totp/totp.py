@@ -1,10 +1,9 @@
-import time
 import base64
-import hmac
-import hashlib
 import os
 from typing import Optional
 
+from .engine import totp_engine
+
 class TOTP:
     """基于时间的一次性密码生成器"""
     
@@ -28,32 +27,7 @@ class TOTP:
         Returns:
             6位数字的TOTP代码
         """
-        # 获取当前时间戳（30秒为一个周期）
-        t = int(time.time() / 30)
-        
-        # 将时间戳转换为字节
-        t_bytes = t.to_bytes(8, 'big')
-        
-        # 解码密钥
-        key = base64.b32decode(self.secret)
-        
-        # 计算HMAC-SHA1
-        hmac_obj = hmac.new(key, t_bytes, hashlib.sha1)
-        hmac_result = hmac_obj.digest()
-        
-        # 获取偏移量
-        offset = hmac_result[-1] & 0xf
-        
-        # 提取4字节
-        code_bytes = hmac_result[offset:offset + 4]
-        
-        # 转换为整数
-        code_int = int.from_bytes(code_bytes, 'big')
-        
-        # 生成6位数字代码
-        code = str(code_int % 1000000).zfill(6)
-        
-        return code
+        return totp_engine.generate(self.secret)
     
     def verify_code(self, code: str) -> bool:
         """
@@ -65,11 +39,19 @@ class TOTP:
         Returns:
             验证是否成功
         """
-        # 获取当前代码
-        current_code = self.get_current_code()
+        return totp_engine.verify(self.secret, code)
+    
+    def match_step(self, code: str) -> Optional[int]:
+        """
+        验证TOTP代码并返回其时间步，用于重放检查
         
-        # 验证代码
-        return code == current_code
+        Args:
+            code: 要验证的6位数字代码
+            
+        Returns:
+            代码所属的时间步，验证失败时返回None
+        """
+        return totp_engine.match_step(self.secret, code)
     
     def get_remaining_seconds(self) -> int:
         """
@@ -78,4 +60,4 @@ class TOTP:
         Returns:
             剩余秒数
         """
-        return 30 - (int(time.time()) % 30) 
\ No newline at end of file
+        return totp_engine.remaining_seconds() 
\ No newline at end of file
@@ -13,9 +13,12 @@ from web.models import db, User, LoginAttempt, Role, Permission
 from web.decorators import admin_required, permission_required
 from web.hadoop_api import hadoop_api, init_hadoop_manager, HadoopManager
 from totp.totp import TOTP
+from totp.replay import TOTPReplayGuard
 
 # 全局变量
 hadoop_manager = None
+# 已使用的TOTP代码（按用户和时间步）
+totp_replay_guard = TOTPReplayGuard.from_env()
 
 def create_app():
     """创建Flask应用实例"""
@@ -160,8 +163,11 @@ def create_app():
             
             # 验证TOTP
             totp = TOTP(secret=session['totp_secret'])
-            if not totp.verify_code(totp_code):
+            step = totp.match_step(totp_code)
+            if step is None:
                 return jsonify({'error': 'TOTP验证失败'}), 401
+            if not totp_replay_guard.check_and_add(session['username'], step):
+                return jsonify({'error': 'TOTP验证码已使用'}), 401
             
             # 验证服务访问权限
             service = session['service']